@@ -0,0 +1,7 @@
+# backend/__init__.py
+
+# Modules read their configuration from the environment at import, so .env is loaded before
+# any of them: for the app, backend.serve and the command-line tools alike
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,172 @@
+# backend/archival.py
+
+"""
+Scheduled archival of cold documents into "<collection>_archive" collections.
+
+Moved on every run, oldest state first:
+  - completed/cancelled tasks not updated for ARCHIVE_TASK_AGE_DAYS, with their applications
+    (the task keeps its application_count, summed from the counter shards)
+  - read notifications older than ARCHIVE_NOTIFICATION_AGE_DAYS
+  - chats without messages for ARCHIVE_CHAT_AGE_DAYS, with their messages
+
+Work happens in batches of ARCHIVE_BATCH_SIZE documents; each document's copy and delete
+commit together, and children move before their parent. The selection query is therefore
+its own cursor: a run that dies midway leaves nothing half-moved and the next run simply
+continues. A lease in the "_archival/state" document keeps workers from running it twice.
+Run once from a shell with: python -m backend.archival
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from starlette.concurrency import run_in_threadpool
+
+from backend.database import (
+    add_document,
+    get_document,
+    get_document_versioned,
+    get_sharded_counts,
+    move_documents,
+    query_documents,
+    update_document,
+    update_document_if_unchanged,
+    WriteConflict
+)
+
+ARCHIVE_SUFFIX = "_archive"
+TASK_AGE_DAYS = int(os.getenv("ARCHIVE_TASK_AGE_DAYS", "90"))
+NOTIFICATION_AGE_DAYS = int(os.getenv("ARCHIVE_NOTIFICATION_AGE_DAYS", "30"))
+CHAT_AGE_DAYS = int(os.getenv("ARCHIVE_CHAT_AGE_DAYS", "180"))
+BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "100"))
+INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+ARCHIVED_TASK_STATUSES = ["completed", "cancelled"]
+LEASE_SECONDS = 600
+# Firestore "in" filters accept at most 30 values
+IN_LIMIT = 30
+STATE_COLLECTION, STATE_ID = "_archival", "state"
+
+
+def archive_name(collection_name):
+    return collection_name + ARCHIVE_SUFFIX
+
+
+def get_document_with_archive(collection_name, doc_id, include_archived=False):
+    """get_document that falls back to the archive only when asked to"""
+    doc = get_document(collection_name, doc_id)
+    if doc is None and include_archived:
+        doc = get_document(archive_name(collection_name), doc_id)
+    return doc
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def archive_tasks_batch(cutoff):
+    tasks = query_documents(
+        "tasks", [("status", "in", ARCHIVED_TASK_STATUSES), ("updated_at", "<", cutoff)], limit=BATCH_SIZE
+    )
+    if not tasks:
+        return 0
+    task_ids = [task["id"] for task in tasks]
+    counts = get_sharded_counts("tasks", task_ids, "application_count")
+    for chunk in _chunks(task_ids, IN_LIMIT):
+        applications = query_documents("applications", [("task_id", "in", chunk)])
+        move_documents("applications", {app["id"]: app for app in applications}, archive_name("applications"))
+    archived_at = _utcnow()
+    move_documents("tasks", {
+        task["id"]: {**task, "application_count": counts[task["id"]], "archived_at": archived_at}
+        for task in tasks
+    }, archive_name("tasks"))
+    return len(tasks)
+
+
+def archive_notifications_batch(cutoff):
+    notifications = query_documents(
+        "notifications", [("read", "==", True), ("created_at", "<", cutoff)], limit=BATCH_SIZE
+    )
+    move_documents("notifications", {n["id"]: n for n in notifications}, archive_name("notifications"))
+    return len(notifications)
+
+
+def archive_chats_batch(cutoff):
+    chats = query_documents("chats", [("last_message_at", "<", cutoff)], limit=BATCH_SIZE)
+    for chat in chats:
+        source = f"chats/{chat['id']}/messages"
+        target = f"{archive_name('chats')}/{chat['id']}/messages"
+        while True:
+            messages = query_documents(source, limit=BATCH_SIZE * 2)
+            if not messages:
+                break
+            move_documents(source, {m["id"]: m for m in messages}, target)
+    move_documents("chats", {c["id"]: {**c, "archived_at": _utcnow()} for c in chats}, archive_name("chats"))
+    return len(chats)
+
+
+def _acquire_lease():
+    state, update_time = get_document_versioned(STATE_COLLECTION, STATE_ID)
+    if state is None:
+        add_document(STATE_COLLECTION, STATE_ID, {"lease_until": None})
+        state, update_time = get_document_versioned(STATE_COLLECTION, STATE_ID)
+    current = _utcnow()
+    if state.get("lease_until") and state["lease_until"] > current:
+        return False
+    try:
+        update_document_if_unchanged(STATE_COLLECTION, STATE_ID, state, update_time, {
+            "lease_until": current + timedelta(seconds=LEASE_SECONDS),
+            "last_started_at": current,
+        })
+    except WriteConflict:
+        return False
+    return True
+
+
+def run_archival():
+    """Archive everything that is due; returns {kind: documents moved}, or None if another worker holds the lease"""
+    if not _acquire_lease():
+        return None
+    current = _utcnow()
+    passes = [
+        ("tasks", archive_tasks_batch, current - timedelta(days=TASK_AGE_DAYS)),
+        ("notifications", archive_notifications_batch, current - timedelta(days=NOTIFICATION_AGE_DAYS)),
+        ("chats", archive_chats_batch, current - timedelta(days=CHAT_AGE_DAYS)),
+    ]
+    moved = {kind: 0 for kind, _, _ in passes}
+    try:
+        for kind, archive_batch, cutoff in passes:
+            while True:
+                count = archive_batch(cutoff)
+                moved[kind] += count
+                update_document(STATE_COLLECTION, STATE_ID, {
+                    "lease_until": _utcnow() + timedelta(seconds=LEASE_SECONDS),
+                    "last_moved": moved,
+                })
+                if count < BATCH_SIZE:
+                    break
+    finally:
+        update_document(STATE_COLLECTION, STATE_ID, {
+            "lease_until": None,
+            "last_finished_at": _utcnow(),
+            "last_moved": moved,
+        })
+    return moved
+
+
+async def archive_periodically():
+    """Background loop started from the app lifespan"""
+    while True:
+        await asyncio.sleep(INTERVAL_SECONDS)
+        try:
+            moved = await run_in_threadpool(run_archival)
+            if moved:
+                print(f"Archived {moved}")
+        except Exception as exc:
+            print(f"Archival failed: {exc}")
+
+
+if __name__ == "__main__":
+    print(run_archival())
@@ -0,0 +1,46 @@
+# backend/benchmarks/app.py
+
+"""
+The DoIt app wired for offline benchmarking: in-memory storage and bearer tokens that are
+simply the caller's uid instead of Firebase ID tokens. Never deploy this module.
+"""
+import os
+
+os.environ.setdefault("DB_BACKEND", "memory")
+# Benchmarks replay many requests per user; measure the handlers, not the per-user limiter
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("BLOB_BACKEND", "local")
+
+from fastapi import Header, HTTPException
+
+from backend import database
+from backend.main import app
+from backend.routers.auth import extract_token, get_current_user, get_current_user_versioned
+
+if database.DB_BACKEND != "memory":
+    raise RuntimeError("backend.benchmarks.app only runs against DB_BACKEND=memory")
+
+# Worker processes started by backend.serve each have their own in-memory store
+if os.getenv("BENCH_SEED") == "1":
+    from backend.benchmarks.seed import seed
+    seed()
+
+
+def bench_current_user(authorization: str = Header(...)):
+    uid = extract_token(authorization)
+    user = database.get_document("users", uid)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+def bench_current_user_versioned(authorization: str = Header(...)):
+    uid = extract_token(authorization)
+    user, update_time = database.get_document_versioned("users", uid)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user, update_time
+
+
+app.dependency_overrides[get_current_user] = bench_current_user
+app.dependency_overrides[get_current_user_versioned] = bench_current_user_versioned
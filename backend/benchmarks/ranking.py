@@ -0,0 +1,55 @@
+# backend/benchmarks/ranking.py
+
+"""
+Time the applicant ranking engine on synthetic candidates.
+
+    python -m backend.benchmarks.ranking --candidates 5000 --repeat 50
+"""
+import argparse
+import random
+import statistics
+import time
+
+from backend.ranking import rank
+
+
+def make_candidates(count, rng):
+    return [
+        {
+            "uid": f"user-{i}",
+            "rating": round(rng.uniform(1.0, 5.0), 2),
+            "rating_count": rng.randint(0, 200),
+            "completed_tasks": rng.randint(0, 150),
+            "latitude": 52.52 + rng.uniform(-0.3, 0.3) if rng.random() < 0.9 else None,
+            "longitude": 13.40 + rng.uniform(-0.5, 0.5) if rng.random() < 0.9 else None,
+            "offered_price": round(rng.uniform(20, 120), 2) if rng.random() < 0.8 else None,
+        }
+        for i in range(count)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(1)
+    candidates = make_candidates(args.candidates, rng)
+    task = {"latitude": 52.52, "longitude": 13.40, "budget": 60.0}
+
+    rank(candidates, task)  # warm up numpy
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        rank(candidates, task, limit=20)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    print(f"ranked {args.candidates} candidates: "
+          f"median {statistics.median(timings):.2f} ms, "
+          f"p95 {timings[int(0.95 * (len(timings) - 1))]:.2f} ms, min {timings[0]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# backend/benchmarks/records.py
+
+"""
+Memory and conversion cost of backend.records compared with the plain dicts they replace.
+
+    DB_BACKEND=memory python -m backend.benchmarks.records --repeat 5
+
+Seeds the in-memory store and, per collection, measures the bytes each document's container
+takes (the field values are shared, so this is the dict or record itself, plus a record's
+overflow dict), the time to build it from a snapshot's to_dict(), and the time to validate a
+page of them into the route's response model. Records save memory but cost CPU on both
+counts, which is why they are kept for retained documents and not the response path.
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import List
+
+os.environ.setdefault("DB_BACKEND", "memory")
+
+from pydantic import TypeAdapter
+
+from backend.benchmarks.seed import seed
+from backend.database import get_db
+from backend.records import record_type
+from backend.routers.applications import ApplicationResponse
+from backend.routers.chat import MessageResponse
+from backend.routers.reviews import ReviewResponse
+from backend.routers.tasks import TaskResponse
+from backend.routers.users import UserResponse
+
+RESPONSE_MODELS = {
+    "users": UserResponse,
+    "tasks": TaskResponse,
+    "applications": ApplicationResponse,
+    "chats": None,
+    "messages": MessageResponse,
+    "reviews": ReviewResponse,
+}
+PAGE_SIZE = 50
+
+
+def raw_documents(fixture, name):
+    """Snapshots as to_dict() | {"id": ...}, the shape database.py returns"""
+    if name == "messages":
+        paths = [f"chats/{chat_id}/messages" for chat_id in fixture.chat_ids]
+    else:
+        paths = [name]
+    return [doc.to_dict() | {"id": doc.id} for path in paths for doc in get_db().collection(path).stream()]
+
+
+def bytes_per_object(build, docs):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [build(doc) for doc in docs]
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return (allocated - sys.getsizeof(objects)) / len(objects)
+
+
+def best_seconds(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), statistics.median(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    fixture = seed()
+    print(f"{'collection':<13} {'docs':>6} {'dict B':>8} {'record B':>9} {'saved':>6} "
+          f"{'build dict us':>14} {'build rec us':>13} {'validate dict us':>17} {'validate rec us':>16}")
+    for name, model in RESPONSE_MODELS.items():
+        docs = raw_documents(fixture, name)
+        record = record_type(name)
+        dict_bytes = bytes_per_object(dict, docs)
+        record_bytes = bytes_per_object(record.from_document, docs)
+
+        build_dict, _ = best_seconds(lambda: [dict(doc) for doc in docs], args.repeat)
+        build_record, _ = best_seconds(lambda: [record.from_document(doc) for doc in docs], args.repeat)
+
+        validate = "n/a", "n/a"
+        if model is not None:
+            adapter = TypeAdapter(List[model])
+            dicts = docs[:PAGE_SIZE]
+            records = [record.from_document(doc) for doc in dicts]
+            validate = tuple(
+                f"{best_seconds(lambda: adapter.validate_python(page, from_attributes=from_attributes), args.repeat)[0] / len(page) * 1e6:.2f}"
+                for page, from_attributes in ((dicts, False), (records, True))
+            )
+
+        print(f"{name:<13} {len(docs):>6} {dict_bytes:>8.0f} {record_bytes:>9.0f} "
+              f"{1 - record_bytes / dict_bytes:>6.0%} {build_dict / len(docs) * 1e6:>14.2f} "
+              f"{build_record / len(docs) * 1e6:>13.2f} {validate[0]:>17} {validate[1]:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# backend/benchmarks/run.py
+
+"""
+Offline benchmark for every router endpoint against the in-memory Firestore stand-in.
+
+    DB_BACKEND=memory python -m backend.benchmarks.run --requests 200 --latency-ms 5
+
+Requests are driven straight through the ASGI app (no sockets), so the numbers reflect
+handler + storage cost. Reports throughput and p50/p95/p99 latency per endpoint.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+from urllib.parse import urlsplit
+
+os.environ.setdefault("DB_BACKEND", "memory")
+
+from backend import database
+from backend.benchmarks.app import app
+from backend.benchmarks.seed import CATEGORIES, CITIES, Fixture, seed
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    build: Callable[[Fixture, random.Random], Tuple[str, str, Optional[dict]]]
+    headers: Optional[dict] = None
+    # Send one unmeasured request first (e.g. the original of a retried request)
+    prime: bool = False
+
+
+def _task_body(rng):
+    city = rng.choice(list(CITIES))
+    return {
+        "title": "Benchmark task",
+        "description": "Regal aufbauen",
+        "category": rng.choice(CATEGORIES),
+        "location": city,
+        "latitude": CITIES[city][0],
+        "longitude": CITIES[city][1],
+        "budget": 40.0,
+        "images": [],
+        "deadline": None,
+        "preferred_time": None,
+        "time_flexible": True,
+    }
+
+
+def _price_query(f, r):
+    latitude, longitude = CITIES[r.choice(list(CITIES))]
+    return f"/api/tasks/price-suggestion?category={r.choice(CATEGORIES)}&latitude={latitude}&longitude={longitude}"
+
+
+def _as_any_user(path, body=None):
+    """Build a request issued by a random user"""
+    return lambda f, r: (r.choice(f.user_ids), path(f, r) if callable(path) else path, body(f, r) if body else None)
+
+
+def _as_task_creator(path, body=None):
+    def build(f, r):
+        task_id = r.choice(f.task_ids)
+        return f.task_creators[task_id], path(task_id), body(f, r) if body else None
+    return build
+
+
+def _as_applicant(f, r):
+    app_id = r.choice(f.application_ids)
+    return f.application_owners[app_id], f"/api/applications/{app_id}", None
+
+
+def _as_chat_member(path, body=None):
+    def build(f, r):
+        chat_id = r.choice(f.chat_ids)
+        return r.choice(f.chat_members[chat_id]), path(chat_id), body(chat_id) if body else None
+    return build
+
+
+ENDPOINTS = [
+    Endpoint("GET /api/tasks/", "GET", _as_any_user("/api/tasks/?limit=20")),
+    Endpoint("GET /api/tasks/?category", "GET",
+             _as_any_user(lambda f, r: f"/api/tasks/?category={r.choice(CATEGORIES)}&status_filter=open")),
+    Endpoint("GET /api/tasks/my-posted", "GET", _as_any_user("/api/tasks/my-posted")),
+    Endpoint("GET /api/tasks/my-assigned", "GET", _as_any_user("/api/tasks/my-assigned")),
+    Endpoint("GET /api/tasks/price-suggestion", "GET", _as_any_user(_price_query)),
+    Endpoint("GET /api/tasks/{task_id}", "GET", _as_any_user(lambda f, r: f"/api/tasks/{r.choice(f.task_ids)}")),
+    Endpoint("POST /api/tasks/", "POST", _as_any_user("/api/tasks/", lambda f, r: _task_body(r))),
+    Endpoint("POST /api/tasks/bulk", "POST",
+             _as_any_user("/api/tasks/bulk", lambda f, r: {"tasks": [_task_body(r) for _ in range(20)]})),
+    Endpoint("POST /api/tasks/batch-get", "POST",
+             _as_any_user("/api/tasks/batch-get", lambda f, r: {"ids": r.sample(f.task_ids, 20)})),
+    Endpoint("PUT /api/tasks/{task_id}", "PUT",
+             _as_task_creator(lambda task_id: f"/api/tasks/{task_id}", lambda f, r: {"budget": 55.0})),
+    Endpoint("GET /api/users/", "GET", _as_any_user("/api/users/?search=tasker1")),
+    Endpoint("GET /api/users/me", "GET", _as_any_user("/api/users/me")),
+    Endpoint("GET /api/users/{uid}", "GET", _as_any_user(lambda f, r: f"/api/users/{r.choice(f.user_ids)}")),
+    Endpoint("PUT /api/users/me", "PUT", _as_any_user("/api/users/me", lambda f, r: {"bio": "Hallo"})),
+    Endpoint("POST /api/users/batch-get", "POST",
+             _as_any_user("/api/users/batch-get", lambda f, r: {"uids": r.sample(f.user_ids, 20)})),
+    Endpoint("GET /api/applications/", "GET", _as_any_user("/api/applications/")),
+    Endpoint("GET /api/applications/{id}", "GET", _as_applicant),
+    Endpoint("GET /api/applications/task/{task_id}", "GET",
+             _as_task_creator(lambda task_id: f"/api/applications/task/{task_id}")),
+    Endpoint("POST /api/applications/", "POST", _as_any_user(
+        "/api/applications/",
+        lambda f, r: {"task_id": r.choice(f.open_task_ids), "message": "Ich helfe", "offered_price": 35.0})),
+    Endpoint("GET /api/chat/", "GET", _as_any_user("/api/chat/")),
+    Endpoint("GET /api/chat/{chat_id}/messages", "GET", _as_chat_member(lambda chat_id: f"/api/chat/{chat_id}/messages")),
+    Endpoint("POST /api/chat/send", "POST",
+             _as_chat_member(lambda chat_id: "/api/chat/send", lambda chat_id: {"chat_id": chat_id, "content": "Hallo"})),
+    Endpoint("POST /api/chat/start", "POST", _as_any_user(
+        "/api/chat/start", lambda f, r: {"task_id": r.choice(f.task_ids), "user2_id": r.choice(f.user_ids)})),
+    Endpoint("GET /api/reviews/", "GET", _as_any_user(lambda f, r: f"/api/reviews/?user_id={r.choice(f.user_ids)}")),
+    Endpoint("GET /api/reviews/me", "GET", _as_any_user("/api/reviews/me")),
+    Endpoint("POST /api/reviews/", "POST", _as_any_user(
+        "/api/reviews/",
+        lambda f, r: {"task_id": r.choice(f.task_ids), "reviewed_id": r.choice(f.user_ids), "rating": 5})),
+    # Every measured request is a client retry answered from the stored response
+    Endpoint("POST /api/reviews/ (retried)", "POST", lambda f, r: (
+        f.user_ids[0], "/api/reviews/", {"task_id": f.task_ids[0], "reviewed_id": f.user_ids[1], "rating": 5},
+    ), headers={"Idempotency-Key": "benchmark-retry"}, prime=True),
+    Endpoint("GET /api/notifications/", "GET", _as_any_user("/api/notifications/")),
+    Endpoint("POST /api/notifications/", "POST", _as_any_user(
+        "/api/notifications/", lambda f, r: {"type": "info", "title": "Hi", "message": "Benchmark"})),
+    Endpoint("PUT /api/notifications/read-all", "PUT", _as_any_user("/api/notifications/read-all")),
+]
+
+
+async def asgi_request(app, method, url, uid=None, body=None, headers=None):
+    """Drive a single request through the ASGI app and return (status, body bytes)"""
+    parts = urlsplit(url)
+    payload = json.dumps(body).encode() if body is not None else b""
+    raw_headers = [(b"host", b"bench"), (b"content-length", str(len(payload)).encode())]
+    if body is not None:
+        raw_headers.append((b"content-type", b"application/json"))
+    if uid:
+        raw_headers.append((b"authorization", f"Bearer {uid}".encode()))
+    for name, value in (headers or {}).items():
+        raw_headers.append((name.lower().encode(), value.encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    sent = False
+    status = None
+    chunks = []
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # ServerErrorMiddleware has already sent the 500 before re-raising
+        pass
+    return status, b"".join(chunks)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_endpoint(endpoint, fixture, requests, concurrency, rng):
+    latencies = []
+    statuses = {}
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+    if endpoint.prime:
+        uid, url, body = endpoint.build(fixture, rng)
+        await asgi_request(app, endpoint.method, url, uid, body, endpoint.headers)
+
+    async def worker():
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            uid, url, body = endpoint.build(fixture, rng)
+            started = time.perf_counter()
+            status, _ = await asgi_request(app, endpoint.method, url, uid, body, endpoint.headers)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": endpoint.name,
+        "requests": requests,
+        "rps": requests / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "statuses": statuses,
+    }
+
+
+async def main(args):
+    client = database.get_db()
+    client.latency = 0
+    fixture = seed(
+        users=args.users, tasks=args.tasks, applications=args.applications,
+        chats=args.chats, reviews=args.reviews, notifications=args.notifications,
+    )
+    client.latency = args.latency_ms / 1000.0
+
+    rng = random.Random(args.seed)
+    selected = [e for e in ENDPOINTS if not args.only or any(s in e.name for s in args.only)]
+    results = []
+    async with app.router.lifespan_context(app):
+        for endpoint in selected:
+            results.append(await run_endpoint(endpoint, fixture, args.requests, args.concurrency, rng))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'endpoint':<42} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    for r in results:
+        statuses = ",".join(f"{code}:{count}" for code, count in sorted(r["statuses"].items()))
+        print(f"{r['endpoint']:<42} {r['rps']:>9.1f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}  {statuses}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=float(os.getenv("MEMORY_DB_LATENCY_MS", "2")),
+                        help="injected latency per storage RPC")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--applications", type=int, default=3000)
+    parser.add_argument("--chats", type=int, default=300)
+    parser.add_argument("--reviews", type=int, default=500)
+    parser.add_argument("--notifications", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--only", nargs="*", help="substrings of endpoint names to run")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,163 @@
+# backend/benchmarks/scaling.py
+
+"""
+Load test for the production launcher: throughput with 1, 2, 4, ... workers.
+
+    python -m backend.benchmarks.scaling --workers 1 2 4 8 --duration 15
+
+For each worker count this starts `python -m backend.serve` with the benchmark app (every
+worker seeds its own in-memory store), drives it over keep-alive HTTP/1.1 connections from
+--clients load-generator processes, and reports requests/s, latency and scaling efficiency
+(rps / (workers * rps of one worker)). It then sends SIGTERM and checks the server drains
+and exits within its graceful timeout.
+
+The load generators need CPU too: on a single machine, give the server fewer workers than
+there are cores, or run this from a second machine against --host.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from backend.benchmarks.run import percentile
+
+PATHS = (
+    lambda r: f"/api/users/user-{r.randrange(200):05d}",
+    lambda r: f"/api/tasks/task-{r.randrange(1000):06d}",
+    lambda r: "/api/users/me",
+)
+
+
+async def _connection(host, port, deadline, rng, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    uid = f"user-{rng.randrange(200):05d}"
+    try:
+        while time.perf_counter() < deadline:
+            path = rng.choice(PATHS)(rng)
+            request = f"GET {path} HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {uid}\r\n\r\n"
+            started = time.perf_counter()
+            writer.write(request.encode())
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+def _client(host, port, connections, duration, seed, results):
+    """One load-generator process: connections concurrent keep-alive loops for duration seconds"""
+    latencies = []
+    rng = random.Random(seed)
+
+    async def run():
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(_connection(host, port, deadline, rng, latencies) for _ in range(connections)))
+
+    asyncio.run(run())
+    results.put(latencies)
+
+
+def generate_load(host, port, clients, connections, duration):
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_client, args=(host, port, connections, duration, seed, results))
+        for seed in range(clients)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    latencies = []
+    for _ in processes:
+        latencies.extend(results.get())
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(host, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1) as sock:
+                sock.sendall(b"GET /api/health HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n")
+                if sock.recv(64).startswith(b"HTTP/1.1 200"):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def start_server(workers, port, graceful_timeout):
+    env = {**os.environ, "DB_BACKEND": "memory", "BENCH_SEED": "1"}
+    return subprocess.Popen(
+        [sys.executable, "-m", "backend.serve", "--app", "backend.benchmarks.app:app",
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+         "--graceful-timeout", str(graceful_timeout), "--log-level", "warning"],
+        env=env,
+    )
+
+
+def main(args):
+    print(f"{'workers':>7} {'rps':>10} {'p50 ms':>9} {'p99 ms':>9} {'efficiency':>10} {'drain s':>8}")
+    baseline = None
+    for workers in args.workers:
+        port = _free_port()
+        server = start_server(workers, port, args.graceful_timeout)
+        try:
+            _wait_ready("127.0.0.1", port)
+            # Every worker has to have started (and seeded) before measuring
+            time.sleep(args.settle)
+            generate_load("127.0.0.1", port, args.clients, args.connections, min(2.0, args.duration))
+            result = generate_load("127.0.0.1", port, args.clients, args.connections, args.duration)
+        finally:
+            stopping = time.perf_counter()
+            server.send_signal(signal.SIGTERM)
+            try:
+                server.wait(args.graceful_timeout + 15)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                raise
+            drained = time.perf_counter() - stopping
+        baseline = baseline or result["rps"] / workers
+        efficiency = result["rps"] / (workers * baseline)
+        print(f"{workers:>7} {result['rps']:>10.1f} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+              f"{efficiency:>10.2f} {drained:>8.1f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=4, help="load-generator processes")
+    parser.add_argument("--connections", type=int, default=16, help="keep-alive connections per client")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of measured load per run")
+    parser.add_argument("--settle", type=float, default=3.0, help="seconds to wait for all workers to start")
+    parser.add_argument("--graceful-timeout", type=int, default=10)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    main(parse_args())
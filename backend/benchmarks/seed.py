@@ -0,0 +1,196 @@
+# backend/benchmarks/seed.py
+
+"""Seed realistic users, tasks, applications, chats, reviews and notifications"""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from backend import pricing
+from backend.database import add_documents
+
+CATEGORIES = ["Haushalt", "Garten", "Handwerk", "Transport", "Einkaufen", "Sonstiges"]
+CITIES = {
+    "Berlin": (52.520, 13.405),
+    "Hamburg": (53.551, 9.993),
+    "München": (48.137, 11.575),
+    "Köln": (50.937, 6.960),
+}
+TASK_STATUSES = ["open"] * 12 + ["matched"] * 4 + ["completed"] * 3 + ["cancelled"]
+
+
+@dataclass
+class Fixture:
+    user_ids: list = field(default_factory=list)
+    task_ids: list = field(default_factory=list)
+    open_task_ids: list = field(default_factory=list)
+    task_creators: dict = field(default_factory=dict)
+    application_ids: list = field(default_factory=list)
+    application_owners: dict = field(default_factory=dict)
+    chat_ids: list = field(default_factory=list)
+    chat_members: dict = field(default_factory=dict)
+    notification_owners: dict = field(default_factory=dict)
+
+
+def _timestamp(rng, days=90):
+    return datetime.now(timezone.utc) - timedelta(seconds=rng.randint(0, days * 86400))
+
+
+def seed(users=200, tasks=1000, applications=3000, chats=300, messages_per_chat=10,
+         reviews=500, notifications=1000, seed_value=42):
+    rng = random.Random(seed_value)
+    fixture = Fixture()
+
+    user_docs = {}
+    for i in range(users):
+        uid = f"user-{i:05d}"
+        city = rng.choice(list(CITIES))
+        created = _timestamp(rng, 365)
+        user_docs[uid] = {
+            "uid": uid,
+            "email": f"{uid}@example.com",
+            "username": f"tasker{i}",
+            "phone_number": "",
+            "display_name": f"Tasker {i}",
+            "avatar_url": "",
+            "location": city,
+            "radius": rng.choice([5, 10, 20, 50]),
+            "location_source": "manual",
+            "bio": "",
+            "rating": round(rng.uniform(3.0, 5.0), 2),
+            "rating_count": rng.randint(0, 80),
+            "completed_tasks": rng.randint(0, 60),
+            "posted_tasks": rng.randint(0, 30),
+            "is_verified": rng.random() < 0.3,
+            "created_at": created,
+            "updated_at": created,
+            "last_notification_read_at": created,
+        }
+    add_documents("users", user_docs)
+    fixture.user_ids = list(user_docs)
+
+    task_docs = {}
+    for i in range(tasks):
+        task_id = f"task-{i:06d}"
+        city = rng.choice(list(CITIES))
+        lat, lng = CITIES[city]
+        status = rng.choice(TASK_STATUSES)
+        creator = rng.choice(fixture.user_ids)
+        tasker = rng.choice(fixture.user_ids) if status in ("matched", "completed") else None
+        created = _timestamp(rng)
+        task_docs[task_id] = {
+            "id": task_id,
+            "title": f"Task {i}",
+            "description": "Brauche Hilfe " * rng.randint(3, 30),
+            "category": rng.choice(CATEGORIES),
+            "location": city,
+            "latitude": lat + rng.uniform(-0.2, 0.2),
+            "longitude": lng + rng.uniform(-0.3, 0.3),
+            "budget": round(rng.lognormvariate(3.5, 0.6), 2),
+            "status": status,
+            "creator_uid": creator,
+            "tasker_uid": tasker,
+            "images": [],
+            "deadline": None,
+            "preferred_time": None,
+            "time_flexible": rng.random() < 0.5,
+            "created_at": created,
+            "updated_at": created,
+            "completed_at": created + timedelta(days=2) if status == "completed" else None,
+        }
+        fixture.task_creators[task_id] = creator
+        if status == "open":
+            fixture.open_task_ids.append(task_id)
+    add_documents("tasks", task_docs)
+    fixture.task_ids = list(task_docs)
+
+    app_docs = {}
+    for i in range(applications):
+        app_id = f"app-{i:06d}"
+        task_id = rng.choice(fixture.task_ids)
+        applicant = rng.choice(fixture.user_ids)
+        created = _timestamp(rng)
+        budget = task_docs[task_id]["budget"]
+        app_docs[app_id] = {
+            "id": app_id,
+            "task_id": task_id,
+            "applicant_id": applicant,
+            "message": "Ich kann helfen",
+            "offered_price": round(budget * rng.uniform(0.7, 1.3), 2),
+            "status": "pending" if task_docs[task_id]["status"] == "open" else rng.choice(["accepted", "rejected"]),
+            "created_at": created,
+            "updated_at": created,
+        }
+        fixture.application_owners[app_id] = applicant
+    add_documents("applications", app_docs)
+    fixture.application_ids = list(app_docs)
+
+    chat_docs = {}
+    for i in range(chats):
+        chat_id = f"chat-{i:05d}"
+        task_id = rng.choice(fixture.task_ids)
+        user1, user2 = fixture.task_creators[task_id], rng.choice(fixture.user_ids)
+        created = _timestamp(rng)
+        chat_docs[chat_id] = {
+            "id": chat_id,
+            "task_id": task_id,
+            "user1_id": user1,
+            "user2_id": user2,
+            "last_message_at": created,
+            "location_shared": False,
+            "location_shared_by": None,
+            "location_accepted_by": None,
+            "created_at": created,
+            "updated_at": created,
+        }
+        fixture.chat_members[chat_id] = (user1, user2)
+        messages = {}
+        for j in range(messages_per_chat):
+            sender = rng.choice((user1, user2))
+            messages[f"msg-{i:05d}-{j:04d}"] = {
+                "chat_id": chat_id,
+                "sender_uid": sender,
+                "sender_id": sender,
+                "content": "Hallo!",
+                "message_type": "text",
+                "image_url": None,
+                "location_data": None,
+                "read_at": None,
+                "created_at": created + timedelta(minutes=j),
+            }
+        add_documents(f"chats/{chat_id}/messages", messages)
+    add_documents("chats", chat_docs)
+    fixture.chat_ids = list(chat_docs)
+
+    review_docs = {}
+    for i in range(reviews):
+        review_id = f"review-{i:06d}"
+        review_docs[review_id] = {
+            "id": review_id,
+            "task_id": rng.choice(fixture.task_ids),
+            "reviewer_id": rng.choice(fixture.user_ids),
+            "reviewed_id": rng.choice(fixture.user_ids),
+            "rating": rng.randint(1, 5),
+            "comment": "Super!",
+            "created_at": _timestamp(rng),
+        }
+    add_documents("reviews", review_docs)
+
+    notification_docs = {}
+    for i in range(notifications):
+        notification_id = f"notif-{i:06d}"
+        owner = rng.choice(fixture.user_ids)
+        notification_docs[notification_id] = {
+            "id": notification_id,
+            "user_id": owner,
+            "type": "application",
+            "title": "Neue Bewerbung",
+            "message": "Jemand hat sich beworben",
+            "data": {},
+            "read": rng.random() < 0.6,
+            "created_at": _timestamp(rng),
+        }
+        fixture.notification_owners[notification_id] = owner
+    add_documents("notifications", notification_docs)
+    pricing.rebuild()
+
+    return fixture
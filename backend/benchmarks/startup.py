@@ -0,0 +1,76 @@
+# backend/benchmarks/startup.py
+
+"""
+Measure cold start against a budget: import of backend.main, lifespan warm-up and the first
+request, each in a fresh interpreter like a new serverless container.
+
+    python -m backend.benchmarks.startup --budget-ms 1500 --runs 5
+
+Exits non-zero when the median total exceeds the budget. Uses the in-memory backend unless
+--backend firestore is given (which needs FIREBASE_SERVICE_ACCOUNT_KEY).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import asyncio, json, time
+started = time.perf_counter()
+from backend.main import app
+imported = time.perf_counter()
+
+async def probe():
+    from backend.benchmarks.run import asgi_request
+    async with app.router.lifespan_context(app):
+        warmed = time.perf_counter()
+        status, _ = await asgi_request(app, "GET", "/api/health")
+        answered = time.perf_counter()
+    return warmed, answered, status
+
+warmed, answered, status = asyncio.run(probe())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "warm_up_ms": (warmed - imported) * 1000,
+    "first_request_ms": (answered - warmed) * 1000,
+    "total_ms": (answered - started) * 1000,
+    "health_status": status,
+}))
+"""
+
+
+def measure(backend):
+    env = dict(os.environ, DB_BACKEND=backend, BLOB_BACKEND="local")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend", default="memory", choices=["memory", "firestore"])
+    args = parser.parse_args(argv)
+
+    runs = [measure(args.backend) for _ in range(args.runs)]
+    for key in ("import_ms", "warm_up_ms", "first_request_ms", "total_ms"):
+        values = [run[key] for run in runs]
+        print(f"{key:<18} median {statistics.median(values):8.1f}  max {max(values):8.1f}")
+
+    total = statistics.median(run["total_ms"] for run in runs)
+    if any(run["health_status"] != 200 for run in runs):
+        print("health check did not return 200")
+        return 1
+    if total > args.budget_ms:
+        print(f"over budget: {total:.1f} ms > {args.budget_ms:.1f} ms")
+        return 1
+    print(f"within budget: {total:.1f} ms <= {args.budget_ms:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
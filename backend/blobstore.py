@@ -0,0 +1,103 @@
+# backend/blobstore.py
+
+"""
+Pluggable storage for uploaded files.
+
+BLOB_BACKEND selects the implementation: "firebase" (the default) stores objects in the
+project's Cloud Storage bucket (FIREBASE_STORAGE_BUCKET) and returns their public URLs;
+"local" (for tests, benchmarks and offline development; set it explicitly) writes them under
+BLOB_LOCAL_ROOT and returns URLs below BLOB_BASE_URL, which main.py serves as static files.
+Like the database client, the store is built on first use, but check_config() runs at
+startup so a missing bucket fails the deploy instead of the first upload.
+
+Keys are never reused (they contain a fresh id), so objects are served as immutable.
+"""
+import os
+import threading
+from pathlib import Path
+
+BLOB_BACKEND = os.getenv("BLOB_BACKEND", "firebase")
+BLOB_LOCAL_ROOT = os.getenv("BLOB_LOCAL_ROOT", "media")
+BLOB_BASE_URL = os.getenv("BLOB_BASE_URL", "/media")
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class LocalBlobStore:
+    """Files on local disk; root is created on first write"""
+
+    def __init__(self, root, base_url):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def put(self, key, data, content_type):
+        """Store data under key and return its URL"""
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary name first so readers never see a partial file
+        partial = path.with_name(path.name + ".partial")
+        partial.write_bytes(data)
+        partial.replace(path)
+        return f"{self.base_url}/{key}"
+
+    def delete(self, key):
+        (self.root / key).unlink(missing_ok=True)
+
+
+class FirebaseBlobStore:
+    """Objects in the Firebase project's Cloud Storage bucket, publicly readable"""
+
+    def __init__(self, bucket_name):
+        from firebase_admin import storage
+        from backend.database import get_firebase_app
+
+        self.bucket = storage.bucket(bucket_name, app=get_firebase_app())
+
+    def put(self, key, data, content_type):
+        blob = self.bucket.blob(key)
+        blob.cache_control = CACHE_CONTROL
+        blob.upload_from_string(data, content_type=content_type)
+        blob.make_public()
+        return blob.public_url
+
+    def delete(self, key):
+        from google.api_core.exceptions import NotFound
+
+        try:
+            self.bucket.blob(key).delete()
+        except NotFound:
+            pass
+
+
+def check_config():
+    """Raise ValueError if BLOB_BACKEND cannot be used as configured (called from the app lifespan)"""
+    if BLOB_BACKEND not in ("firebase", "local"):
+        raise ValueError(f"Unknown BLOB_BACKEND: {BLOB_BACKEND}")
+    if BLOB_BACKEND == "firebase" and not os.getenv("FIREBASE_STORAGE_BUCKET"):
+        raise ValueError("FIREBASE_STORAGE_BUCKET is not set (or set BLOB_BACKEND=local outside production)")
+
+
+def _create_store():
+    check_config()
+    if BLOB_BACKEND == "firebase":
+        return FirebaseBlobStore(os.getenv("FIREBASE_STORAGE_BUCKET"))
+    return LocalBlobStore(BLOB_LOCAL_ROOT, BLOB_BASE_URL)
+
+
+def get_store():
+    """Return the blob store, creating it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _create_store()
+    return _store
+
+
+def use_store(store):
+    """Swap the blob store at runtime (e.g. a LocalBlobStore in a temporary directory)"""
+    global _store
+    _store = store
+    return store
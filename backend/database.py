@@ -1,36 +1,136 @@
 # backend/database.py
 
 import os
+import random
+import threading
+import time
 import uuid
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
 
-# Load environment variables
-load_dotenv()
+from backend import deadlines, metrics
+from backend.deadlines import rpc_options
 
-# Initialize Firebase Admin SDK
-cred_path = os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY")
-if not cred_path or not os.path.exists(cred_path):
-    raise ValueError("FIREBASE_SERVICE_ACCOUNT_KEY is not set or invalid")
+# Storage backend: "firestore" (default) or "memory" for offline runs and benchmarks.
+# Nothing is initialized at import time: the client is built on first use (or by warm_up()
+# from the app lifespan), so importing the package needs neither credentials nor the
+# firebase/grpc import cost.
+DB_BACKEND = os.getenv("DB_BACKEND", "firestore")
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate(cred_path)
-    firebase_admin.initialize_app(cred)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_firebase_app():
+    """Initialize the Firebase Admin SDK once and return the default app"""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if not firebase_admin._apps:
+        cred_path = os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY")
+        if not cred_path or not os.path.exists(cred_path):
+            raise ValueError("FIREBASE_SERVICE_ACCOUNT_KEY is not set or invalid")
+        firebase_admin.initialize_app(credentials.Certificate(cred_path))
+    return firebase_admin.get_app()
+
+
+def _create_client():
+    if DB_BACKEND == "memory":
+        from backend.memory_store import MemoryClient
+        return MemoryClient(latency_ms=float(os.getenv("MEMORY_DB_LATENCY_MS", "0")))
+
+    from firebase_admin import firestore
+    return firestore.client(get_firebase_app())
+
+
+def get_db():
+    """Return the storage client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client()
+    return _client
+
+
+def use_client(client):
+    """Swap the storage client at runtime (e.g. a MemoryClient with different latency)"""
+    global _client
+    _client = client
+    return client
+
+
+def ping():
+    """One cheap read against the backend; returns its latency in seconds"""
+    started = time.perf_counter()
+    get_db().collection("_health").document("ping").get(**rpc_options())
+    return time.perf_counter() - started
+
+
+def warm_up():
+    """
+    Pay cold-start costs before the first request: build the client, open the gRPC channel
+    and fetch credentials with a first read, and import the auth module token checks use.
+    Returns the timings of each step in milliseconds.
+    """
+    timings = {}
+    started = time.perf_counter()
+    get_db()
+    timings["client_ms"] = (time.perf_counter() - started) * 1000
+    timings["first_read_ms"] = ping() * 1000
+    if DB_BACKEND != "memory":
+        started = time.perf_counter()
+        from firebase_admin import auth  # noqa: F401
+        timings["auth_import_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def instrument(kind, collection=None, documents=None):
+    """metrics.instrument around deadlines.guard, so a helper is timed once however many attempts it takes"""
+    def decorator(func):
+        return metrics.instrument(kind, collection, documents)(deadlines.guard(kind)(func))
+    return decorator
+
+
+# Firestore rejects write batches with more than 500 operations
+MAX_BATCH_WRITES = 500
+# Each Firestore document sustains about one write per second; hot counters are split
+# over this many shard documents in a "counters" subcollection
+COUNTER_SHARDS = 5
+
+
+class WriteConflict(Exception):
+    """Raised when a document changed between the read and a conditional write"""
 
-# Firestore client
-db = firestore.client()
 
 def now():
+    from firebase_admin import firestore
     return firestore.SERVER_TIMESTAMP
 
+def array_union(values):
+    """Append values to an array field (skipping ones already present) without reading it"""
+    from firebase_admin import firestore
+    return firestore.ArrayUnion(values)
+
+def add_to_field(amount):
+    """Add amount to a numeric field (missing counts as 0) without reading it"""
+    from firebase_admin import firestore
+    return firestore.Increment(amount)
+
 def generate_id():
     return str(uuid.uuid4())
 
+def resolve_server_timestamps(data, commit_time):
+    """Replace SERVER_TIMESTAMP sentinels in data (in place) with the write's commit time"""
+    from firebase_admin import firestore
+    for key, value in data.items():
+        if value is firestore.SERVER_TIMESTAMP:
+            data[key] = commit_time
+    return data
+
 # USERS
 
+@instrument("write", "users")
 def create_user(uid, data):
-    user_ref = db.collection("users").document(uid)
+    user_ref = get_db().collection("users").document(uid)
     data.update({
         "uid": uid,
         "created_at": now(),
@@ -42,14 +142,16 @@ def create_user(uid, data):
         "posted_tasks": 0,
         "is_verified": False,
     })
-    user_ref.set(data)
+    user_ref.set(data, **rpc_options())
     return user_ref.id
 
+@instrument("read", "users")
 def get_user(uid):
-    return db.collection("users").document(uid).get().to_dict()
+    return get_db().collection("users").document(uid).get(**rpc_options()).to_dict()
 
 # TASKS
 
+@instrument("write", "tasks")
 def create_task(data):
     task_id = generate_id()
     data.update({
@@ -59,14 +161,16 @@ def create_task(data):
         "completed_at": None,
         "images": data.get("images", [])
     })
-    db.collection("tasks").document(task_id).set(data)
+    get_db().collection("tasks").document(task_id).set(data, **rpc_options())
     return task_id
 
+@instrument("read", "tasks")
 def get_task(task_id):
-    return db.collection("tasks").document(task_id).get().to_dict()
+    return get_db().collection("tasks").document(task_id).get(**rpc_options()).to_dict()
 
 # APPLICATIONS
 
+@instrument("write", "applications")
 def create_application(task_id, applicant_uid, data):
     app_id = generate_id()
     data.update({
@@ -75,15 +179,17 @@ def create_application(task_id, applicant_uid, data):
         "updated_at": now(),
         "status": "pending"
     })
-    db.collection("tasks").document(task_id).collection("applications").document(app_id).set(data)
+    get_db().collection("tasks").document(task_id).collection("applications").document(app_id).set(data, **rpc_options())
     return app_id
 
+@instrument("read", "applications")
 def get_applications(task_id):
-    apps = db.collection("tasks").document(task_id).collection("applications").stream()
+    apps = get_db().collection("tasks").document(task_id).collection("applications").stream(**rpc_options())
     return [app.to_dict() | {"id": app.id} for app in apps]
 
 # CHATS
 
+@instrument("write", "chats")
 def create_chat(data):
     chat_id = generate_id()
     data.update({
@@ -94,73 +200,352 @@ def create_chat(data):
         "location_shared_by": None,
         "location_accepted_by": None
     })
-    db.collection("chats").document(chat_id).set(data)
+    get_db().collection("chats").document(chat_id).set(data, **rpc_options())
     return chat_id
 
+@instrument("read", "chats")
 def get_chat(chat_id):
-    return db.collection("chats").document(chat_id).get().to_dict()
+    return get_db().collection("chats").document(chat_id).get(**rpc_options()).to_dict()
 
 # MESSAGES
 
-def send_message(chat_id, sender_uid, message_data):
-    msg_id = generate_id()
+@instrument("write", "messages", documents=lambda args: 2)
+def send_message(chat_id, sender_uid, message_data, msg_id=None, extra=()):
+    msg_id = msg_id or generate_id()
     message_data.update({
         "sender_uid": sender_uid,
         "created_at": now(),
         "read_at": None,
         "message_type": message_data.get("message_type", "text")
     })
-    db.collection("chats").document(chat_id).collection("messages").document(msg_id).set(message_data)
-    db.collection("chats").document(chat_id).update({"last_message_at": now()})
+    ref = get_db().collection("chats").document(chat_id).collection("messages").document(msg_id)
+    if extra:
+        batch = get_db().batch()
+        batch.set(ref, message_data)
+        _add_extra(batch, extra)
+        result = batch.commit(**rpc_options())[0]
+    else:
+        result = ref.set(message_data, **rpc_options())
+    resolve_server_timestamps(message_data, result.update_time)
+    get_db().collection("chats").document(chat_id).update({"last_message_at": now()}, **rpc_options())
     return msg_id
 
+@instrument("read", "messages")
 def get_chat_messages(chat_id):
-    msgs = db.collection("chats").document(chat_id).collection("messages").order_by("created_at").stream()
+    msgs = get_db().collection("chats").document(chat_id).collection("messages").order_by("created_at").stream(**rpc_options())
     return [msg.to_dict() | {"id": msg.id} for msg in msgs]
 
 # REVIEWS
 
+@instrument("write", "reviews")
 def create_review(data):
     review_id = generate_id()
     data.update({"created_at": now()})
-    db.collection("reviews").document(review_id).set(data)
+    get_db().collection("reviews").document(review_id).set(data, **rpc_options())
     return review_id
 
+@instrument("read", "reviews")
 def get_reviews():
-    reviews = db.collection("reviews").stream()
+    reviews = get_db().collection("reviews").stream(**rpc_options())
     return [r.to_dict() | {"id": r.id} for r in reviews]
 
 # NOTIFICATIONS
 
+@instrument("write", "notifications")
 def create_notification(user_uid, notif_data):
     notif_id = generate_id()
     notif_data.update({
         "read": False,
         "created_at": now()
     })
-    db.collection("users").document(user_uid).collection("notifications").document(notif_id).set(notif_data)
+    get_db().collection("users").document(user_uid).collection("notifications").document(notif_id).set(notif_data, **rpc_options())
     return notif_id
 
+@instrument("read", "notifications")
 def get_notifications(user_uid):
-    notifs = db.collection("users").document(user_uid).collection("notifications").order_by("created_at", direction=firestore.Query.DESCENDING).stream()
+    notifs = get_db().collection("users").document(user_uid).collection("notifications").order_by("created_at", direction="DESCENDING").stream(**rpc_options())
     return [n.to_dict() | {"id": n.id} for n in notifs]
 
 # Generic helpers (used by auth.py and other routes)
 
+@instrument("read")
 def get_all_documents(collection_name):
-    docs = db.collection(collection_name).stream()
+    docs = get_db().collection(collection_name).stream(**rpc_options())
     return [doc.to_dict() | {"id": doc.id} for doc in docs]
 
+@instrument("read")
 def get_document(collection_name, doc_id):
-    doc = db.collection(collection_name).document(doc_id).get()
+    doc = get_db().collection(collection_name).document(doc_id).get(**rpc_options())
     return doc.to_dict() if doc.exists else None
 
-def add_document(collection_name, doc_id, data):
-    db.collection(collection_name).document(doc_id).set(data)
+@instrument("read")
+def get_documents(collection_name, doc_ids):
+    """Fetch many documents in a single RPC, preserving the order of doc_ids"""
+    doc_ids = list(dict.fromkeys(doc_ids))
+    if not doc_ids:
+        return []
+    refs = [get_db().collection(collection_name).document(doc_id) for doc_id in doc_ids]
+    found = {doc.id: doc.to_dict() for doc in get_db().get_all(refs, **rpc_options()) if doc.exists}
+    return [found[doc_id] for doc_id in doc_ids if doc_id in found]
+
+@instrument("read")
+def query_documents(collection_name, filters=(), order_by=None, descending=False, limit=None, start_after=None):
+    """
+    Run a server-side query; filters is a sequence of (field, op, value) tuples. order_by is
+    one field (direction set by descending) or a list of (field, descending) pairs, and
+    start_after a dict of values for those fields to resume after.
+    """
+    query = get_db().collection(collection_name)
+    for field, op, value in filters:
+        query = query.where(field, op, value)
+    if isinstance(order_by, str):
+        order_by = [(order_by, descending)]
+    for field, desc in order_by or ():
+        query = query.order_by(field, direction="DESCENDING" if desc else "ASCENDING")
+    if start_after is not None:
+        query = query.start_after(start_after)
+    if limit:
+        query = query.limit(limit)
+    return [doc.to_dict() | {"id": doc.id} for doc in query.stream(**rpc_options())]
+
+@instrument("read")
+def page_documents(collection_name, after_id=None, limit=500):
+    """One page of a collection in document id order, starting after after_id (a resumable cursor)"""
+    collection = get_db().collection(collection_name)
+    query = collection.order_by("__name__").limit(limit)
+    if after_id is not None:
+        query = query.start_after({"__name__": collection.document(after_id)})
+    return [doc.to_dict() | {"id": doc.id} for doc in query.stream(**rpc_options())]
+
+@instrument("listen", documents=lambda args: 0)
+def watch_documents(collection_name, filters, on_change):
+    """
+    Attach a snapshot listener to a query. on_change(kind, document) is called on the
+    listener's thread for every change, kind being "added", "modified" or "removed"; the
+    initial snapshot arrives as "added". Returns the watch; call unsubscribe() on it to stop.
+    """
+    query = get_db().collection(collection_name)
+    for field, op, value in filters:
+        query = query.where(field, op, value)
+
+    def callback(snapshots, changes, read_time):
+        for change in changes:
+            on_change(change.type.name.lower(), change.document.to_dict() | {"id": change.document.id})
+
+    return query.on_snapshot(callback)
+
+@instrument("read", documents=lambda args: 1)
+def aggregate_documents(collection_name, filters=(), count=True, sum_fields=(), avg_fields=()):
+    """
+    Server-side aggregation (billed as index reads, no documents transferred).
+    Returns {"count": n, "sum_<field>": x, "avg_<field>": y}.
+    """
+    query = get_db().collection(collection_name)
+    for field, op, value in filters:
+        query = query.where(field, op, value)
+
+    aggregation = None
+    specs = ([("count", None)] if count else []) + [("sum", f) for f in sum_fields] + [("avg", f) for f in avg_fields]
+    for kind, field in specs:
+        alias = kind if field is None else f"{kind}_{field}"
+        target = aggregation or query
+        aggregation = target.count(alias=alias) if kind == "count" else getattr(target, kind)(field, alias=alias)
+
+    if aggregation is None:
+        return {}
+    return {result.alias: result.value for row in aggregation.get(**rpc_options()) for result in row}
+
+@instrument("write")
+def add_document(collection_name, doc_id, data, increments=(), extra=()):
+    ref = get_db().collection(collection_name).document(doc_id)
+    if increments or extra:
+        batch = get_db().batch()
+        batch.set(ref, data)
+        _add_increments(batch, increments)
+        _add_extra(batch, extra)
+        result = batch.commit(**rpc_options())[0]
+    else:
+        result = ref.set(data, **rpc_options())
+    resolve_server_timestamps(data, result.update_time)
     return doc_id
 
-def update_document(collection_name, doc_id, data):
-    db.collection(collection_name).document(doc_id).update(data)
+@instrument("write")
+def create_document(collection_name, doc_id, data):
+    """Write data only if doc_id does not exist yet; raises WriteConflict if it does"""
+    from google.api_core.exceptions import AlreadyExists
+
+    try:
+        result = get_db().collection(collection_name).document(doc_id).create(data, **rpc_options())
+    except AlreadyExists as exc:
+        raise WriteConflict(f"{collection_name}/{doc_id} already exists") from exc
+    resolve_server_timestamps(data, result.update_time)
+    return doc_id
 
-def delete_document(collection_name, doc_id):
-    db.collection(collection_name).document(doc_id).delete()
+@instrument("write", documents=lambda args: len(args[1]))
+def add_documents(collection_name, docs, increments=(), extra=()):
+    """
+    Write many documents with batched writes; docs maps doc_id -> data. Increments and extra
+    documents go with the first batch
+    """
+    items = list(docs.items())
+    step = MAX_BATCH_WRITES - len(increments) - len(extra)
+    for start in range(0, len(items), step):
+        batch = get_db().batch()
+        for doc_id, data in items[start:start + step]:
+            batch.set(get_db().collection(collection_name).document(doc_id), data)
+        if start == 0:
+            _add_increments(batch, increments)
+            _add_extra(batch, extra)
+        results = batch.commit(**rpc_options())
+        for (_, data), result in zip(items[start:start + step], results):
+            resolve_server_timestamps(data, result.update_time)
+    return [doc_id for doc_id, _ in items]
+
+@instrument("write", documents=lambda args: len(args[1]))
+def merge_documents(collection_name, docs):
+    """
+    Merge fields into many documents (doc_id -> data) with batched writes, creating missing
+    ones; nested maps are merged key by key rather than replaced
+    """
+    items = list(docs.items())
+    for start in range(0, len(items), MAX_BATCH_WRITES):
+        batch = get_db().batch()
+        for doc_id, data in items[start:start + MAX_BATCH_WRITES]:
+            batch.set(get_db().collection(collection_name).document(doc_id), data, merge=True)
+        batch.commit(**rpc_options())
+
+@instrument("write")
+def update_document(collection_name, doc_id, data, extra=()):
+    ref = get_db().collection(collection_name).document(doc_id)
+    if extra:
+        batch = get_db().batch()
+        batch.update(ref, data)
+        _add_extra(batch, extra)
+        result = batch.commit(**rpc_options())[0]
+    else:
+        result = ref.update(data, **rpc_options())
+    resolve_server_timestamps(data, result.update_time)
+
+@instrument("read")
+def get_document_versioned(collection_name, doc_id):
+    """Return (data, update_time); update_time is the precondition for update_document_if_unchanged"""
+    doc = get_db().collection(collection_name).document(doc_id).get(**rpc_options())
+    if not doc.exists:
+        return None, None
+    return doc.to_dict(), doc.update_time
+
+@instrument("write")
+def update_document_if_unchanged(collection_name, doc_id, current, update_time, data, increments=(), extra=()):
+    """
+    Apply data only if the document was not written since it was read at update_time.
+    Returns the merged document without reading it back; server timestamps resolve to
+    the commit time. Raises WriteConflict on a lost update.
+    """
+    from google.api_core.exceptions import FailedPrecondition
+
+    db = get_db()
+    option = db.write_option(last_update_time=update_time)
+    batch = db.batch()
+    batch.update(db.collection(collection_name).document(doc_id), data, option=option)
+    _add_increments(batch, increments)
+    _add_extra(batch, extra)
+    try:
+        result = batch.commit(**rpc_options())[0]
+    except FailedPrecondition as exc:
+        raise WriteConflict(f"{collection_name}/{doc_id} was modified concurrently") from exc
+
+    return {**current, **resolve_server_timestamps(dict(data), result.update_time)}
+
+@instrument("write")
+def delete_document(collection_name, doc_id, increments=(), extra=()):
+    ref = get_db().collection(collection_name).document(doc_id)
+    if increments or extra:
+        batch = get_db().batch()
+        batch.delete(ref)
+        _add_increments(batch, increments)
+        _add_extra(batch, extra)
+        batch.commit(**rpc_options())
+    else:
+        ref.delete(**rpc_options())
+
+@instrument("write", documents=lambda args: len(args[1]))
+def delete_documents(collection_name, doc_ids):
+    """Delete many documents with batched writes"""
+    doc_ids = list(doc_ids)
+    for start in range(0, len(doc_ids), MAX_BATCH_WRITES):
+        batch = get_db().batch()
+        for doc_id in doc_ids[start:start + MAX_BATCH_WRITES]:
+            batch.delete(get_db().collection(collection_name).document(doc_id))
+        batch.commit(**rpc_options())
+
+@instrument("write", documents=lambda args: len(args[1]))
+def update_documents(collection_name, updates):
+    """Apply many partial updates (doc_id -> fields) with batched writes"""
+    items = list(updates.items())
+    for start in range(0, len(items), MAX_BATCH_WRITES):
+        batch = get_db().batch()
+        for doc_id, data in items[start:start + MAX_BATCH_WRITES]:
+            batch.update(get_db().collection(collection_name).document(doc_id), data)
+        batch.commit(**rpc_options())
+
+@instrument("write", documents=lambda args: 2 * len(args[1]))
+def move_documents(collection_name, docs, target_collection):
+    """
+    Copy docs (doc_id -> data) into target_collection and delete them from collection_name.
+    The copy and the delete of a document share a batch, so it is never in both or neither.
+    """
+    items = list(docs.items())
+    step = MAX_BATCH_WRITES // 2
+    for start in range(0, len(items), step):
+        batch = get_db().batch()
+        for doc_id, data in items[start:start + step]:
+            batch.set(get_db().collection(target_collection).document(doc_id), data)
+            batch.delete(get_db().collection(collection_name).document(doc_id))
+        batch.commit(**rpc_options())
+
+# COUNTERS
+
+def increment(collection_name, doc_id, field, amount=1):
+    """Counter update to commit atomically with a write (see the increments argument)"""
+    return ("field", collection_name, doc_id, field, amount)
+
+def sharded_increment(collection_name, doc_id, counter, amount=1):
+    """Like increment, but lands on a random shard so hot documents avoid write contention"""
+    return ("shard", collection_name, doc_id, counter, amount)
+
+def _shard_ref(collection_name, doc_id, counter, shard):
+    return get_db().collection(collection_name).document(doc_id).collection("counters").document(f"{counter}_{shard}")
+
+def _add_extra(batch, extra):
+    """
+    Set extra documents, (collection_name, doc_id, data) tuples, in the batch of another write;
+    e.g. jobs.new_job() outbox entries, so a job exists exactly when the write it follows does
+    """
+    for collection_name, doc_id, data in extra:
+        batch.set(get_db().collection(collection_name).document(doc_id), data)
+
+def _add_increments(batch, increments):
+    from firebase_admin import firestore
+
+    for kind, collection_name, doc_id, field, amount in increments:
+        if kind == "shard":
+            ref = _shard_ref(collection_name, doc_id, field, random.randrange(COUNTER_SHARDS))
+            batch.set(ref, {"count": firestore.Increment(amount)}, merge=True)
+        else:
+            ref = get_db().collection(collection_name).document(doc_id)
+            batch.update(ref, {field: firestore.Increment(amount)})
+
+@instrument("read")
+def get_sharded_counts(collection_name, doc_ids, counter):
+    """Sum the shards of a counter for many documents with one multi-get; returns {doc_id: count}"""
+    doc_ids = list(dict.fromkeys(doc_ids))
+    counts = {doc_id: 0 for doc_id in doc_ids}
+    refs = {
+        _shard_ref(collection_name, doc_id, counter, shard).path: doc_id
+        for doc_id in doc_ids for shard in range(COUNTER_SHARDS)
+    }
+    if refs:
+        for shard in get_db().get_all([get_db().document(path) for path in refs], **rpc_options()):
+            if shard.exists:
+                counts[refs[shard.reference.path]] += shard.to_dict().get("count", 0)
+    return counts
@@ -0,0 +1,206 @@
+# backend/deadlines.py
+
+"""
+Time budgets, retries and hedging for Firestore calls.
+
+Every HTTP request gets a deadline (REQUEST_DEADLINE_SECONDS from arrival) in a context
+variable, which run_in_threadpool copies into the threads the route handlers run on. Each RPC
+made through database.py passes rpc_options(): a timeout that is the smaller of what is left
+of the budget and RPC_TIMEOUT_SECONDS, and retry=None so the client library does not retry
+on its own schedule past our deadline. Once the budget is spent, the next call raises
+DeadlineExceeded, which the app answers with 504.
+
+Reads are idempotent, so guard("read") retries transient errors (UNAVAILABLE, ABORTED,
+INTERNAL, DEADLINE_EXCEEDED) up to READ_ATTEMPTS times with full-jitter exponential backoff,
+never sleeping past the deadline. Writes are not retried here: a write that timed out may
+have been applied, so the error goes back to the caller (503, or the job queue's backoff).
+
+With HEDGE_READS=1 a read that has not answered within the p95 latency of that helper is
+sent a second time and whichever copy finishes first wins, trading a few percent extra
+reads for a shorter tail.
+
+Retry backoff and hedging block the calling thread, so the database helpers must never run on
+the event loop: route handlers that use them are plain def functions (FastAPI runs those in
+its threadpool), and async code such as background loops, SSE streams and upload handlers
+calls them through run_in_threadpool.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import ContextVar, copy_context
+from functools import wraps
+
+from backend import metrics
+
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "10"))
+RPC_TIMEOUT_SECONDS = float(os.getenv("RPC_TIMEOUT_SECONDS", "10"))
+READ_ATTEMPTS = int(os.getenv("DB_READ_ATTEMPTS", "3"))
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_MAX_SECONDS = 1.0
+HEDGE_READS = os.getenv("HEDGE_READS", "0") == "1"
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "16"))
+# A p95 from fewer samples than this is noise; don't hedge on it
+HEDGE_MIN_SAMPLES = 50
+LATENCY_WINDOW = 500
+# Server-Sent Event streams stay open for minutes; they only bound individual RPCs
+UNBOUNDED_PATH_SUFFIXES = ("/stream",)
+
+metrics.describe("doit_db_retries_total", "counter", "Firestore reads retried after a transient error")
+metrics.describe("doit_db_hedged_reads_total", "counter", "Firestore reads sent a second time after the p95 delay")
+metrics.describe("doit_deadline_exceeded_total", "counter", "Requests that ran out of their time budget")
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before a Firestore call could be made or retried"""
+
+
+_deadline = ContextVar("deadline", default=None)
+
+
+def start(seconds=REQUEST_DEADLINE_SECONDS):
+    """Set a deadline seconds from now for the current context; returns a token for end()"""
+    return _deadline.set(time.monotonic() + seconds)
+
+
+def end(token):
+    _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left in the current budget, or None outside a request"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def rpc_options():
+    """timeout/retry keyword arguments for one Firestore RPC; raises DeadlineExceeded if none is left"""
+    left = remaining()
+    if left is None:
+        return {"timeout": RPC_TIMEOUT_SECONDS, "retry": None}
+    if left <= 0:
+        metrics.inc("doit_deadline_exceeded_total", {"route": metrics.current_route()})
+        raise DeadlineExceeded("Request deadline exceeded")
+    return {"timeout": min(left, RPC_TIMEOUT_SECONDS), "retry": None}
+
+
+def is_transient(exc):
+    """Whether exc is a Firestore error worth retrying (or answering 503 to)"""
+    from google.api_core import exceptions
+
+    return isinstance(exc, (
+        exceptions.ServiceUnavailable,
+        exceptions.Aborted,
+        exceptions.InternalServerError,
+        exceptions.DeadlineExceeded,
+    ))
+
+
+class LatencyWindow:
+    """The last LATENCY_WINDOW latencies of one helper, with a p95 recomputed every few samples"""
+
+    def __init__(self):
+        self.samples = deque(maxlen=LATENCY_WINDOW)
+        self.added = 0
+        self._p95 = None
+
+    def add(self, sample):
+        self.samples.append(sample)
+        self.added += 1
+        if self.added % 20 == 0 and len(self.samples) >= HEDGE_MIN_SAMPLES:
+            ordered = sorted(self.samples)
+            self._p95 = ordered[int(len(ordered) * 0.95)]
+
+    def p95(self):
+        return self._p95
+
+
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+
+def _pool():
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _hedge_pool_lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+    return _hedge_pool
+
+
+def _submit(func, args, kwargs):
+    # Each copy runs in its own copy of the caller's context (deadline, request metrics)
+    return _pool().submit(copy_context().run, func, *args, **kwargs)
+
+
+def _hedged(func, args, kwargs, window, op):
+    delay = window.p95()
+    left = remaining()
+    if delay is None or (left is not None and left <= delay):
+        return func(*args, **kwargs)
+
+    primary = _submit(func, args, kwargs)
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+
+    hedge = _submit(func, args, kwargs)
+    pending = {primary, hedge}
+    error = None
+    while pending:
+        done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+        if not done:
+            raise DeadlineExceeded("Request deadline exceeded")
+        for future in done:
+            if future.exception() is None:
+                winner = "hedge" if future is hedge else "primary"
+                metrics.inc("doit_db_hedged_reads_total", {"op": op, "winner": winner})
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def guard(kind):
+    """Decorate a database helper: reads are retried (and hedged if enabled), writes bounded only"""
+    def decorator(func):
+        if kind != "read":
+            return func
+        op = func.__name__
+        window = LatencyWindow()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(READ_ATTEMPTS):
+                started = time.perf_counter()
+                try:
+                    if HEDGE_READS:
+                        result = _hedged(func, args, kwargs, window, op)
+                    else:
+                        result = func(*args, **kwargs)
+                except Exception as exc:
+                    if attempt == READ_ATTEMPTS - 1 or not is_transient(exc):
+                        raise
+                    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                    left = remaining()
+                    if left is not None and left <= delay:
+                        raise
+                    metrics.inc("doit_db_retries_total", {"op": op})
+                    time.sleep(delay)
+                else:
+                    window.add(time.perf_counter() - started)
+                    return result
+        return wrapper
+    return decorator
+
+
+async def request_deadline(request, call_next):
+    """HTTP middleware giving each request its REQUEST_DEADLINE_SECONDS budget"""
+    if request.url.path.endswith(UNBOUNDED_PATH_SUFFIXES):
+        return await call_next(request)
+    token = start()
+    try:
+        return await call_next(request)
+    finally:
+        end(token)
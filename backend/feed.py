@@ -0,0 +1,149 @@
+# backend/feed.py
+
+"""
+Materialized task feed.
+
+Open tasks are fanned out into the "task_feed" collection with one entry per geohash cell
+(at every precision in FEED_PRECISIONS) holding a snapshot of the task. A user's feed page is
+then a query for the 3x3 block of cells around them at the precision matching their radius,
+ordered by created_at and then task_id (repeated while category or distance filtering leaves
+the page short), so its cost depends on the page size and not on how many open tasks exist. Tasks or users
+without coordinates fall back to a cell keyed by location name. Tasks created together share
+one commit time, so pages resume after a (created_at, task_id) cursor, not created_at alone.
+
+Tasks that were open before the feed existed are published by the "task_feed_backfill"
+migration (python -m backend.migrations run task_feed_backfill).
+"""
+from backend import geo
+from backend.database import add_documents, delete_documents, get_documents, query_documents
+
+FEED_COLLECTION = "task_feed"
+FEED_PRECISIONS = (2, 3, 4, 5)
+DEFAULT_RADIUS_KM = 20
+# Entries outside the exact radius or preferred categories are dropped after the query
+OVERFETCH = 3
+# Needs a composite index on task_feed: cell, created_at descending, task_id ascending
+FEED_ORDER = [("created_at", True), ("task_id", False)]
+
+
+def _location_cell(location):
+    # Document ids cannot contain "/"
+    return f"loc:{location.strip().lower().replace('/', '-')}" if location and location.strip() else None
+
+
+def task_cells(task):
+    if task.get("latitude") is not None and task.get("longitude") is not None:
+        return [geo.encode(task["latitude"], task["longitude"], p) for p in FEED_PRECISIONS]
+    cell = _location_cell(task.get("location"))
+    return [cell] if cell else []
+
+
+def user_cells(user):
+    if user.get("latitude") is not None and user.get("longitude") is not None:
+        radius = user.get("radius") or DEFAULT_RADIUS_KM
+        return geo.covering_cells(user["latitude"], user["longitude"], radius, FEED_PRECISIONS)
+    cell = _location_cell(user.get("location"))
+    return [cell] if cell else []
+
+
+def _entry_id(task_id, cell):
+    return f"{task_id}_{cell}"
+
+
+def _entry(task, cell):
+    return {
+        "cell": cell,
+        "task_id": task["id"],
+        "category": task.get("category"),
+        "created_at": task.get("created_at"),
+        "task": task,
+    }
+
+
+def feed_entries(task):
+    """The feed documents (entry id -> entry) of a task; none unless it is open"""
+    if task.get("status") != "open":
+        return {}
+    return {_entry_id(task["id"], cell): _entry(task, cell) for cell in task_cells(task)}
+
+
+def publish_tasks(tasks):
+    """
+    Fan newly created tasks out to their cells in one batched write. Feed jobs can run late or
+    out of order (e.g. after the task was accepted or deleted), so the tasks are re-read and
+    only those still open are published, as they are now.
+    """
+    entries = {}
+    for task in get_documents("tasks", [task["id"] for task in tasks]):
+        entries.update(feed_entries(task))
+    if entries:
+        add_documents(FEED_COLLECTION, entries)
+
+
+def refresh_task(old):
+    """
+    Re-publish a task after an update of old (the task as it was) and drop entries for cells
+    it left. Like publish_tasks this goes by the task's current document, in case a later
+    change (or the delete) was applied first.
+    """
+    current = get_documents("tasks", [old["id"]])
+    entries = feed_entries(current[0]) if current else {}
+    stale = {_entry_id(task["id"], cell) for task in [old, *current] for cell in task_cells(task)} - entries.keys()
+    if stale:
+        delete_documents(FEED_COLLECTION, sorted(stale))
+    if entries:
+        add_documents(FEED_COLLECTION, entries)
+
+
+def remove_task(task):
+    entries = [_entry_id(task["id"], cell) for cell in task_cells(task)]
+    if entries:
+        delete_documents(FEED_COLLECTION, entries)
+
+
+def _matches(user, task):
+    categories = user.get("preferred_categories")
+    if categories and task.get("category") not in categories:
+        return False
+    if task.get("creator_uid") == user.get("uid"):
+        return False
+    coords = (user.get("latitude"), user.get("longitude"), task.get("latitude"), task.get("longitude"))
+    if None in coords:
+        return True
+    return geo.distance_km(*coords) <= (user.get("radius") or DEFAULT_RADIUS_KM)
+
+
+def read_feed(user, limit=20, before=None, before_id=None):
+    """
+    One page of open tasks for the user, newest first. The next page starts after the last
+    task's created_at and id, passed as before and before_id (before alone, from older
+    clients, skips every task created at that instant).
+    """
+    cells = user_cells(user)
+    if not cells:
+        return []
+
+    # A short page tells the client the feed ended, so keep reading until the page is full
+    # or there are no older entries
+    page, seen = [], set()
+    batch = limit * OVERFETCH
+    after = None
+    filters = [("cell", "in", cells)]
+    if before is not None and before_id is not None:
+        after = {"created_at": before, "task_id": before_id}
+    elif before is not None:
+        filters.append(("created_at", "<", before))
+    while len(page) < limit:
+        entries = query_documents(FEED_COLLECTION, filters, order_by=FEED_ORDER, limit=batch, start_after=after)
+        for entry in entries:
+            task = entry["task"]
+            if task["id"] in seen or not _matches(user, task):
+                continue
+            seen.add(task["id"])
+            page.append(task)
+            if len(page) == limit:
+                break
+        if len(entries) < batch:
+            break
+        after = {"created_at": entries[-1]["created_at"], "task_id": entries[-1]["task_id"]}
+    return page
@@ -0,0 +1,96 @@
+# backend/geo.py
+
+"""Geohash cells and great-circle distances for location matching"""
+import math
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+
+def encode(latitude, longitude, precision=5):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, bit_count, even = 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def decode(geohash):
+    """Return (latitude, longitude, lat_error, lng_error) for the centre of the cell"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (
+        (lat_range[0] + lat_range[1]) / 2,
+        (lng_range[0] + lng_range[1]) / 2,
+        (lat_range[1] - lat_range[0]) / 2,
+        (lng_range[1] - lng_range[0]) / 2,
+    )
+
+
+def neighbors(geohash):
+    """The cell itself plus its eight surrounding cells"""
+    lat, lng, lat_err, lng_err = decode(geohash)
+    cells = []
+    for dlat in (-2, 0, 2):
+        for dlng in (-2, 0, 2):
+            cell_lat = max(-89.999999, min(89.999999, lat + dlat * lat_err))
+            cell_lng = (lng + dlng * lng_err + 180.0) % 360.0 - 180.0
+            cell = encode(cell_lat, cell_lng, len(geohash))
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def cell_size_km(latitude, precision):
+    """(height, width) in km of a geohash cell at the given latitude"""
+    lat_bits = precision * 5 // 2
+    lng_bits = precision * 5 - lat_bits
+    height = 180.0 / 2 ** lat_bits * KM_PER_DEGREE
+    width = 360.0 / 2 ** lng_bits * KM_PER_DEGREE * math.cos(math.radians(latitude))
+    return height, width
+
+
+def precision_for_radius(latitude, radius_km, precisions=(2, 3, 4, 5)):
+    """Finest precision whose cells are at least radius_km on each side, so a 3x3 block covers the circle"""
+    best = min(precisions)
+    for precision in sorted(precisions):
+        if min(cell_size_km(latitude, precision)) >= radius_km:
+            best = precision
+    return best
+
+
+def covering_cells(latitude, longitude, radius_km, precisions=(2, 3, 4, 5)):
+    precision = precision_for_radius(latitude, radius_km, precisions)
+    return neighbors(encode(latitude, longitude, precision))
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,154 @@
+# backend/idempotency.py
+
+"""
+Idempotency-Key support for POST endpoints.
+
+A client that retries a POST sends the same Idempotency-Key header. The first request with a
+key claims a record in "idempotency_keys" (keyed by a hash of uid, endpoint and key) with a
+short lease, runs normally and stores its response on the record. A retry finds the stored
+response and gets it back unchanged without reaching the write path, so it neither creates a
+second document nor repeats the duplicate-check scans. A retry that arrives while the first
+request is still running gets 409 with Retry-After; reusing a key with a different body is
+a client bug and gets 422. If the request fails, the claim is released so a retry runs it.
+
+Records expire after IDEMPOTENCY_TTL_HOURS. Configure a Firestore TTL policy on
+idempotency_keys.expires_at so they are deleted; expired records are ignored either way.
+
+    @router.post("/")
+    def create_thing(body: ThingCreate, idempotency=Depends(idempotent("things.create"))):
+        replay = idempotency.begin(body)
+        if replay is not None:
+            return replay
+        ...
+        return idempotency.complete(new_thing)
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from backend import metrics
+from backend.database import (
+    create_document,
+    delete_document,
+    get_document_versioned,
+    update_document,
+    update_document_if_unchanged,
+    WriteConflict
+)
+from backend.routers.auth import get_current_user
+
+COLLECTION = "idempotency_keys"
+TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+LEASE_SECONDS = 60
+MAX_KEY_LENGTH = 255
+
+metrics.describe("doit_idempotent_replays_total", "counter", "Retried POSTs answered with the stored response")
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+def _in_progress():
+    return HTTPException(
+        status_code=409,
+        detail="A request with this Idempotency-Key is still in progress",
+        headers={"Retry-After": "1"},
+    )
+
+
+class IdempotentRequest:
+    """One POST made under an Idempotency-Key (or without one, in which case it is a no-op)"""
+
+    def __init__(self, scope, uid, key):
+        self.scope = scope
+        self.doc_id = hashlib.sha256(f"{uid}\0{scope}\0{key}".encode()).hexdigest() if key else None
+        self.claimed = False
+
+    def begin(self, body):
+        """Claim the key for this request; returns the stored response if it already ran"""
+        if self.doc_id is None:
+            return None
+        fingerprint = hashlib.sha256(body.model_dump_json().encode()).hexdigest()
+        # Losing a race to claim means the other request now owns the key: look again once
+        for _ in range(2):
+            record, update_time = get_document_versioned(COLLECTION, self.doc_id)
+            current = _utcnow()
+            claim = {
+                "status": "pending",
+                "fingerprint": fingerprint,
+                "response": None,
+                "lease_until": current + timedelta(seconds=LEASE_SECONDS),
+                "expires_at": current + timedelta(hours=TTL_HOURS),
+            }
+            try:
+                if record is None:
+                    create_document(COLLECTION, self.doc_id, claim)
+                elif record["expires_at"] <= current or (
+                    record["status"] == "pending" and record["lease_until"] <= current
+                ):
+                    update_document_if_unchanged(COLLECTION, self.doc_id, record, update_time, claim)
+                elif record["fingerprint"] != fingerprint:
+                    raise HTTPException(
+                        status_code=422,
+                        detail="Idempotency-Key was already used with a different request",
+                    )
+                elif record["status"] == "pending":
+                    raise _in_progress()
+                else:
+                    metrics.inc("doit_idempotent_replays_total", {"scope": self.scope})
+                    return record["response"]
+            except WriteConflict:
+                continue
+            self.claimed = True
+            return None
+        raise _in_progress()
+
+    def complete(self, response):
+        """Store the response for retries and return it"""
+        if self.claimed:
+            try:
+                update_document(COLLECTION, self.doc_id, {
+                    "status": "completed",
+                    "response": jsonable_encoder(response),
+                    "lease_until": None,
+                })
+                self.claimed = False
+            except Exception as exc:
+                # The write itself succeeded; at worst a retry after the lease runs it again
+                print(f"Storing idempotent response failed: {exc}")
+        return response
+
+    def release(self):
+        """Drop an unfinished claim so a retry runs the request again"""
+        if self.claimed:
+            try:
+                delete_document(COLLECTION, self.doc_id)
+                self.claimed = False
+            except Exception as exc:
+                print(f"Releasing idempotency key failed: {exc}")
+
+
+def idempotent(scope):
+    """Dependency returning the IdempotentRequest for the caller's Idempotency-Key header"""
+    def dependency(
+        current_user=Depends(get_current_user),
+        idempotency_key: Optional[str] = Header(None),
+    ):
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters",
+            )
+        request = IdempotentRequest(scope, current_user["uid"], idempotency_key)
+        try:
+            yield request
+        except Exception:
+            request.release()
+            raise
+
+    return dependency
@@ -0,0 +1,174 @@
+# backend/images.py
+
+"""
+Image ingestion: uploaded photos become a set of resized derivatives plus a blur placeholder.
+
+Decoding and resizing is CPU bound and holds the GIL, so render() runs in a process pool
+(IMAGE_WORKERS processes, spawned rather than forked so they don't inherit gRPC threads) and
+the event loop only awaits it. The derivatives are re-encoded as JPEG with EXIF orientation
+applied and all metadata (including GPS) dropped; the original upload is not kept.
+
+An asset record looks like
+    {"id", "path", "width", "height", "placeholder": "data:image/jpeg;base64,...",
+     "thumb": {"url", "width", "height"}, "medium": {"url", "width", "height"}}
+where width/height are the original's and path is the blob key prefix of its files.
+"""
+import asyncio
+import base64
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from uuid import uuid4
+
+from fastapi import HTTPException, UploadFile
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from backend import blobstore
+
+# name -> longest side in pixels; smaller images are never upscaled
+DERIVATIVES = {"thumb": 320, "medium": 1280}
+PLACEHOLDER_SIZE = 16
+JPEG_QUALITY = 82
+MAX_UPLOAD_BYTES = int(float(os.getenv("IMAGE_MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+# Refuse decompression bombs: a small file that expands to a huge bitmap
+MAX_PIXELS = 40_000_000
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+ACCEPTED_TYPES = ("image/jpeg", "image/png", "image/webp")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class InvalidImage(Exception):
+    """The upload is not an image Pillow can decode, or is too large"""
+
+
+class ImageDerivative(BaseModel):
+    url: str
+    width: int
+    height: int
+
+
+class ImageAsset(BaseModel):
+    id: str
+    width: int
+    height: int
+    placeholder: str
+    thumb: ImageDerivative
+    medium: ImageDerivative
+
+
+def _encode(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def render(data):
+    """Decode an upload and return its size, JPEG derivatives and placeholder (runs in a worker process)"""
+    from PIL import Image, ImageFilter, ImageOps, UnidentifiedImageError
+
+    try:
+        # open() only reads the header, so the size check happens before any pixels are decoded
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > MAX_PIXELS:
+            raise InvalidImage(f"Images are limited to {MAX_PIXELS // 1_000_000} megapixels")
+        image.load()
+        image = ImageOps.exif_transpose(image)
+    except UnidentifiedImageError:
+        raise InvalidImage("not a JPEG, PNG or WebP image") from None
+    except (Image.DecompressionBombError, OSError) as exc:
+        raise InvalidImage(str(exc)) from None
+
+    # Flatten transparency onto white; JPEG has no alpha channel
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    derivatives = {}
+    for name, size in DERIVATIVES.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        derivatives[name] = (_encode(resized, JPEG_QUALITY), resized.width, resized.height)
+
+    tiny = image.copy()
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+    placeholder = "data:image/jpeg;base64," + base64.b64encode(_encode(tiny, 40)).decode()
+
+    return {"width": image.width, "height": image.height, "derivatives": derivatives, "placeholder": placeholder}
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+def asset_keys(asset):
+    """Blob keys of an asset's files, e.g. to delete them"""
+    return [f"{asset['path']}/{name}.jpg" for name in DERIVATIVES]
+
+
+async def ingest(data, prefix):
+    """Render data in the process pool and store its derivatives under prefix; returns the asset record"""
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise InvalidImage(f"Images are limited to {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    try:
+        rendered = await asyncio.get_running_loop().run_in_executor(_executor(), render, data)
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); start a fresh pool for the next upload
+        shutdown()
+        raise
+
+    asset_id = uuid4().hex
+    path = f"{prefix}/{asset_id}"
+    asset = {
+        "id": asset_id,
+        "path": path,
+        "width": rendered["width"],
+        "height": rendered["height"],
+        "placeholder": rendered["placeholder"],
+    }
+
+    def store():
+        blobs = blobstore.get_store()
+        for name, (payload, width, height) in rendered["derivatives"].items():
+            url = blobs.put(f"{path}/{name}.jpg", payload, "image/jpeg")
+            asset[name] = {"url": url, "width": width, "height": height}
+
+    await run_in_threadpool(store)
+    return asset
+
+
+async def ingest_upload(upload: UploadFile, prefix):
+    """ingest() for a multipart upload, answering 400/413/415 for unusable files"""
+    if upload.content_type not in ACCEPTED_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported image type: {upload.content_type}")
+    data = await upload.read(MAX_UPLOAD_BYTES + 1)
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image is too large")
+    try:
+        return await ingest(data, prefix)
+    except InvalidImage as exc:
+        raise HTTPException(status_code=400, detail=f"Could not read image: {exc}")
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,259 @@
+# backend/jobs.py
+
+"""
+In-process background jobs with a durable Firestore outbox.
+
+new_job() builds an entry for the "job_outbox" collection that the caller passes to its
+primary write (the extra argument of the database write helpers), so the job commits in the
+same batch as the change it follows: never one without the other. schedule() then hands the
+job to the local worker pool; enqueue() does both for jobs that follow no write.
+A worker claims a job with a conditional update (status "running" plus a lease), runs the
+registered handler in the threadpool and deletes the outbox document on success. Failures
+are retried with exponential backoff and jitter up to MAX_ATTEMPTS, then kept as "failed".
+Every worker process also polls the outbox for jobs whose retry is due or whose lease expired
+(e.g. the process died mid-run), so jobs survive restarts. Delivery is at-least-once:
+handlers must tolerate being run twice.
+"""
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from starlette.concurrency import run_in_threadpool
+
+from backend import blobstore, feed
+from backend.database import (
+    add_document,
+    aggregate_documents,
+    delete_document,
+    generate_id,
+    get_document_versioned,
+    query_documents,
+    update_document,
+    update_document_if_unchanged,
+    WriteConflict
+)
+
+OUTBOX = "job_outbox"
+WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "6"))
+BASE_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "1"))
+MAX_BACKOFF_SECONDS = 300
+LEASE_SECONDS = 60
+POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "30"))
+
+_handlers = {}
+_state = {"loop": None, "queue": None, "tasks": []}
+
+
+def handler(job_type):
+    """Register the function that runs jobs of job_type; it is called with (payload, job_id=...)"""
+    def decorator(func):
+        _handlers[job_type] = func
+        return func
+    return decorator
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+def _submit(job_id):
+    loop, queue = _state["loop"], _state["queue"]
+    if loop is None or queue is None:
+        return  # no local workers (e.g. a script); the outbox poller of a running app picks it up
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        queue.put_nowait(job_id)
+    else:
+        loop.call_soon_threadsafe(queue.put_nowait, job_id)
+
+
+def new_job(job_type, payload):
+    """(collection, job id, document) of a job, to commit with a write via its extra argument"""
+    if job_type not in _handlers:
+        raise ValueError(f"Unknown job type: {job_type}")
+    return OUTBOX, generate_id(), {
+        "type": job_type,
+        "payload": payload,
+        "status": "pending",
+        "attempts": 0,
+        "run_at": _utcnow(),
+        "lease_until": None,
+        "last_error": None,
+        "created_at": _utcnow(),
+    }
+
+
+def schedule(*jobs):
+    """Run committed new_job() entries on this process's workers instead of waiting for the poller"""
+    for _, job_id, _ in jobs:
+        _submit(job_id)
+
+
+def enqueue(job_type, payload):
+    """Durably record a job that follows no other write and schedule it; returns the job id"""
+    job = new_job(job_type, payload)
+    add_document(*job)
+    schedule(job)
+    return job[1]
+
+
+def _claim(job_id):
+    """Take the lease on a due job; returns the job or None if it is not ours to run"""
+    job, update_time = get_document_versioned(OUTBOX, job_id)
+    if not job:
+        return None
+    current = _utcnow()
+    if job["status"] == "failed":
+        return None
+    if job["status"] == "pending" and job["run_at"] > current:
+        return None
+    if job["status"] == "running" and job["lease_until"] and job["lease_until"] > current:
+        return None
+    try:
+        return update_document_if_unchanged(OUTBOX, job_id, job, update_time, {
+            "status": "running",
+            "attempts": job["attempts"] + 1,
+            "lease_until": current + timedelta(seconds=LEASE_SECONDS),
+        })
+    except WriteConflict:
+        return None  # another worker claimed it first
+
+
+def _run(job_id):
+    """Claim and execute one job; returns the retry delay in seconds, or None when done"""
+    job = _claim(job_id)
+    if job is None:
+        return None
+    try:
+        _handlers[job["type"]](job["payload"], job_id=job_id)
+    except Exception as exc:
+        attempts = job["attempts"]
+        status = "failed" if attempts >= MAX_ATTEMPTS else "pending"
+        delay = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** (attempts - 1))
+        delay = random.uniform(delay / 2, delay)
+        update_document(OUTBOX, job_id, {
+            "status": status,
+            "run_at": _utcnow() + timedelta(seconds=delay),
+            "lease_until": None,
+            "last_error": f"{type(exc).__name__}: {exc}",
+        })
+        print(f"Job {job_id} ({job['type']}) attempt {attempts} failed: {exc}")
+        return delay if status == "pending" else None
+    delete_document(OUTBOX, job_id)
+    return None
+
+
+async def _worker():
+    queue = _state["queue"]
+    loop = asyncio.get_running_loop()
+    while True:
+        job_id = await queue.get()
+        try:
+            delay = await run_in_threadpool(_run, job_id)
+            if delay is not None:
+                loop.call_later(delay, queue.put_nowait, job_id)
+        except Exception as exc:
+            print(f"Job {job_id} could not be processed: {exc}")
+        finally:
+            queue.task_done()
+
+
+def _due_job_ids():
+    current = _utcnow()
+    due = query_documents(OUTBOX, [("status", "==", "pending"), ("run_at", "<=", current)], limit=200)
+    expired = query_documents(OUTBOX, [("status", "==", "running"), ("lease_until", "<", current)], limit=200)
+    return [job["id"] for job in due + expired]
+
+
+async def _poller():
+    while True:
+        try:
+            for job_id in await run_in_threadpool(_due_job_ids):
+                _state["queue"].put_nowait(job_id)
+        except Exception as exc:
+            print(f"Job outbox poll failed: {exc}")
+        await asyncio.sleep(POLL_SECONDS)
+
+
+async def start():
+    """Start the worker pool and the outbox poller (called from the app lifespan)"""
+    _state["loop"] = asyncio.get_running_loop()
+    _state["queue"] = asyncio.Queue()
+    _state["tasks"] = [asyncio.create_task(_worker()) for _ in range(WORKERS)]
+    _state["tasks"].append(asyncio.create_task(_poller()))
+
+
+async def stop(timeout=5.0):
+    """Give queued jobs a moment to finish; anything left stays in the outbox for recovery"""
+    queue = _state["queue"]
+    if queue is not None:
+        try:
+            await asyncio.wait_for(queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    for task in _state["tasks"]:
+        task.cancel()
+    _state.update(loop=None, queue=None, tasks=[])
+
+
+# HANDLERS
+
+@handler("notify")
+def create_notification(payload, job_id):
+    """Notification document keyed by the job id, so a retried job overwrites instead of duplicating"""
+    notification_id = f"job-{job_id}"
+    add_document("notifications", notification_id, {
+        "id": notification_id,
+        "user_id": payload["user_id"],
+        "type": payload["type"],
+        "title": payload["title"],
+        "message": payload["message"],
+        "data": payload.get("data"),
+        "read": False,
+        "created_at": _utcnow(),
+    })
+
+
+@handler("apply_rating")
+def apply_rating(payload, job_id):
+    """
+    Recompute the reviewed user's average rating from their reviews, so running the job twice
+    changes nothing. The job commits with its review; the conditional write makes a job that
+    aggregated before a newer review landed retry instead of overwriting that review's result.
+    """
+    user, update_time = get_document_versioned("users", payload["user_id"])
+    if not user:
+        return
+    totals = aggregate_documents("reviews", [("reviewed_id", "==", payload["user_id"])], avg_fields=["rating"])
+    update_document_if_unchanged("users", payload["user_id"], user, update_time, {
+        "rating": round(totals.get("avg_rating") or 0.0, 3),
+        "rating_count": totals["count"],
+    })
+
+
+@handler("feed_publish")
+def feed_publish(payload, job_id):
+    feed.publish_tasks(payload["tasks"])
+
+
+@handler("feed_refresh")
+def feed_refresh(payload, job_id):
+    feed.refresh_task(payload["old"])
+
+
+@handler("feed_remove")
+def feed_remove(payload, job_id):
+    feed.remove_task(payload["task"])
+
+
+@handler("delete_blobs")
+def delete_blobs(payload, job_id):
+    """Remove files (e.g. replaced image derivatives); deleting a missing blob is a no-op"""
+    store = blobstore.get_store()
+    for key in payload["keys"]:
+        store.delete(key)
@@ -0,0 +1,228 @@
+# backend/live_location.py
+
+"""
+Ephemeral live location channel between the two participants of a chat.
+
+Position updates never touch Firestore: each chat gets an in-memory channel holding the
+latest position, and subscribers get single-slot queues, so a slow viewer only ever sees the
+newest fix. Updates are throttled to one delivery per MIN_INTERVAL_SECONDS; anything newer
+that arrives in between replaces the pending position instead of being queued. Only the
+final position is persisted (on stop, when the channel goes idle or at shutdown).
+
+Consent follows the chat document: the publisher must be location_shared_by and the other
+participant must be location_accepted_by. When a participant changes consent on this worker,
+revalidate() ends the streams of viewers who lost it at once; every stream also rechecks on
+each heartbeat (through the CONSENT_TTL_SECONDS cache), which catches consent withdrawn
+anywhere else.
+
+Channels live in the worker process, so both participants of a chat must reach the same
+process. Workers started by backend.serve share one listening socket and the kernel spreads
+connections across them, so serve turns live location off (the endpoints answer 404) when it
+starts several workers, and LIVE_LOCATION_ENABLED=1 there means one worker. Several
+single-worker instances need sticky routing on the chat id at the load balancer.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+
+from starlette.concurrency import run_in_threadpool
+
+from backend import metrics, sse
+from backend.database import get_document, update_document, now
+from backend.records import Chat
+
+MIN_INTERVAL_SECONDS = float(os.getenv("LIVE_LOCATION_INTERVAL_SECONDS", "1.0"))
+IDLE_SECONDS = float(os.getenv("LIVE_LOCATION_IDLE_SECONDS", "300"))
+CONSENT_TTL_SECONDS = 30
+ENABLED = os.getenv("LIVE_LOCATION_ENABLED", "1") != "0"
+
+metrics.describe("doit_live_location_updates_total", "counter", "Live location updates by outcome")
+
+
+class Channel:
+    __slots__ = ("chat_id", "latest", "subscribers", "last_sent", "last_update", "pending")
+
+    def __init__(self, chat_id):
+        self.chat_id = chat_id
+        self.latest = None
+        # queue -> uid of the viewer
+        self.subscribers = {}
+        self.last_sent = 0.0
+        self.last_update = time.monotonic()
+        self.pending = None
+
+
+_channels = {}
+# chat_id -> (expires_at, chat); consent checks run on every update, so the chat is cached
+# (as a records.Chat, about half the memory of the dict)
+_chats = {}
+
+
+def _offer(queue, item):
+    """Keep only the newest item in a subscriber's single-slot queue"""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+async def load_chat(chat_id):
+    cached = _chats.get(chat_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    chat = await run_in_threadpool(get_document, "chats", chat_id)
+    if chat is not None:
+        chat = Chat.from_document(chat)
+    _chats[chat_id] = (time.monotonic() + CONSENT_TTL_SECONDS, chat)
+    return chat
+
+
+def invalidate(chat_id):
+    _chats.pop(chat_id, None)
+
+
+def _prune_chats():
+    current = time.monotonic()
+    for chat_id, (expires_at, _) in list(_chats.items()):
+        if expires_at <= current:
+            _chats.pop(chat_id, None)
+
+
+async def revalidate(chat_id):
+    """Drop the cached chat and close the streams of subscribers who may no longer view it"""
+    invalidate(chat_id)
+    channel = _channels.get(chat_id)
+    if channel is None or not channel.subscribers:
+        return
+    chat = await load_chat(chat_id)
+    for queue, uid in list(channel.subscribers.items()):
+        if chat is None or not can_view(chat, uid):
+            _offer(queue, sse.CLOSED)
+            del channel.subscribers[queue]
+
+
+def _other(chat, uid):
+    return chat["user2_id"] if uid == chat["user1_id"] else chat["user1_id"]
+
+
+def is_participant(chat, uid):
+    return uid in (chat["user1_id"], chat["user2_id"])
+
+
+def can_publish(chat, uid):
+    return (
+        is_participant(chat, uid)
+        and bool(chat.get("location_shared"))
+        and chat.get("location_shared_by") == uid
+        and chat.get("location_accepted_by") == _other(chat, uid)
+    )
+
+
+def can_view(chat, uid):
+    return (
+        is_participant(chat, uid)
+        and bool(chat.get("location_shared"))
+        and chat.get("location_accepted_by") == uid
+        and chat.get("location_shared_by") == _other(chat, uid)
+    )
+
+
+def _flush(channel):
+    channel.pending = None
+    channel.last_sent = time.monotonic()
+    for queue in channel.subscribers:
+        _offer(queue, channel.latest)
+    metrics.inc("doit_live_location_updates_total", {"outcome": "delivered"})
+
+
+def publish(chat_id, sender_id, position):
+    channel = _channels.get(chat_id)
+    if channel is None:
+        channel = _channels[chat_id] = Channel(chat_id)
+    channel.latest = {
+        **position,
+        "sender_id": sender_id,
+        "at": datetime.now(timezone.utc).isoformat(),
+    }
+    channel.last_update = time.monotonic()
+
+    wait = MIN_INTERVAL_SECONDS - (channel.last_update - channel.last_sent)
+    if wait <= 0:
+        if channel.pending is not None:
+            channel.pending.cancel()
+        _flush(channel)
+    elif channel.pending is None:
+        channel.pending = asyncio.get_running_loop().call_later(wait, _flush, channel)
+    else:
+        metrics.inc("doit_live_location_updates_total", {"outcome": "coalesced"})
+
+
+def subscribe(chat_id, uid):
+    """Single-slot queue of positions for chat_id, primed with the latest one"""
+    channel = _channels.get(chat_id)
+    if channel is None:
+        channel = _channels[chat_id] = Channel(chat_id)
+    queue = asyncio.Queue(1)
+    if channel.latest is not None:
+        queue.put_nowait(channel.latest)
+    channel.subscribers[queue] = uid
+    return queue
+
+
+def unsubscribe(chat_id, queue):
+    channel = _channels.get(chat_id)
+    if channel is None:
+        return
+    channel.subscribers.pop(queue, None)
+    if not channel.subscribers and channel.latest is None:
+        _channels.pop(chat_id, None)
+
+
+async def stop(chat_id, end_sharing=False):
+    """
+    End the channel, close its streams and persist the final position on the chat;
+    end_sharing also clears location_shared and location_accepted_by, so sharing has to be
+    started and accepted again.
+    """
+    ended = {"location_shared": False, "location_accepted_by": None}
+    channel = _channels.pop(chat_id, None)
+    if channel is None:
+        if end_sharing:
+            await run_in_threadpool(update_document, "chats", chat_id, {**ended, "updated_at": now()})
+            invalidate(chat_id)
+        return None
+    if channel.pending is not None:
+        channel.pending.cancel()
+    for queue in channel.subscribers:
+        _offer(queue, sse.CLOSED)
+    channel.subscribers.clear()
+    update = {"last_location": channel.latest} if channel.latest is not None else {}
+    if end_sharing:
+        update.update(ended)
+    if update:
+        await run_in_threadpool(update_document, "chats", chat_id, {**update, "updated_at": now()})
+    invalidate(chat_id)
+    return channel.latest
+
+
+async def expire_idle_channels_periodically():
+    """Background loop started from the app lifespan"""
+    while True:
+        await asyncio.sleep(IDLE_SECONDS / 5)
+        _prune_chats()
+        cutoff = time.monotonic() - IDLE_SECONDS
+        for chat_id, channel in list(_channels.items()):
+            if channel.last_update < cutoff:
+                try:
+                    await stop(chat_id)
+                except Exception as exc:
+                    print(f"Could not persist live location for chat {chat_id}: {exc}")
+
+
+async def close():
+    """Persist every channel's final position (called on shutdown)"""
+    for chat_id in list(_channels):
+        try:
+            await stop(chat_id)
+        except Exception as exc:
+            print(f"Could not persist live location for chat {chat_id}: {exc}")
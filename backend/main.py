@@ -1,27 +1,90 @@
 """
 Main FastAPI application for DoIt backend
 """
+import asyncio
 import os
-from fastapi import FastAPI, HTTPException
+import time
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
 
+from backend import archival
+from backend import blobstore
 from backend import database  # Use Firebase-integrated database.py
-from backend.routers import auth, users, tasks, applications, chat, reviews, notifications
+from backend import deadlines
+from backend import images
+from backend import jobs
+from backend import live_location
+from backend import metrics
+from backend import pricing
+from backend import profiler
+from backend import ratelimit
+from backend.routers import admin, auth, users, tasks, applications, chat, reviews, notifications, stats
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
-    # Startup
-    database.db  # Initialize Firestore client
-    print(" Firebase Firestore client ready")
+    blobstore.check_config()
+    # Registered here so importing the app does not load google-api-core (and grpc); the
+    # middleware stack is rebuilt on the next request to pick the handler up
+    from google.api_core.exceptions import GoogleAPICallError
+
+    app.add_exception_handler(GoogleAPICallError, firestore_error_handler)
+    app.middleware_stack = None
+    # Startup: pay the client/channel cold start here instead of on the first request
+    timings = await run_in_threadpool(database.warm_up)
+    app.state.warm_up = timings
+    print(f" Firebase Firestore client ready ({database.DB_BACKEND}, warm-up {timings})")
+    app.state.draining = False
+    if os.getenv("WARM_UP_CACHES") == "1":
+        # Production workers (backend.serve) fill caches before they accept connections
+        try:
+            await stats.refresh_stats()
+        except Exception as exc:
+            print(f"Stats warm-up failed: {exc}")
+    await jobs.start()
+    background = [
+        asyncio.create_task(stats.refresh_stats_periodically()),
+        asyncio.create_task(live_location.expire_idle_channels_periodically()),
+        asyncio.create_task(archival.archive_periodically()),
+        asyncio.create_task(pricing.sync_periodically()),
+    ]
+    if metrics.METRICS_DIR:
+        background.append(asyncio.create_task(metrics.share_periodically()))
     yield
     # Shutdown
+    await drain()
+    await jobs.stop()
+    try:
+        await run_in_threadpool(pricing.flush)
+    except Exception as exc:
+        print(f"Price sketch flush failed: {exc}")
+    images.shutdown()
+    for task in background:
+        task.cancel()
+    try:
+        metrics.share()
+    except OSError as exc:
+        print(f"Sharing metrics failed: {exc}")
     print("Application shutting down")
 
 
+async def drain():
+    """
+    Start a graceful shutdown (backend.serve calls this before waiting for connections):
+    fail readiness checks so no new traffic arrives and end SSE streams, whose clients
+    reconnect to another worker. Safe to call more than once.
+    """
+    app.state.draining = True
+    await notifications.notification_hub.close()
+    await live_location.close()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="DoIt API",
@@ -30,15 +93,61 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# CORS middleware
+def route_template(request: Request) -> str:
+    """Resolve the path template (e.g. /api/tasks/{task_id}) so metrics don't explode per id"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+# The profiler is pure ASGI and must run in the endpoint's task, so it goes inside every
+# @app.middleware("http") below (each of those runs the inner app in a task of its own)
+app.add_middleware(profiler.ProfilerMiddleware)
+
+# The deadline starts once a request is admitted, so time spent queued in front of it is not billed
+app.middleware("http")(deadlines.request_deadline)
+
+# Admission control runs inside instrument_requests, so shed requests still show up in metrics
+app.middleware("http")(ratelimit.admission_control)
+
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    route = route_template(request)
+    stats, token = metrics.start_request(route)
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.end_request(token)
+        metrics.inc("doit_http_requests_total", {"route": route, "method": request.method, "status": status_code})
+        metrics.observe("doit_http_request_seconds", {"route": route}, elapsed)
+
+    response.headers["Server-Timing"] = (
+        f'db;desc="Firestore ({stats.db_calls} calls)";dur={stats.db_seconds * 1000:.1f}, '
+        f"total;dur={elapsed * 1000:.1f}"
+    )
+    return response
+
+
+# CORS middleware, added last so it is outermost: shed (503) and timed-out (504) responses
+# from the middleware above also carry CORS headers, and browsers can read them
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Change this to specific domains in prod
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Feed pagination cursor (GET /api/tasks/feed)
+    expose_headers=["X-Next-Before", "X-Next-Before-Id"],
 )
 
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
@@ -47,6 +156,16 @@ app.include_router(applications.router, prefix="/api/applications", tags=["appli
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(reviews.router, prefix="/api/reviews", tags=["reviews"])
 app.include_router(notifications.router, prefix="/api/notifications", tags=["notifications"])
+app.include_router(stats.router, prefix="/api/stats", tags=["stats"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+
+# With local blob storage the app serves the uploaded files itself
+if blobstore.BLOB_BACKEND == "local" and blobstore.BLOB_BASE_URL.startswith("/"):
+    app.mount(
+        blobstore.BLOB_BASE_URL,
+        StaticFiles(directory=blobstore.BLOB_LOCAL_ROOT, check_dir=False),
+        name="media",
+    )
 
 
 @app.get("/")
@@ -56,7 +175,41 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "database": "connected"}
+    """Readiness check: performs a real read so an unreachable database fails the probe"""
+    if getattr(app.state, "draining", False):
+        return JSONResponse(status_code=503, content={"status": "draining"})
+    try:
+        latency = await run_in_threadpool(database.ping)
+    except Exception as exc:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unhealthy", "database": "unreachable", "error": str(exc)}
+        )
+    return {"status": "healthy", "database": "connected", "db_latency_ms": round(latency * 1000, 2)}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# Running out of time or a Firestore hiccup is not a bug: tell the client to come back.
+# Handlers for specific exceptions run inside the middleware stack, so these responses get
+# CORS headers; the Exception handler below runs outside it.
+@app.exception_handler(deadlines.DeadlineExceeded)
+async def deadline_exceeded_handler(request, exc):
+    return JSONResponse(status_code=504, content={"detail": "Request timed out"})
+
+
+async def firestore_error_handler(request, exc):
+    """GoogleAPICallError (registered from the lifespan): 503 for transient errors"""
+    if deadlines.is_transient(exc):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Database temporarily unavailable, please retry"},
+            headers={"Retry-After": "1"},
+        )
+    return await global_exception_handler(request, exc)
 
 
 @app.exception_handler(Exception)
@@ -68,5 +221,6 @@ async def global_exception_handler(request, exc):
 
 
 if __name__ == "__main__":
+    # Development server; production runs python -m backend.serve
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, log_level="info")
+    uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=True, log_level="info")
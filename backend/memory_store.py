@@ -0,0 +1,602 @@
+# backend/memory_store.py
+
+"""
+In-memory stand-in for the subset of the Firestore client API used by database.py.
+
+Selected with DB_BACKEND=memory so the API can run and be benchmarked without a Firebase
+project. Every RPC-equivalent call (document get/write, query stream, batch commit, get_all)
+sleeps for the configured latency to mimic a network round-trip.
+"""
+import copy
+import functools
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange
+
+DOCUMENT_ID = "__name__"
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array-contains": lambda a, b: isinstance(a, list) and b in a,
+    "array-contains-any": lambda a, b: isinstance(a, list) and any(v in a for v in b),
+}
+
+
+def _type_rank(value):
+    # Firestore orders values of different types by type before comparing them
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, list):
+        return 7
+    if isinstance(value, dict):
+        return 8
+    return 6
+
+
+def _compare(a, b):
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if a == b:
+        return 0
+    try:
+        return -1 if a < b else 1
+    except TypeError:
+        return -1 if repr(a) < repr(b) else 1
+
+
+_MISSING = object()
+
+
+def _merge_paths(data, prefix=""):
+    """Flatten nested maps to dotted leaf paths; set(merge=True) merges maps field by field"""
+    paths = {}
+    for key, value in data.items():
+        if isinstance(value, dict) and value:
+            paths.update(_merge_paths(value, f"{prefix}{key}."))
+        else:
+            paths[prefix + key] = value
+    return paths
+
+
+def _get_field(data, path):
+    value = data
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+class WriteResult:
+    __slots__ = ("update_time",)
+
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+
+class LastUpdateOption:
+    __slots__ = ("last_update_time",)
+
+    def __init__(self, last_update_time):
+        self.last_update_time = last_update_time
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data, create_time=None, update_time=None):
+        self.reference = reference
+        self._data = data
+        self.create_time = create_time
+        self.update_time = update_time
+        self.read_time = datetime.now(timezone.utc)
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        value = _get_field(self._data or {}, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class _Record:
+    __slots__ = ("data", "create_time", "update_time")
+
+    def __init__(self, data, create_time, update_time):
+        self.data = data
+        self.create_time = create_time
+        self.update_time = update_time
+
+
+class Query:
+    def __init__(self, collection, filters=(), orders=(), limit=None, offset=0, cursor=None):
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        state = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit": self._limit,
+            "offset": self._offset,
+            "cursor": self._cursor,
+        }
+        state.update(changes)
+        return Query(self._collection, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in _OPERATORS:
+            raise ValueError(f"Unsupported operator {op_string!r}")
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((field_path, direction == "DESCENDING"),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip):
+        return self._copy(offset=num_to_skip)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=(document_fields_or_snapshot, False))
+
+    def start_at(self, document_fields_or_snapshot):
+        return self._copy(cursor=(document_fields_or_snapshot, True))
+
+    def _field_value(self, doc_id, data, path):
+        if path == DOCUMENT_ID:
+            return doc_id
+        return _get_field(data, path)
+
+    def _matches(self, doc_id, data):
+        for path, op, expected in self._filters:
+            value = self._field_value(doc_id, data, path)
+            if value is _MISSING:
+                return False
+            if path == DOCUMENT_ID:
+                expected = [getattr(v, "id", v) for v in expected] if op in ("in", "not-in") else getattr(expected, "id", expected)
+            try:
+                if not _OPERATORS[op](value, expected):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def _sort_key_values(self, doc_id, data):
+        return [self._field_value(doc_id, data, path) for path, _ in self._orders] + [doc_id]
+
+    def _cmp_rows(self, a, b):
+        descending = [desc for _, desc in self._orders] + [self._orders[-1][1] if self._orders else False]
+        for va, vb, desc in zip(a, b, descending):
+            result = _compare(va, vb)
+            if result:
+                return -result if desc else result
+        return 0
+
+    def _cursor_values(self):
+        fields, inclusive = self._cursor
+        if isinstance(fields, DocumentSnapshot):
+            data = fields._data or {}
+            return self._sort_key_values(fields.id, data), inclusive
+        if isinstance(fields, dict):
+            values = [
+                getattr(fields.get(path), "id", fields.get(path)) if path == DOCUMENT_ID else fields.get(path)
+                for path, _ in self._orders
+            ]
+            doc_id = fields.get(DOCUMENT_ID)
+            if doc_id is not None and all(path != DOCUMENT_ID for path, _ in self._orders):
+                values.append(getattr(doc_id, "id", doc_id))
+            return values, inclusive
+        return list(fields), inclusive
+
+    def _run(self):
+        self._collection._client._delay()
+        return self._snapshots()
+
+    def _snapshots(self):
+        store = self._collection._client
+        rows = []
+        for doc_id, record in store._documents(self._collection._path):
+            if not self._matches(doc_id, record.data):
+                continue
+            key = self._sort_key_values(doc_id, record.data)
+            if any(value is _MISSING for value in key):
+                continue
+            rows.append((key, doc_id, record))
+
+        rows.sort(key=functools.cmp_to_key(lambda a, b: self._cmp_rows(a[0], b[0])))
+
+        if self._cursor is not None:
+            cursor, inclusive = self._cursor_values()
+            kept = []
+            for row in rows:
+                result = self._cmp_rows(row[0][:len(cursor)], cursor)
+                if result > 0 or (inclusive and result == 0):
+                    kept.append(row)
+            rows = kept
+
+        rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+
+        return [
+            DocumentSnapshot(
+                self._collection.document(doc_id),
+                copy.deepcopy(record.data),
+                record.create_time,
+                record.update_time,
+            )
+            for _, doc_id, record in rows
+        ]
+
+    def stream(self, transaction=None, **kwargs):
+        return iter(self._run())
+
+    def count(self, alias=None):
+        return AggregationQuery(self).count(alias)
+
+    def sum(self, field_ref, alias=None):
+        return AggregationQuery(self).sum(field_ref, alias)
+
+    def avg(self, field_ref, alias=None):
+        return AggregationQuery(self).avg(field_ref, alias)
+
+    def get(self, transaction=None, **kwargs):
+        return self._run()
+
+    def on_snapshot(self, callback):
+        return Watch(self, callback)
+
+
+class Watch:
+    """
+    Listener returned by on_snapshot. Like Firestore it first delivers the current result set
+    as ADDED changes, then a diff after every commit touching the collection. Callbacks run on
+    the committing thread, so they must not block.
+    """
+
+    def __init__(self, query, callback):
+        self._query = query
+        self._callback = callback
+        self._client = query._collection._client
+        self._lock = threading.Lock()
+        self._known = {}
+        self._delivered = False
+        self._path = query._collection._path
+        self._client._watches.append(self)
+        self._notify()
+
+    def _notify(self):
+        with self._lock:
+            snapshots = self._query._snapshots()
+            current = {snapshot.id: snapshot for snapshot in snapshots}
+            changes = [
+                DocumentChange(ChangeType.REMOVED, self._known[doc_id], -1, -1)
+                for doc_id in self._known.keys() - current.keys()
+            ]
+            for index, snapshot in enumerate(snapshots):
+                previous = self._known.get(snapshot.id)
+                if previous is None:
+                    changes.append(DocumentChange(ChangeType.ADDED, snapshot, -1, index))
+                elif previous.update_time != snapshot.update_time:
+                    changes.append(DocumentChange(ChangeType.MODIFIED, snapshot, -1, index))
+            self._known = current
+            if changes or not self._delivered:
+                self._delivered = True
+                self._callback(snapshots, changes, datetime.now(timezone.utc))
+
+    def unsubscribe(self):
+        with self._client._lock:
+            if self in self._client._watches:
+                self._client._watches.remove(self)
+
+
+class AggregationResult:
+    __slots__ = ("alias", "value", "read_time")
+
+    def __init__(self, alias, value, read_time=None):
+        self.alias = alias
+        self.value = value
+        self.read_time = read_time
+
+
+class AggregationQuery:
+    """count/sum/avg over a query, computed server-side in real Firestore"""
+
+    def __init__(self, query):
+        self._query = query
+        self._aggregations = []
+
+    def _add(self, kind, field_ref, alias):
+        self._aggregations.append((kind, field_ref, alias or f"field_{len(self._aggregations) + 1}"))
+        return self
+
+    def count(self, alias=None):
+        return self._add("count", None, alias)
+
+    def sum(self, field_ref, alias=None):
+        return self._add("sum", field_ref, alias)
+
+    def avg(self, field_ref, alias=None):
+        return self._add("avg", field_ref, alias)
+
+    def get(self, transaction=None, **kwargs):
+        snapshots = self._query._run()
+        read_time = datetime.now(timezone.utc)
+        results = []
+        for kind, field_ref, alias in self._aggregations:
+            if kind == "count":
+                value = len(snapshots)
+            else:
+                numbers = [
+                    v for v in (_get_field(s._data, field_ref) for s in snapshots)
+                    if isinstance(v, (int, float)) and not isinstance(v, bool)
+                ]
+                if kind == "sum":
+                    value = sum(numbers)
+                else:
+                    value = sum(numbers) / len(numbers) if numbers else None
+            results.append(AggregationResult(alias, value, read_time))
+        return [results]
+
+
+class CollectionReference(Query):
+    def __init__(self, client, path):
+        self._client = client
+        self._path = path
+        super().__init__(self)
+
+    @property
+    def id(self):
+        return self._path.rsplit("/", 1)[-1]
+
+    def document(self, document_id=None):
+        return DocumentReference(self._client, f"{self._path}/{document_id or uuid.uuid4().hex}")
+
+    def list_documents(self):
+        return [self.document(doc_id) for doc_id, _ in self._client._documents(self._path)]
+
+
+class DocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+
+    @property
+    def id(self):
+        return self.path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self):
+        return CollectionReference(self._client, self.path.rsplit("/", 1)[0])
+
+    def collection(self, collection_id):
+        return CollectionReference(self._client, f"{self.path}/{collection_id}")
+
+    def get(self, field_paths=None, transaction=None, **kwargs):
+        self._client._delay()
+        return self._client._snapshot(self)
+
+    def set(self, document_data, merge=False, **kwargs):
+        return self._client._commit([("set", self, document_data, merge)])[0]
+
+    def create(self, document_data, **kwargs):
+        return self._client._commit([("create", self, document_data, None)])[0]
+
+    def update(self, field_updates, option=None, **kwargs):
+        return self._client._commit([("update", self, field_updates, option)])[0]
+
+    def delete(self, option=None, **kwargs):
+        return self._client._commit([("delete", self, None, option)])[0]
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(("set", reference, document_data, merge))
+        return self
+
+    def create(self, reference, document_data):
+        self._writes.append(("create", reference, document_data, None))
+        return self
+
+    def update(self, reference, field_updates, option=None):
+        self._writes.append(("update", reference, field_updates, option))
+        return self
+
+    def delete(self, reference, option=None):
+        self._writes.append(("delete", reference, None, option))
+        return self
+
+    def __len__(self):
+        return len(self._writes)
+
+    def commit(self, **kwargs):
+        writes, self._writes = self._writes, []
+        return self._client._commit(writes)
+
+
+class MemoryClient:
+    """Thread-safe in-memory document store exposing the Firestore client methods the app uses"""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000.0
+        self._lock = threading.RLock()
+        self._collections = {}
+        self._watches = []
+        self._last_time = datetime.now(timezone.utc)
+
+    def _delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _tick(self):
+        # Strictly increasing commit times keep last-update-time preconditions meaningful
+        current = datetime.now(timezone.utc)
+        if current <= self._last_time:
+            current = self._last_time + timedelta(microseconds=1)
+        self._last_time = current
+        return current
+
+    def _documents(self, collection_path):
+        with self._lock:
+            return list(self._collections.get(collection_path, {}).items())
+
+    def _snapshot(self, reference):
+        collection_path, doc_id = reference.path.rsplit("/", 1)
+        with self._lock:
+            record = self._collections.get(collection_path, {}).get(doc_id)
+            if record is None:
+                return DocumentSnapshot(reference, None)
+            return DocumentSnapshot(reference, copy.deepcopy(record.data), record.create_time, record.update_time)
+
+    def _resolve(self, value, commit_time, current=_MISSING):
+        if value is transforms.SERVER_TIMESTAMP:
+            return commit_time
+        if isinstance(value, transforms.Increment):
+            base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+            return base + value.value
+        if isinstance(value, transforms.ArrayUnion):
+            base = list(current) if isinstance(current, list) else []
+            return base + [v for v in value.values if v not in base]
+        if isinstance(value, transforms.ArrayRemove):
+            base = list(current) if isinstance(current, list) else []
+            return [v for v in base if v not in value.values]
+        if isinstance(value, dict):
+            existing = current if isinstance(current, dict) else {}
+            return {
+                key: self._resolve(item, commit_time, existing.get(key, _MISSING))
+                for key, item in value.items()
+                if item is not transforms.DELETE_FIELD
+            }
+        if isinstance(value, list):
+            return [self._resolve(item, commit_time) for item in value]
+        return copy.deepcopy(value)
+
+    def _apply_update(self, data, field_updates, commit_time):
+        for path, value in field_updates.items():
+            parts = path.split(".")
+            target = data
+            for part in parts[:-1]:
+                if not isinstance(target.get(part), dict):
+                    target[part] = {}
+                target = target[part]
+            if value is transforms.DELETE_FIELD:
+                target.pop(parts[-1], None)
+            else:
+                target[parts[-1]] = self._resolve(value, commit_time, target.get(parts[-1], _MISSING))
+
+    def _commit(self, writes):
+        self._delay()
+        with self._lock:
+            commit_time = self._tick()
+            # Validate every precondition first so a batch applies atomically
+            for kind, reference, _, option in writes:
+                collection_path, doc_id = reference.path.rsplit("/", 1)
+                record = self._collections.get(collection_path, {}).get(doc_id)
+                if kind == "create" and record is not None:
+                    raise AlreadyExists(f"Document already exists: {reference.path}")
+                if kind == "update" and record is None:
+                    raise NotFound(f"No document to update: {reference.path}")
+                if isinstance(option, LastUpdateOption):
+                    if record is None or record.update_time != option.last_update_time:
+                        raise FailedPrecondition(f"Precondition failed for {reference.path}")
+
+            results = []
+            for kind, reference, data, option in writes:
+                collection_path, doc_id = reference.path.rsplit("/", 1)
+                documents = self._collections.setdefault(collection_path, {})
+                record = documents.get(doc_id)
+                if kind == "delete":
+                    documents.pop(doc_id, None)
+                elif kind in ("set", "create"):
+                    if option is True and record is not None:  # set(..., merge=True)
+                        merged = copy.deepcopy(record.data)
+                        self._apply_update(merged, _merge_paths(data), commit_time)
+                        record.data, record.update_time = merged, commit_time
+                    else:
+                        created = record.create_time if record else commit_time
+                        documents[doc_id] = _Record(self._resolve(data, commit_time), created, commit_time)
+                else:
+                    updated = copy.deepcopy(record.data)
+                    self._apply_update(updated, data, commit_time)
+                    record.data, record.update_time = updated, commit_time
+                results.append(WriteResult(commit_time))
+            paths = {reference.path.rsplit("/", 1)[0] for _, reference, _, _ in writes}
+            watches = [watch for watch in self._watches if watch._path in paths]
+        for watch in watches:
+            watch._notify()
+        return results
+
+    def collection(self, collection_path):
+        return CollectionReference(self, collection_path)
+
+    def document(self, document_path):
+        return DocumentReference(self, document_path)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def write_option(self, last_update_time=None, **kwargs):
+        return LastUpdateOption(last_update_time)
+
+    def get_all(self, references, field_paths=None, transaction=None, **kwargs):
+        self._delay()
+        for reference in references:
+            yield self._snapshot(reference)
+
+    def collections(self):
+        with self._lock:
+            roots = {path for path in self._collections if "/" not in path and self._collections[path]}
+        return [CollectionReference(self, path) for path in sorted(roots)]
+
+    def clear(self):
+        with self._lock:
+            self._collections.clear()
+
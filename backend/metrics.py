@@ -0,0 +1,254 @@
+# backend/metrics.py
+
+"""
+In-process metrics for Firestore usage and HTTP requests, exposed in Prometheus text format.
+
+Every helper in database.py is wrapped with @instrument, which tags the call with the route
+of the request being served (or "background" outside a request) and records operation counts,
+documents read/written and latency.
+
+Each worker process counts on its own. With several workers (backend.serve sets METRICS_DIR),
+every worker also writes its metrics to METRICS_DIR/<pid>.json every SHARE_SECONDS and
+/metrics merges all the files, so a scrape answered by any worker covers all of them.
+Counters of workers that exited are kept (totals never go backwards); their gauges are not.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from starlette.concurrency import run_in_threadpool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_DIR = os.getenv("METRICS_DIR")
+SHARE_SECONDS = float(os.getenv("METRICS_SHARE_SECONDS", "5"))
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_help = {}
+
+
+class RequestStats:
+    """Per-request accumulator, shared by reference with threadpool copies of the context"""
+    __slots__ = ("route", "db_seconds", "db_calls")
+
+    def __init__(self, route):
+        self.route = route
+        self.db_seconds = 0.0
+        self.db_calls = 0
+
+
+_request_stats = ContextVar("request_stats", default=None)
+
+
+class Ewma:
+    """Exponentially weighted moving average, e.g. of recent Firestore latency"""
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.value = 0.0
+
+    def update(self, sample):
+        # A lost update under a race only drops one sample, so no lock
+        self.value += self.alpha * (sample - self.value)
+
+
+db_latency = Ewma(alpha=0.05)
+
+
+def start_request(route):
+    stats = RequestStats(route)
+    return stats, _request_stats.set(stats)
+
+
+def end_request(token):
+    _request_stats.reset(token)
+
+
+def current_route():
+    stats = _request_stats.get()
+    return stats.route if stats else "background"
+
+
+def describe(name, kind, help_text):
+    _help[name] = (kind, help_text)
+
+
+def inc(name, labels, amount=1):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, labels, value):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                hist[i] += 1
+        hist[-2] += value
+        hist[-1] += 1
+
+
+describe("doit_db_operations_total", "counter", "Firestore calls made through database.py")
+describe("doit_db_documents_total", "counter", "Documents returned by reads or sent by writes")
+describe("doit_db_operation_seconds", "histogram", "Latency of database.py calls")
+describe("doit_http_requests_total", "counter", "HTTP requests served")
+describe("doit_http_request_seconds", "histogram", "End-to-end HTTP request latency")
+describe("doit_open_streams", "gauge", "Server-Sent Event streams currently open")
+describe("doit_active_listeners", "gauge", "Shared Firestore snapshot listeners currently attached")
+
+
+def _document_count(result):
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def instrument(kind, collection=None, documents=None):
+    """
+    Decorate a database helper. kind is "read" or "write"; collection defaults to the first
+    argument; documents(args) overrides the document count (writes default to one).
+    """
+    def decorator(func):
+        op = func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            status = "error"
+            try:
+                result = func(*args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                stats = _request_stats.get()
+                route = stats.route if stats else "background"
+                if stats:
+                    stats.db_seconds += elapsed
+                    stats.db_calls += 1
+                coll = collection or (args[0] if args and isinstance(args[0], str) else "unknown")
+                # Subcollection paths (chats/<id>/messages) are labelled by their last segment
+                coll = coll.rsplit("/", 1)[-1]
+                labels = {"route": route, "op": op, "kind": kind, "collection": coll}
+                inc("doit_db_operations_total", {**labels, "status": status})
+                if status == "ok":
+                    if documents:
+                        count = documents(args)
+                    else:
+                        count = _document_count(result) if kind == "read" else 1
+                    inc("doit_db_documents_total", labels, count)
+                observe("doit_db_operation_seconds", {"route": route, "op": op}, elapsed)
+                db_latency.update(elapsed)
+        return wrapper
+    return decorator
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _snapshot():
+    with _lock:
+        return dict(_counters), {key: list(value) for key, value in _histograms.items()}
+
+
+def share():
+    """Write this worker's metrics to METRICS_DIR (no-op without it)"""
+    if not METRICS_DIR:
+        return
+    counters, histograms = _snapshot()
+    data = {
+        "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+        "histograms": [[name, labels, hist] for (name, labels), hist in histograms.items()],
+    }
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    # Readers never see a partial file
+    with open(path + ".partial", "w") as file:
+        json.dump(data, file)
+    os.replace(path + ".partial", path)
+
+
+async def share_periodically():
+    """Background loop started from the app lifespan when METRICS_DIR is set"""
+    while True:
+        try:
+            await run_in_threadpool(share)
+        except OSError as exc:
+            print(f"Sharing metrics failed: {exc}")
+        await asyncio.sleep(SHARE_SECONDS)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merged():
+    """Counters and histograms of every worker that wrote to METRICS_DIR, this one included"""
+    share()
+    counters, histograms = {}, {}
+    for filename in os.listdir(METRICS_DIR):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, filename)) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            continue
+        alive = _alive(int(filename[:-len(".json")]))
+        for name, labels, value in data["counters"]:
+            if not alive and _help.get(name, ("counter",))[0] == "gauge":
+                continue
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, hist in data["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            total = histograms.get(key)
+            histograms[key] = hist if total is None else [a + b for a, b in zip(total, hist)]
+    return counters, histograms
+
+
+def render():
+    """Render all metrics in the Prometheus text exposition format (version 0.0.4)"""
+    counters, histograms = _merged() if METRICS_DIR else _snapshot()
+
+    lines = []
+    for name, (kind, help_text) in _help.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind in ("counter", "gauge"):
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        else:
+            for (metric, labels), hist in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(LATENCY_BUCKETS, hist):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {hist[-1]}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {hist[-2]}")
+                lines.append(f"{name}_count{_format_labels(labels)} {hist[-1]}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,16 @@
+# backend/migrations/__init__.py
+
+"""
+Resumable bulk backfills.
+
+A migration is a transform registered for a collection (see registry.migration). The runner
+pages through the collection in document id order, writes the returned fields through a
+rate-limited batched writer and checkpoints its cursor in "_migrations/{name}".
+
+    python -m backend.migrations list
+    python -m backend.migrations run users_geohash --dry-run
+    python -m backend.migrations status users_geohash
+"""
+from backend.migrations.registry import MIGRATIONS, Migration, migration
+from backend.migrations.runner import BulkWriter, get_checkpoint, run_migration
+from backend.migrations import transforms  # noqa: F401  registers the built-in migrations
@@ -0,0 +1,51 @@
+# backend/migrations/__main__.py
+
+import argparse
+
+import backend.migrations
+from backend.migrations import MIGRATIONS, get_checkpoint, run_migration
+from backend.migrations.runner import PAGE_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.migrations",
+        description=backend.migrations.__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="Show registered migrations and their progress")
+
+    run = commands.add_parser("run", help="Run (or resume) a migration")
+    run.add_argument("name", choices=sorted(MIGRATIONS))
+    run.add_argument("--dry-run", action="store_true", help="Report changes without writing")
+    run.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    run.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    run.add_argument("--max-per-second", type=float, default=None, help="Cap on writes per second")
+    run.add_argument("--limit", type=int, default=None, help="Stop after about this many documents")
+
+    status = commands.add_parser("status", help="Show a migration's checkpoint")
+    status.add_argument("name", choices=sorted(MIGRATIONS))
+
+    args = parser.parse_args()
+    if args.command == "list":
+        for name, migration in sorted(MIGRATIONS.items()):
+            checkpoint = get_checkpoint(name) or {}
+            print(f"{name:24} {migration.collection:14} {checkpoint.get('status', 'pending'):8} {migration.description}")
+    elif args.command == "status":
+        print(get_checkpoint(args.name) or f"{args.name}: never run")
+    else:
+        state = run_migration(
+            args.name,
+            dry_run=args.dry_run,
+            restart=args.restart,
+            page_size=args.page_size,
+            max_per_second=args.max_per_second,
+            limit=args.limit,
+        )
+        print(f"{args.name}: {state['status']}, {state['scanned']} scanned, {state['updated']} updated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# backend/migrations/registry.py
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+MIGRATIONS = {}
+
+
+@dataclass
+class Migration:
+    name: str
+    collection: str
+    transform: Callable
+    description: str = ""
+    target: Optional[str] = None
+    conditional: bool = False
+
+
+def migration(name, collection, target=None, conditional=False):
+    """
+    Register a transform for every document of collection. It receives the document (with
+    "id") and returns the fields to update, or None/{} to leave it alone. Runs may repeat
+    after an interruption, so transforms must be idempotent.
+
+    With target, the transform instead returns whole documents (doc_id -> data) to write
+    into the target collection, e.g. to derive one collection from another.
+
+    With conditional, each document is re-read just before its transform and the update is
+    written only if the document has not changed since (retried otherwise), for transforms
+    that derive fields from other collections while requests keep updating them.
+    """
+    def decorator(func):
+        MIGRATIONS[name] = Migration(name, collection, func, (func.__doc__ or "").strip(), target, conditional)
+        return func
+    return decorator
@@ -0,0 +1,167 @@
+# backend/migrations/runner.py
+
+import time
+from datetime import datetime, timezone
+
+from backend.database import (
+    add_document,
+    add_documents,
+    get_document,
+    get_document_versioned,
+    page_documents,
+    update_document_if_unchanged,
+    update_documents,
+    WriteConflict
+)
+from backend.migrations.registry import MIGRATIONS
+
+CHECKPOINTS = "_migrations"
+PAGE_SIZE = 500
+# Conditional migrations give up on a document that keeps changing under them
+CONFLICT_ATTEMPTS = 5
+# Firestore's "500/50/5" guidance: start at 500 writes/s, grow 50% every 5 minutes
+INITIAL_WRITES_PER_SECOND = 500
+RAMP_FACTOR = 1.5
+RAMP_SECONDS = 300
+
+
+class BulkWriter:
+    """Buffers updates and commits them in batches, pacing writes to the ramped rate limit"""
+
+    def __init__(self, collection_name, max_per_second=None, dry_run=False, overwrite=False):
+        self.collection_name = collection_name
+        self.max_per_second = max_per_second
+        self.dry_run = dry_run
+        # Write whole documents (set) instead of partial updates
+        self.overwrite = overwrite
+        self.pending = {}
+        self.written = 0
+        self.started = time.monotonic()
+
+    def rate(self):
+        ramped = INITIAL_WRITES_PER_SECOND * RAMP_FACTOR ** ((time.monotonic() - self.started) // RAMP_SECONDS)
+        return min(ramped, self.max_per_second) if self.max_per_second else ramped
+
+    def add(self, doc_id, fields):
+        self.pending[doc_id] = fields
+
+    def flush(self):
+        if not self.pending:
+            return
+        if not self.dry_run:
+            write = add_documents if self.overwrite else update_documents
+            write(self.collection_name, self.pending)
+        self.written += len(self.pending)
+        self.pending = {}
+        self.pace()
+
+    def write_if_unchanged(self, doc_id, current, update_time, fields):
+        """Write one update now, with a precondition; raises WriteConflict"""
+        if not self.dry_run:
+            update_document_if_unchanged(self.collection_name, doc_id, current, update_time, fields)
+        self.written += 1
+        self.pace()
+
+    def pace(self):
+        # Sleep until the writes so far fit the allowed rate
+        ahead = self.written / self.rate() - (time.monotonic() - self.started)
+        if ahead > 0 and not self.dry_run:
+            time.sleep(ahead)
+
+
+def get_checkpoint(name):
+    return get_document(CHECKPOINTS, name)
+
+
+def _transform_if_unchanged(migration, writer, doc_id):
+    """Transform the document as it is now and write the result unless it changed meanwhile"""
+    for _ in range(CONFLICT_ATTEMPTS):
+        current, update_time = get_document_versioned(migration.collection, doc_id)
+        if current is None:
+            return None
+        fields = migration.transform({**current, "id": doc_id})
+        if not fields:
+            return fields
+        try:
+            writer.write_if_unchanged(doc_id, current, update_time, fields)
+        except WriteConflict:
+            continue
+        return fields
+    raise WriteConflict(f"{migration.collection}/{doc_id} kept changing during {migration.name}")
+
+
+def run_migration(name, dry_run=False, restart=False, page_size=PAGE_SIZE, max_per_second=None,
+                  limit=None, report=print):
+    """
+    Stream the migration's collection in document id order, apply its transform and write the
+    changes. The cursor is checkpointed in _migrations/{name} after each page's writes commit,
+    so an interrupted run resumes where it stopped (restart=True starts over). A dry run only
+    reports what would change and writes nothing, checkpoints included.
+    """
+    migration = MIGRATIONS[name]
+    checkpoint = None if restart or dry_run else get_checkpoint(name)
+    if checkpoint and checkpoint.get("status") == "done":
+        report(f"{name}: already done (use --restart to run again)")
+        return checkpoint
+
+    state = {
+        "name": name,
+        "collection": migration.collection,
+        "status": "running",
+        "cursor": None,
+        "scanned": 0,
+        "updated": 0,
+        "started_at": datetime.now(timezone.utc),
+    }
+    if checkpoint:
+        state.update({key: checkpoint[key] for key in ("cursor", "scanned", "updated", "started_at") if key in checkpoint})
+        report(f"{name}: resuming after {state['cursor']!r} ({state['scanned']} scanned)")
+
+    if migration.target:
+        writer = BulkWriter(migration.target, max_per_second, dry_run, overwrite=True)
+    else:
+        writer = BulkWriter(migration.collection, max_per_second, dry_run)
+    started = time.monotonic()
+    scanned_this_run = 0
+    while True:
+        page = page_documents(migration.collection, state["cursor"], page_size)
+        if not page:
+            break
+        for doc in page:
+            if migration.conditional:
+                # Written one by one, each with its precondition
+                fields = _transform_if_unchanged(migration, writer, doc["id"])
+            else:
+                fields = migration.transform(doc)
+                if fields and migration.target:
+                    for target_id, data in fields.items():
+                        writer.add(target_id, data)
+                elif fields:
+                    writer.add(doc["id"], fields)
+            if fields:
+                if dry_run and state["updated"] < 5:
+                    report(f"  {doc['id']}: {fields}")
+                state["updated"] += 1
+        writer.flush()
+
+        state["cursor"] = page[-1]["id"]
+        state["scanned"] += len(page)
+        scanned_this_run += len(page)
+        if not dry_run:
+            add_document(CHECKPOINTS, name, {**state, "updated_at": datetime.now(timezone.utc)})
+
+        elapsed = time.monotonic() - started
+        report(
+            f"{name}: {state['scanned']} scanned, {state['updated']} {'to update' if dry_run else 'updated'}, "
+            f"{scanned_this_run / elapsed if elapsed else 0:.0f} docs/s"
+        )
+        if len(page) < page_size or (limit and scanned_this_run >= limit):
+            break
+
+    finished = len(page) < page_size if page else True
+    if finished:
+        state["status"] = "done"
+        state["finished_at"] = datetime.now(timezone.utc)
+        if not dry_run:
+            add_document(CHECKPOINTS, name, {**state, "updated_at": datetime.now(timezone.utc)})
+    return state
@@ -0,0 +1,53 @@
+# backend/migrations/transforms.py
+
+"""Built-in backfills; each one is idempotent and only returns fields that actually change"""
+from backend import feed, geo
+from backend.archival import archive_name
+from backend.database import aggregate_documents
+from backend.migrations.registry import migration
+from backend.search import search_keys
+
+USER_GEOHASH_PRECISION = 9
+
+
+def _changed(doc, fields):
+    return {key: value for key, value in fields.items() if doc.get(key) != value}
+
+
+@migration("users_geohash", "users")
+def users_geohash(user):
+    """Set geohash on users that shared coordinates before it was stored"""
+    if user.get("latitude") is None or user.get("longitude") is None:
+        return None
+    return _changed(user, {"geohash": geo.encode(user["latitude"], user["longitude"], USER_GEOHASH_PRECISION)})
+
+
+@migration("users_search_keys", "users")
+def users_search_keys(user):
+    """Add username_lower/email_lower for case-insensitive lookups"""
+    return _changed(user, search_keys(user))
+
+
+def _count_tasks(filters):
+    # Finished tasks move to the archive but still count
+    return sum(aggregate_documents(name, filters)["count"] for name in ("tasks", archive_name("tasks")))
+
+
+@migration("users_task_counters", "users", conditional=True)
+def users_task_counters(user):
+    """Recompute posted_tasks/completed_tasks from tasks and tasks_archive with count queries"""
+    posted = _count_tasks([("creator_uid", "==", user["uid"])])
+    completed = _count_tasks([("tasker_uid", "==", user["uid"]), ("status", "==", "completed")])
+    return _changed(user, {"posted_tasks": posted, "completed_tasks": completed})
+
+
+@migration("chats_participants", "chats")
+def chats_participants(chat):
+    """Add a participants array so a user's chats are one array-contains query"""
+    return _changed(chat, {"participants": [chat["user1_id"], chat["user2_id"]]})
+
+
+@migration("task_feed_backfill", "tasks", target=feed.FEED_COLLECTION)
+def task_feed_backfill(task):
+    """Publish tasks that were open before the materialized feed existed"""
+    return feed.feed_entries(task)
@@ -0,0 +1,282 @@
+# backend/pricing.py
+
+"""
+Price suggestions from streaming quantile sketches of task budgets and offered prices.
+
+Every task created and every application sent adds its budget / offered_price to two
+sketches: one for the category and one for the category within a geohash cell
+(PRICING_GEOHASH_PRECISION, ~40 km at the default 4). A sketch is a log-bucketed histogram
+(the DDSketch scheme): bucket i counts values in (gamma^(i-1), gamma^i], so any quantile it
+returns is within RELATIVE_ACCURACY of the true one, it only grows with the logarithm of the
+price range, and sketches merge by adding bucket counts.
+
+Each worker serves suggestions from its in-memory sketches and keeps the values it recorded
+since the last flush as a delta. Every PRICING_SYNC_SECONDS the deltas are added to the
+"price_sketches" documents with field increments (no read-modify-write, so workers never
+conflict) and the merged sketches are read back, which brings in the other workers' values.
+
+Sketches only grow; they are not adjusted when a task's budget is edited or a task deleted.
+`python -m backend.pricing rebuild` recomputes them from the tasks and applications.
+"""
+import argparse
+import asyncio
+import math
+import os
+import threading
+from typing import Optional
+from urllib.parse import quote
+
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from backend import geo
+from backend.database import add_documents, add_to_field, get_all_documents, merge_documents, page_documents
+
+COLLECTION = "price_sketches"
+RELATIVE_ACCURACY = 0.01
+GEOHASH_PRECISION = int(os.getenv("PRICING_GEOHASH_PRECISION", "4"))
+SYNC_SECONDS = int(os.getenv("PRICING_SYNC_SECONDS", "60"))
+# A cell needs this many values before its percentiles are preferred over the category's
+MIN_CELL_SAMPLES = int(os.getenv("PRICING_MIN_CELL_SAMPLES", "20"))
+KINDS = ("budget", "offered_price")
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+class QuantileSketch:
+    """Log-bucketed histogram of positive values; counts of values <= 0 are kept apart"""
+
+    gamma = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    _log_gamma = math.log(gamma)
+
+    def __init__(self, buckets=None, zero=0):
+        self.buckets = buckets or {}
+        self.zero = zero
+        self.count = zero + sum(self.buckets.values())
+
+    def add(self, value, count=1):
+        if value <= 0:
+            self.zero += count
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+
+    def merge(self, other):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero += other.zero
+        self.count += other.count
+
+    def quantiles(self, qs):
+        """Values at the ascending quantiles qs (0..1) in one pass, or None for an empty sketch"""
+        if not self.count:
+            return None
+        ranks = [q * (self.count - 1) for q in qs]
+        values = []
+        seen = self.zero
+        while ranks and ranks[0] < seen:
+            values.append(0.0)
+            ranks.pop(0)
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            while ranks and ranks[0] < seen:
+                # Midpoint (in relative terms) of (gamma^(i-1), gamma^i]
+                values.append(2 * self.gamma ** index / (self.gamma + 1))
+                ranks.pop(0)
+            if not ranks:
+                break
+        return values
+
+    def to_dict(self):
+        return {"zero": self.zero, "buckets": {str(index): count for index, count in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls({int(index): count for index, count in (data.get("buckets") or {}).items()}, data.get("zero", 0))
+
+
+class PriceStats(BaseModel):
+    scope: str  # "cell" or "category"
+    count: int
+    p10: float
+    p25: float
+    p50: float
+    p75: float
+    p90: float
+
+
+class PriceSuggestion(BaseModel):
+    category: str
+    cell: Optional[str]
+    budget: Optional[PriceStats]
+    offered_price: Optional[PriceStats]
+
+
+_lock = threading.Lock()
+_sketches = {}  # (kind, category, cell or None) -> QuantileSketch, persisted plus local values
+_pending = {}   # same keys, values recorded here since the last flush
+
+
+def cell_of(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    return geo.encode(latitude, longitude, GEOHASH_PRECISION)
+
+
+def _doc_id(key):
+    kind, category, cell = key
+    return ":".join([kind, quote(category, safe="")] + ([cell] if cell else []))
+
+
+def _keys(kind, category, latitude, longitude):
+    cell = cell_of(latitude, longitude)
+    return [(kind, category, None)] + ([(kind, category, cell)] if cell else [])
+
+
+def record(kind, category, value, latitude=None, longitude=None):
+    """Add one price to the category's and cell's sketches (cheap; called on the write path)"""
+    if value is None or not category:
+        return
+    with _lock:
+        for key in _keys(kind, category, latitude, longitude):
+            for sketches in (_sketches, _pending):
+                sketch = sketches.get(key)
+                if sketch is None:
+                    sketch = sketches[key] = QuantileSketch()
+                sketch.add(value)
+
+
+def record_task(task):
+    record("budget", task["category"], task.get("budget"), task.get("latitude"), task.get("longitude"))
+
+
+def record_offer(task, offered_price):
+    record("offered_price", task["category"], offered_price, task.get("latitude"), task.get("longitude"))
+
+
+def _stats(kind, category, cell):
+    """Percentiles of the cell's sketch if it has enough values, else the category's"""
+    sketch = _sketches.get((kind, category, cell)) if cell else None
+    scope = "cell"
+    if sketch is None or sketch.count < MIN_CELL_SAMPLES:
+        sketch, scope = _sketches.get((kind, category, None)), "category"
+    if sketch is None or not sketch.count:
+        return None
+    values = sketch.quantiles([p / 100 for p in PERCENTILES])
+    stats = {f"p{p}": round(value, 2) for p, value in zip(PERCENTILES, values)}
+    return {"scope": scope, "count": sketch.count, **stats}
+
+
+def suggest(category, latitude=None, longitude=None):
+    cell = cell_of(latitude, longitude)
+    with _lock:
+        return {
+            "category": category,
+            "cell": cell,
+            **{kind: _stats(kind, category, cell) for kind in KINDS},
+        }
+
+
+def _document(key, sketch):
+    kind, category, cell = key
+    return {"kind": kind, "category": category, "cell": cell, **sketch.to_dict()}
+
+
+def flush():
+    """Add the values recorded since the last flush to the persisted sketches"""
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    if not pending:
+        return
+    updates = {}
+    for key, sketch in pending.items():
+        kind, category, cell = key
+        update = {"kind": kind, "category": category, "cell": cell, "zero": add_to_field(sketch.zero)}
+        if sketch.buckets:
+            # An empty map would replace the stored buckets instead of merging into them
+            update["buckets"] = {str(index): add_to_field(count) for index, count in sketch.buckets.items()}
+        updates[_doc_id(key)] = update
+    try:
+        merge_documents(COLLECTION, updates)
+    except Exception:
+        # Keep the deltas for the next attempt
+        with _lock:
+            for key, sketch in pending.items():
+                _pending.setdefault(key, QuantileSketch()).merge(sketch)
+        raise
+
+
+def load():
+    """Replace the in-memory sketches with the persisted ones plus the values not flushed yet"""
+    sketches = {}
+    for doc in get_all_documents(COLLECTION):
+        sketches[(doc["kind"], doc["category"], doc.get("cell"))] = QuantileSketch.from_dict(doc)
+    with _lock:
+        for key, sketch in _pending.items():
+            sketches.setdefault(key, QuantileSketch()).merge(sketch)
+        _sketches.clear()
+        _sketches.update(sketches)
+
+
+def sync():
+    flush()
+    load()
+
+
+async def sync_periodically():
+    """Background loop started from the app lifespan; the first pass loads the sketches"""
+    while True:
+        try:
+            await run_in_threadpool(sync)
+        except Exception as exc:
+            print(f"Price sketch sync failed: {exc}")
+        await asyncio.sleep(SYNC_SECONDS)
+
+
+def _scan(collection_name):
+    after_id = None
+    while True:
+        page = page_documents(collection_name, after_id)
+        if not page:
+            return
+        yield from page
+        after_id = page[-1]["id"]
+
+
+def rebuild():
+    """
+    Recompute every sketch from the tasks and applications and overwrite the persisted ones.
+    Values workers flush while this runs are lost, so run it before they take writes (e.g. when
+    first deploying price suggestions) or accept a small undercount.
+    """
+    sketches = {}
+    tasks = {}
+
+    def add(kind, task, value):
+        if value is None or not task.get("category"):
+            return
+        for key in _keys(kind, task["category"], task.get("latitude"), task.get("longitude")):
+            sketches.setdefault(key, QuantileSketch()).add(value)
+
+    for task in _scan("tasks"):
+        tasks[task["id"]] = {field: task.get(field) for field in ("category", "latitude", "longitude")}
+        add("budget", task, task.get("budget"))
+    for application in _scan("applications"):
+        task = tasks.get(application.get("task_id"))
+        if task:
+            add("offered_price", task, application.get("offered_price"))
+
+    add_documents(COLLECTION, {_doc_id(key): _document(key, sketch) for key, sketch in sketches.items()})
+    with _lock:
+        _pending.clear()
+    load()
+    return len(sketches)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m backend.pricing", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    print(f"Rebuilt {rebuild()} price sketches")
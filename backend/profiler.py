@@ -0,0 +1,225 @@
+# backend/profiler.py
+
+"""
+Opt-in sampling profiler for live workers.
+
+ProfilerMiddleware marks a request as profiled when a random draw falls under the sample rate
+(PROFILE_SAMPLE_RATE, default 0, adjustable at runtime through the admin API) or when it
+carries X-Debug-Profile with the PROFILE_TOKEN secret. While at least one profiled request is
+running, a sampler thread captures every thread's stack every PROFILE_INTERVAL_MS with
+sys._current_frames() and adds it to per-route counts of folded stacks ("a;b;c"), the input
+format of flamegraph.pl and speedscope.
+
+Async handlers run on the event loop thread, whose stack is attributed to the route of the
+task it is currently running. Route handlers are mostly plain def functions that run in the
+threadpool; a threadpool stack is attributed to the route whose endpoint function is on it.
+Other threadpool stacks inside app code (e.g. dependencies) are attributed when only one
+route is being profiled, and counted as ambiguous otherwise.
+
+When nothing is profiled the sampler thread sleeps on an event and the middleware costs one
+comparison per request. Counts are per worker process.
+"""
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from backend import metrics
+
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+HEADER = b"x-debug-profile"
+MAX_DEPTH = 128
+# Distinct stacks kept per route; beyond this new stacks are dropped (their samples still count)
+MAX_STACKS_PER_ROUTE = 5000
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+STDLIB_ROOT = os.path.dirname(os.__file__) + os.sep
+
+_state = {"sample_rate": SAMPLE_RATE, "thread": None, "ambiguous": 0}
+_lock = threading.Lock()
+_active = {}  # task -> (route, loop, loop thread id)
+_wake = threading.Event()
+_profiles = {}  # route -> {"samples": n, "requests": n, "stacks": Counter}
+_endpoints = {}  # endpoint function code -> route template
+
+
+def set_sample_rate(rate):
+    _state["sample_rate"] = rate
+
+
+def sample_rate():
+    return _state["sample_rate"]
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    path = code.co_filename
+    if "site-packages" + os.sep in path:
+        path = path.split("site-packages" + os.sep, 1)[1]
+    elif path.startswith(APP_ROOT):
+        path = "backend" + path[len(APP_ROOT):]
+    elif path.startswith(STDLIB_ROOT):
+        path = path[len(STDLIB_ROOT):]
+    # co_qualname (Class.method) is new in Python 3.11
+    return f"{path}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _fold(frame):
+    """Folded stack of frame, whether it runs app code, and the route of an endpoint on it"""
+    labels = []
+    in_app = False
+    endpoint = None
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_frame_label(frame))
+        in_app = in_app or frame.f_code.co_filename.startswith(APP_ROOT)
+        endpoint = endpoint or _endpoints.get(frame.f_code)
+        frame = frame.f_back
+    return ";".join(reversed(labels)), in_app, endpoint
+
+
+def _index_endpoints(app):
+    for route in getattr(app, "routes", ()):
+        code = getattr(getattr(route, "endpoint", None), "__code__", None)
+        if code is not None:
+            _endpoints[code] = route.path
+
+
+def _profile(route):
+    profile = _profiles.get(route)
+    if profile is None:
+        profile = _profiles[route] = {"samples": 0, "requests": 0, "stacks": Counter()}
+    return profile
+
+
+def _record(route, stack):
+    profile = _profile(route)
+    profile["samples"] += 1
+    if stack in profile["stacks"] or len(profile["stacks"]) < MAX_STACKS_PER_ROUTE:
+        profile["stacks"][stack] += 1
+
+
+def _sample():
+    with _lock:
+        active = list(_active.items())
+    if not active:
+        return
+    loops = {}
+    for task, (route, loop, thread_id) in active:
+        loops.setdefault(thread_id, (loop, {}))[1][task] = route
+    routes = {route for _, (route, _, _) in active}
+    own = threading.get_ident()
+
+    for thread_id, frame in sys._current_frames().items():
+        if thread_id == own:
+            continue
+        if thread_id in loops:
+            loop, tasks = loops[thread_id]
+            route = tasks.get(asyncio.current_task(loop))
+            if route is not None:
+                stack, _, _ = _fold(frame)
+                with _lock:
+                    _record(route, stack)
+            continue
+        stack, in_app, endpoint = _fold(frame)
+        if not in_app:
+            continue
+        with _lock:
+            if endpoint in routes:
+                _record(endpoint, stack)
+            elif len(routes) == 1:
+                _record(next(iter(routes)), stack)
+            else:
+                _state["ambiguous"] += 1
+
+
+def _run_sampler():
+    while True:
+        _wake.wait()
+        _sample()
+        time.sleep(INTERVAL_SECONDS)
+
+
+def _begin(task, route):
+    with _lock:
+        _active[task] = (route, asyncio.get_running_loop(), threading.get_ident())
+        _profile(route)["requests"] += 1
+        if _state["thread"] is None:
+            _state["thread"] = threading.Thread(target=_run_sampler, name="profiler", daemon=True)
+            _state["thread"].start()
+    _wake.set()
+
+
+def _end(task):
+    with _lock:
+        _active.pop(task, None)
+        if not _active:
+            _wake.clear()
+
+
+def _requested(scope):
+    if PROFILE_TOKEN:
+        for name, value in scope["headers"]:
+            if name == HEADER:
+                return value.decode() == PROFILE_TOKEN
+    return False
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware, so it runs in the same task as the endpoint; it must sit inside
+    every BaseHTTPMiddleware (those run the rest of the stack in a new task).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (
+            (_state["sample_rate"] > 0 and random.random() < _state["sample_rate"]) or _requested(scope)
+        ):
+            return await self.app(scope, receive, send)
+
+        if not _endpoints:
+            _index_endpoints(scope.get("app"))
+        task = asyncio.current_task()
+        _begin(task, metrics.current_route())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _end(task)
+
+
+def summary():
+    """Samples and profiled requests per route"""
+    with _lock:
+        return {
+            "worker": os.getpid(),
+            "sample_rate": _state["sample_rate"],
+            "interval_ms": INTERVAL_SECONDS * 1000,
+            "ambiguous_samples": _state["ambiguous"],
+            "routes": {
+                route: {"requests": p["requests"], "samples": p["samples"], "stacks": len(p["stacks"])}
+                for route, p in sorted(_profiles.items())
+            },
+        }
+
+
+def folded(route=None):
+    """Folded stacks ("frame;frame;frame count" lines), prefixed with the route, for flame graphs"""
+    with _lock:
+        lines = [
+            f"{name};{stack} {count}"
+            for name, profile in sorted(_profiles.items()) if route is None or name == route
+            for stack, count in profile["stacks"].most_common()
+        ]
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def reset():
+    with _lock:
+        _profiles.clear()
+        _state["ambiguous"] = 0
@@ -0,0 +1,100 @@
+# backend/ranking.py
+
+"""
+Scoring of taskers for a task.
+
+All candidates are scored in one vectorized pass: a confidence-weighted rating, experience
+from completed tasks, distance to the task and the offered price relative to the budget are
+each mapped to [0, 1] and combined with WEIGHTS. Missing signals score a neutral 0.5.
+"""
+import numpy as np
+
+from backend import geo
+from backend.database import query_documents
+
+WEIGHTS = {
+    "rating": 0.35,
+    "experience": 0.20,
+    "distance": 0.30,
+    "price": 0.15,
+}
+# Ratings are shrunk towards PRIOR_RATING as if every tasker had PRIOR_WEIGHT extra ratings
+PRIOR_RATING = 3.5
+PRIOR_WEIGHT = 5
+EXPERIENCE_SCALE = 10.0
+DISTANCE_SCALE_KM = 10.0
+NEUTRAL = 0.5
+
+
+COLUMNS = ("rating", "rating_count", "completed_tasks", "latitude", "longitude", "offered_price")
+
+
+def _columns(candidates):
+    # numpy converts None to NaN for float arrays, which marks the signal as missing
+    return {key: np.array([c.get(key) for c in candidates], dtype=np.float64) for key in COLUMNS}
+
+
+def score_candidates(candidates, task):
+    """
+    Score candidate dicts (user fields, optionally "offered_price") for the task.
+    Returns a numpy array of scores in [0, 1], aligned with candidates.
+    """
+    if not candidates:
+        return np.empty(0)
+
+    columns = _columns(candidates)
+    rating = np.nan_to_num(columns["rating"], nan=0.0)
+    rating_count = np.nan_to_num(columns["rating_count"], nan=0.0)
+    completed = np.nan_to_num(columns["completed_tasks"], nan=0.0)
+
+    bayesian = (rating * rating_count + PRIOR_RATING * PRIOR_WEIGHT) / (rating_count + PRIOR_WEIGHT)
+    rating_score = np.clip(bayesian / 5.0, 0.0, 1.0)
+
+    experience_score = 1.0 - np.exp(-completed / EXPERIENCE_SCALE)
+
+    distance_score = np.full(len(candidates), NEUTRAL)
+    if task.get("latitude") is not None and task.get("longitude") is not None:
+        lat = np.radians(columns["latitude"])
+        lng = np.radians(columns["longitude"])
+        task_lat, task_lng = np.radians(task["latitude"]), np.radians(task["longitude"])
+        a = (np.sin((lat - task_lat) / 2) ** 2
+             + np.cos(lat) * np.cos(task_lat) * np.sin((lng - task_lng) / 2) ** 2)
+        distance = 2 * geo.EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+        distance_score = np.where(np.isnan(distance), NEUTRAL, np.exp(-distance / DISTANCE_SCALE_KM))
+
+    price_score = np.full(len(candidates), NEUTRAL)
+    if task.get("budget"):
+        ratio = columns["offered_price"] / float(task["budget"])
+        # At or under budget scores 1, dropping linearly to 0 at twice the budget
+        price_score = np.where(np.isnan(ratio), NEUTRAL, np.clip(2.0 - ratio, 0.0, 1.0))
+
+    return (
+        WEIGHTS["rating"] * rating_score
+        + WEIGHTS["experience"] * experience_score
+        + WEIGHTS["distance"] * distance_score
+        + WEIGHTS["price"] * price_score
+    )
+
+
+def rank(candidates, task, limit=None):
+    """Return (candidate, score) pairs, best first"""
+    scores = score_candidates(candidates, task)
+    order = np.argsort(-scores, kind="stable")
+    if limit is not None:
+        order = order[:limit]
+    return [(candidates[i], round(float(scores[i]), 4)) for i in order]
+
+
+def nearby_users(latitude, longitude, radius_km, per_cell_limit=500):
+    """Users whose stored geohash falls in the cells covering the circle, within radius_km"""
+    users = {}
+    for cell in geo.covering_cells(latitude, longitude, radius_km, precisions=(3, 4, 5)):
+        for user in query_documents(
+            "users", [("geohash", ">=", cell), ("geohash", "<", cell + "~")], limit=per_cell_limit
+        ):
+            users[user["uid"]] = user
+    return [
+        user for user in users.values()
+        if user.get("latitude") is not None and user.get("longitude") is not None
+        and geo.distance_km(latitude, longitude, user["latitude"], user["longitude"]) <= radius_km
+    ]
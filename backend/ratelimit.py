@@ -0,0 +1,139 @@
+# backend/ratelimit.py
+
+"""
+Per-user rate limiting and global admission control.
+
+rate_limited(cost_class) wraps get_current_user with a token bucket per (uid, cost class):
+scans that read whole collections get a small burst and slow refill, point reads and writes
+more generous ones. An empty bucket answers 429 with Retry-After set to when the next token
+arrives.
+
+admission_control is an HTTP middleware in front of every route. It sheds requests with 503
+and Retry-After when too many are in flight, or (probabilistically, so some traffic keeps
+measuring) while the moving average of Firestore latency is above DB_LATENCY_SHED_SECONDS.
+"""
+import math
+import os
+import random
+import threading
+import time
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from backend import metrics
+from backend.routers.auth import get_current_user, get_current_user_versioned
+
+# cost class -> (burst capacity, tokens refilled per second)
+COST_CLASSES = {
+    "scan": (10, 0.5),
+    "read": (60, 10.0),
+    "write": (20, 2.0),
+}
+MAX_BUCKETS = 100_000
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "200"))
+DB_LATENCY_SHED_SECONDS = float(os.getenv("ADMISSION_DB_LATENCY_SECONDS", "1.0"))
+EXEMPT_PATHS = ("/api/health", "/metrics")
+
+metrics.describe("doit_rate_limited_total", "counter", "Requests rejected by the per-user rate limiter")
+metrics.describe("doit_shed_requests_total", "counter", "Requests shed by admission control")
+metrics.describe("doit_in_flight_requests", "gauge", "Requests currently being handled")
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity):
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self, capacity, rate, cost=1.0):
+        """Take cost tokens; returns 0 on success, else the seconds until enough are available"""
+        current = time.monotonic()
+        self.tokens = min(capacity, self.tokens + (current - self.updated) * rate)
+        self.updated = current
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / rate
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def _evict_idle(current):
+    # Buckets that have refilled completely hold no state worth keeping
+    for key, bucket in list(_buckets.items()):
+        capacity, rate = COST_CLASSES[key[1]]
+        if bucket.tokens + (current - bucket.updated) * rate >= capacity:
+            del _buckets[key]
+
+
+def check_rate(uid, cost_class):
+    """Returns 0 if the request may proceed, else the Retry-After delay in seconds"""
+    capacity, rate = COST_CLASSES[cost_class]
+    with _buckets_lock:
+        bucket = _buckets.get((uid, cost_class))
+        if bucket is None:
+            if len(_buckets) >= MAX_BUCKETS:
+                _evict_idle(time.monotonic())
+            bucket = _buckets[(uid, cost_class)] = TokenBucket(capacity)
+        return bucket.take(capacity, rate)
+
+
+def rate_limited(cost_class, versioned=False):
+    """
+    Dependency to use instead of get_current_user on routes that should be rate limited;
+    versioned=True stands in for get_current_user_versioned and returns (user, update_time)
+    """
+    if cost_class not in COST_CLASSES:
+        raise ValueError(f"Unknown cost class: {cost_class}")
+
+    def dependency(current=Depends(get_current_user_versioned if versioned else get_current_user)):
+        if not RATE_LIMIT_ENABLED:
+            return current
+        current_user = current[0] if versioned else current
+        wait = check_rate(current_user["uid"], cost_class)
+        if wait:
+            metrics.inc("doit_rate_limited_total", {"cost_class": cost_class})
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please slow down",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+        return current
+
+    return dependency
+
+
+_in_flight = {"count": 0}
+
+
+def _shed(reason, retry_after):
+    metrics.inc("doit_shed_requests_total", {"reason": reason})
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry"},
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+async def admission_control(request: Request, call_next):
+    if request.url.path in EXEMPT_PATHS:
+        return await call_next(request)
+
+    if _in_flight["count"] >= MAX_IN_FLIGHT:
+        return _shed("in_flight", 1)
+    latency = metrics.db_latency.value
+    if latency > DB_LATENCY_SHED_SECONDS and random.random() > DB_LATENCY_SHED_SECONDS / latency:
+        return _shed("db_latency", max(1, math.ceil(latency)))
+
+    _in_flight["count"] += 1
+    metrics.inc("doit_in_flight_requests", {})
+    try:
+        return await call_next(request)
+    finally:
+        _in_flight["count"] -= 1
+        metrics.inc("doit_in_flight_requests", {}, -1)
@@ -0,0 +1,250 @@
+# backend/records.py
+
+"""
+Compact records for documents the app keeps in memory: users, tasks, applications, chats,
+messages and reviews.
+
+A record keeps its fields in __slots__ declared from the class annotations, so it has no
+per-instance dict and no per-key hash table: a record takes about half the memory of the
+equivalent dict (see backend/benchmarks/records.py). Fields a class does not declare (older
+or newer document shapes) go into a small overflow dict.
+
+Building a record costs several times more CPU than copying a dict, and pydantic validates
+dicts faster than records, so database.py returns plain dicts and handlers respond with them.
+Records only pay off for documents that are retained, such as live_location's chat cache.
+They are mutable mappings (chat["location_shared"], chat.get(...), {**chat}); the Firestore
+client only encodes dicts, so a record is never passed to the write helpers as it is.
+"""
+from abc import ABCMeta
+from collections.abc import MutableMapping
+from datetime import datetime
+from typing import List, Optional
+
+_MISSING = object()
+
+
+class _RecordMeta(ABCMeta):
+    """Derives __slots__ from the annotations a Record subclass declares"""
+
+    def __new__(mcs, name, bases, namespace):
+        fields = tuple(namespace.get("__annotations__", {}))
+        namespace["__slots__"] = fields
+        cls = super().__new__(mcs, name, bases, namespace)
+        cls._fields = tuple(
+            field for base in reversed(cls.__mro__) for field in getattr(base, "__slots__", ()) if field != "_extra"
+        )
+        cls._field_set = frozenset(cls._fields)
+        return cls
+
+
+class Record(MutableMapping, metaclass=_RecordMeta):
+    _extra: Optional[dict]
+
+    def __init__(self, data=None):
+        self._extra = None
+        if data:
+            field_set = self._field_set
+            for key, value in data.items():
+                if key in field_set:
+                    setattr(self, key, value)
+                else:
+                    self[key] = value
+
+    @classmethod
+    def from_document(cls, data, doc_id=None):
+        """Build a record from a snapshot's to_dict(), optionally setting "id" like get_all_documents"""
+        record = cls(data)
+        if doc_id is not None:
+            record["id"] = doc_id
+        return record
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._field_set:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._field_set:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __getattr__(self, name):
+        # Only called when normal lookup fails: an unset slot or an overflow field
+        if name != "_extra" and self._extra is not None and name in self._extra:
+            return self._extra[name]
+        raise AttributeError(name)
+
+    def __iter__(self):
+        for field in self._fields:
+            if getattr(self, field, _MISSING) is not _MISSING:
+                yield field
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        if key in self._field_set:
+            return getattr(self, key, default)
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __or__(self, other):
+        return {**self, **other}
+
+    def __ror__(self, other):
+        return {**other, **self}
+
+    def copy(self):
+        return type(self)(self)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class User(Record):
+    id: str
+    uid: str
+    email: str
+    username: str
+    username_lower: str
+    email_lower: str
+    phone_number: Optional[str]
+    display_name: Optional[str]
+    avatar_url: Optional[str]
+    avatar: Optional[dict]
+    location: Optional[str]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    geohash: Optional[str]
+    radius: Optional[int]
+    location_source: Optional[str]
+    preferred_categories: Optional[List[str]]
+    bio: Optional[str]
+    rating: float
+    rating_count: int
+    completed_tasks: int
+    posted_tasks: int
+    is_verified: bool
+    created_at: datetime
+    updated_at: datetime
+    last_notification_read_at: datetime
+
+
+class Task(Record):
+    id: str
+    title: str
+    description: str
+    category: str
+    location: str
+    latitude: Optional[float]
+    longitude: Optional[float]
+    budget: Optional[float]
+    status: str
+    creator_uid: str
+    tasker_uid: Optional[str]
+    images: List[str]
+    image_variants: List[dict]
+    deadline: Optional[datetime]
+    preferred_time: Optional[str]
+    time_flexible: bool
+    application_count: int
+    created_at: datetime
+    updated_at: datetime
+    completed_at: Optional[datetime]
+    archived_at: Optional[datetime]
+
+
+class Application(Record):
+    id: str
+    task_id: str
+    applicant_id: str
+    message: str
+    offered_price: Optional[float]
+    status: str
+    created_at: datetime
+    updated_at: datetime
+    archived_at: Optional[datetime]
+
+
+class Chat(Record):
+    id: str
+    task_id: str
+    user1_id: str
+    user2_id: str
+    participants: List[str]
+    last_message_at: datetime
+    location_shared: bool
+    location_shared_by: Optional[str]
+    location_accepted_by: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+    archived_at: Optional[datetime]
+
+
+class Message(Record):
+    id: str
+    chat_id: str
+    sender_uid: str
+    sender_id: str
+    content: Optional[str]
+    message_type: str
+    image_url: Optional[str]
+    location_data: Optional[dict]
+    read_at: Optional[datetime]
+    created_at: datetime
+    archived_at: Optional[datetime]
+
+
+class Review(Record):
+    id: str
+    task_id: str
+    reviewer_id: str
+    reviewed_id: str
+    rating: int
+    comment: Optional[str]
+    created_at: datetime
+
+
+# Keyed by the last segment of the collection path, so chats/{id}/messages maps to Message
+RECORD_TYPES = {
+    "users": User,
+    "tasks": Task,
+    "applications": Application,
+    "chats": Chat,
+    "messages": Message,
+    "reviews": Review,
+}
+
+
+def record_type(collection_name):
+    """Record class for a collection path, or None for plain dicts; archives share the live type"""
+    name = collection_name.rsplit("/", 1)[-1]
+    return RECORD_TYPES.get(name) or RECORD_TYPES.get(name.removesuffix("_archive"))
@@ -0,0 +1,52 @@
+# backend/routers/admin.py
+
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import Optional
+
+from backend import profiler
+from backend.routers.auth import get_current_user
+
+router = APIRouter()
+
+# Firebase uids allowed to use the operational endpoints below
+ADMIN_UIDS = {uid for uid in os.getenv("ADMIN_UIDS", "").split(",") if uid}
+
+
+def require_admin(current_user: dict = Depends(get_current_user)):
+    """Require the authenticated user's uid to be listed in ADMIN_UIDS"""
+    if current_user["uid"] not in ADMIN_UIDS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+
+class ProfilerSettings(BaseModel):
+    sample_rate: float = Field(ge=0, le=1)
+
+
+@router.get("/profile")
+async def get_profile(_: dict = Depends(require_admin)):
+    """Profiled requests and samples per route in this worker"""
+    return profiler.summary()
+
+
+@router.get("/profile/folded", response_class=PlainTextResponse)
+async def get_folded_stacks(route: Optional[str] = Query(None), _: dict = Depends(require_admin)):
+    """Folded stacks for flamegraph.pl or speedscope, optionally for one route template"""
+    return PlainTextResponse(profiler.folded(route))
+
+
+@router.delete("/profile")
+async def reset_profile(_: dict = Depends(require_admin)):
+    profiler.reset()
+    return {"message": "Profile cleared"}
+
+
+@router.put("/profiler")
+async def configure_profiler(settings: ProfilerSettings, _: dict = Depends(require_admin)):
+    """Set the fraction of requests this worker profiles (0 turns profiling off)"""
+    profiler.set_sample_rate(settings.sample_rate)
+    return {"sample_rate": profiler.sample_rate()}
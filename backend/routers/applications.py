@@ -6,13 +6,21 @@ from uuid import uuid4
 
 from backend.database import (
     get_document,
+    get_documents,
     get_all_documents,
     add_document,
     update_document,
     delete_document,
+    sharded_increment,
+    query_documents,
     now
 )
-from backend.routers.auth import get_current_user
+from backend import pricing
+from backend.archival import archive_name, get_document_with_archive
+from backend.idempotency import idempotent
+from backend.jobs import new_job, schedule
+from backend.ranking import score_candidates
+from backend.ratelimit import rate_limited
 
 router = APIRouter()
 
@@ -41,13 +49,19 @@ class ApplicationResponse(BaseModel):
 class ApplicationWithDetails(ApplicationResponse):
     task: dict
     applicant: dict
+    score: Optional[float] = None
 
 
 @router.post("/", response_model=ApplicationResponse)
-async def create_application(
+def create_application(
     application_data: ApplicationCreate,
-    current_user=Depends(get_current_user)
+    current_user=Depends(rate_limited("write")),
+    idempotency=Depends(idempotent("applications.create"))
 ):
+    replay = idempotency.begin(application_data)
+    if replay is not None:
+        return replay
+
     task = get_document("tasks", application_data.task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -76,20 +90,27 @@ async def create_application(
         "updated_at": now()
     }
 
-    add_document("applications", app_id, new_app)
-    return new_app
+    add_document(
+        "applications", app_id, new_app,
+        increments=[sharded_increment("tasks", application_data.task_id, "application_count")]
+    )
+    pricing.record_offer(task, application_data.offered_price)
+    return idempotency.complete(new_app)
 
 
 @router.get("/", response_model=List[ApplicationWithDetails])
-async def get_applications(
+def get_applications(
     task_id: Optional[str] = None,
     applicant_id: Optional[str] = None,
     status: Optional[str] = None,
     limit: int = 20,
     offset: int = 0,
-    current_user=Depends(get_current_user)
+    include_archived: bool = False,
+    current_user=Depends(rate_limited("scan"))
 ):
     all_apps = get_all_documents("applications")
+    if include_archived:
+        all_apps += get_all_documents(archive_name("applications"))
     filtered_apps = []
 
     for app in all_apps:
@@ -100,7 +121,7 @@ async def get_applications(
         if status and app["status"] != status:
             continue
 
-        task = get_document("tasks", app["task_id"])
+        task = get_document_with_archive("tasks", app["task_id"], include_archived)
         if not task:
             continue
         if task["creator_uid"] != current_user["uid"] and app["applicant_id"] != current_user["uid"]:
@@ -117,9 +138,9 @@ async def get_applications(
 
 
 @router.get("/{application_id}", response_model=ApplicationWithDetails)
-async def get_application(
+def get_application(
     application_id: str,
-    current_user=Depends(get_current_user)
+    current_user=Depends(rate_limited("read"))
 ):
     app = get_document("applications", application_id)
     if not app:
@@ -137,10 +158,10 @@ async def get_application(
 
 
 @router.put("/{application_id}", response_model=ApplicationResponse)
-async def update_application_status(
+def update_application_status(
     application_id: str,
     application_update: ApplicationUpdate,
-    current_user=Depends(get_current_user)
+    current_user=Depends(rate_limited("write"))
 ):
     app = get_document("applications", application_id)
     if not app:
@@ -150,15 +171,28 @@ async def update_application_status(
     if not task or task["creator_uid"] != current_user["uid"]:
         raise HTTPException(status_code=403, detail="Not authorized")
 
+    notify = []
+    if application_update.status in ("accepted", "rejected"):
+        notify.append(new_job("notify", {
+            "user_id": app["applicant_id"],
+            "type": f"application_{application_update.status}",
+            "title": "Application accepted" if application_update.status == "accepted" else "Application rejected",
+            "message": f"Your application for \"{task['title']}\" was {application_update.status}",
+            "data": {"task_id": task["id"], "application_id": application_id},
+        }))
+
     app["status"] = application_update.status
     app["updated_at"] = now()
-    update_document("applications", application_id, app)
+    update_document("applications", application_id, app, extra=notify)
+    schedule(*notify)
 
     if application_update.status == "accepted":
+        remove = new_job("feed_remove", {"task": dict(task)})
         task["status"] = "matched"
         task["tasker_uid"] = app["applicant_id"]
         task["updated_at"] = now()
-        update_document("tasks", task["id"], task)
+        update_document("tasks", task["id"], task, extra=[remove])
+        schedule(remove)
 
         for other in get_all_documents("applications"):
             if other["task_id"] == task["id"] and other["id"] != application_id and other["status"] == "pending":
@@ -170,9 +204,9 @@ async def update_application_status(
 
 
 @router.delete("/{application_id}")
-async def delete_application(
+def delete_application(
     application_id: str,
-    current_user=Depends(get_current_user)
+    current_user=Depends(rate_limited("write"))
 ):
     app = get_document("applications", application_id)
     if not app:
@@ -184,27 +218,39 @@ async def delete_application(
     if app["status"] != "pending":
         raise HTTPException(status_code=400, detail="Cannot withdraw processed application")
 
-    delete_document("applications", application_id)
+    delete_document(
+        "applications", application_id,
+        increments=[sharded_increment("tasks", app["task_id"], "application_count", -1)]
+    )
     return {"message": "Application withdrawn successfully"}
 
 
 @router.get("/task/{task_id}", response_model=List[ApplicationWithDetails])
-async def get_task_applications(
+def get_task_applications(
     task_id: str,
-    current_user=Depends(get_current_user)
+    include_archived: bool = False,
+    current_user=Depends(rate_limited("scan"))
 ):
-    task = get_document("tasks", task_id)
+    task = get_document_with_archive("tasks", task_id, include_archived)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
     if task["creator_uid"] != current_user["uid"]:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    apps = get_all_documents("applications")
-    result = []
-    for app in apps:
-        if app["task_id"] == task_id:
-            applicant = get_document("users", app["applicant_id"])
-            result.append({**app, "task": task, "applicant": applicant})
-
-    return result
\ No newline at end of file
+    apps = [app for app in get_all_documents("applications") if app["task_id"] == task_id]
+    if include_archived:
+        apps += query_documents(archive_name("applications"), [("task_id", "==", task_id)])
+    applicants = {u["uid"]: u for u in get_documents("users", [app["applicant_id"] for app in apps])}
+
+    results = [
+        {**app, "task": task, "applicant": applicants.get(app["applicant_id"])}
+        for app in apps
+    ]
+
+    # Best applicants first: rating, experience, distance and offered price vs budget
+    candidates = [{**(r["applicant"] or {}), "offered_price": r.get("offered_price")} for r in results]
+    for result, score in zip(results, score_candidates(candidates, task)):
+        result["score"] = round(float(score), 4)
+    results.sort(key=lambda r: r["score"], reverse=True)
+    return results
\ No newline at end of file
@@ -3,16 +3,18 @@
 from fastapi import APIRouter, HTTPException, status, Header
 from pydantic import BaseModel, EmailStr
 from typing import Optional
-from firebase_admin import auth as firebase_auth
 from uuid import uuid4
 
 from backend.database import (
     get_document,
+    get_document_versioned,
+    get_firebase_app,
     add_document,
     get_all_documents,
     update_document,
     now
 )
+from backend.search import search_keys
 
 router = APIRouter()
 
@@ -27,7 +29,7 @@ class FirebaseUser(BaseModel):
 
 
 @router.post("/register")
-async def register_user(user: FirebaseUser):
+def register_user(user: FirebaseUser):
     """Register new Firebase-authenticated user"""
 
     existing_users = get_all_documents("users")
@@ -59,22 +61,17 @@ async def register_user(user: FirebaseUser):
         "updated_at": now(),
         "last_notification_read_at": now()
     }
+    new_user.update(search_keys(new_user))
 
     add_document("users", user.uid, new_user)
     return {"message": "User registered successfully", "user": new_user}
 
 
 @router.post("/login")
-async def login_user(authorization: str = Header(...)):
+def login_user(authorization: str = Header(...)):
     """Login with Firebase ID token"""
 
-    id_token = extract_token(authorization)
-
-    try:
-        decoded_token = firebase_auth.verify_id_token(id_token)
-        uid = decoded_token["uid"]
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid Firebase token")
+    uid = verify_uid(authorization)
 
     user = get_document("users", uid)
     if not user:
@@ -84,19 +81,13 @@ async def login_user(authorization: str = Header(...)):
 
 
 @router.post("/upload-avatar")
-async def upload_avatar(
+def upload_avatar(
     avatar_url: str = Header(...),
     authorization: str = Header(...)
 ):
     """Save avatar URL uploaded via Firebase Storage"""
 
-    id_token = extract_token(authorization)
-
-    try:
-        decoded_token = firebase_auth.verify_id_token(id_token)
-        uid = decoded_token["uid"]
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid Firebase token")
+    uid = verify_uid(authorization)
 
     user = get_document("users", uid)
     if not user:
@@ -112,13 +103,7 @@ async def upload_avatar(
 
 def get_current_user(authorization: str = Header(...)):
     """Extract and verify Firebase user from Authorization header"""
-    id_token = extract_token(authorization)
-
-    try:
-        decoded_token = firebase_auth.verify_id_token(id_token)
-        uid = decoded_token["uid"]
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid Firebase token")
+    uid = verify_uid(authorization)
 
     user = get_document("users", uid)
     if not user:
@@ -127,6 +112,31 @@ def get_current_user(authorization: str = Header(...)):
     return user
 
 
+def get_current_user_versioned(authorization: str = Header(...)):
+    """Like get_current_user, but also returns the profile's update_time for conditional writes"""
+    uid = verify_uid(authorization)
+
+    user, update_time = get_document_versioned("users", uid)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return user, update_time
+
+
+def verify_uid(authorization: str) -> str:
+    """Verify the Firebase ID token in the Authorization header and return its uid"""
+    from firebase_admin import auth as firebase_auth
+
+    id_token = extract_token(authorization)
+    app = get_firebase_app()
+
+    try:
+        decoded_token = firebase_auth.verify_id_token(id_token, app=app)
+        return decoded_token["uid"]
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid Firebase token")
+
+
 def extract_token(authorization: str) -> str:
     """Safely extract Bearer token from Authorization header"""
     if not authorization.lower().startswith("bearer "):
@@ -1,7 +1,10 @@
 # backend/routers/chat.py
 
+import json
+
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 from typing import Optional, List
 from datetime import datetime
 from uuid import uuid4
@@ -11,12 +14,16 @@ from backend.database import (
     get_document,
     add_document,
     update_document,
-    create_chat,
-    get_chat,
     send_message as send_message_to_db,
     get_chat_messages,
+    query_documents,
     now
 )
+from backend.archival import archive_name
+from backend import live_location, sse
+from backend.idempotency import idempotent
+from backend.jobs import new_job, schedule
+from backend.ratelimit import rate_limited
 from backend.routers.auth import get_current_user
 
 router = APIRouter()
@@ -35,6 +42,13 @@ class MessageCreate(BaseModel):
     location_data: Optional[dict] = None
 
 
+class LiveLocationUpdate(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    accuracy: Optional[float] = Field(None, ge=0)
+    heading: Optional[float] = Field(None, ge=0, lt=360)
+
+
 class MessageResponse(BaseModel):
     id: str
     chat_id: str
@@ -48,7 +62,7 @@ class MessageResponse(BaseModel):
 
 
 @router.post("/start", response_model=dict)
-async def start_chat(chat_data: ChatCreate, current_user=Depends(get_current_user)):
+def start_chat(chat_data: ChatCreate, current_user=Depends(rate_limited("scan"))):
     chats = get_all_documents("chats")
     for c in chats:
         if (
@@ -64,6 +78,7 @@ async def start_chat(chat_data: ChatCreate, current_user=Depends(get_current_use
         "task_id": chat_data.task_id,
         "user1_id": current_user["uid"],
         "user2_id": chat_data.user2_id,
+        "participants": [current_user["uid"], chat_data.user2_id],
         "last_message_at": now(),
         "location_shared": False,
         "location_shared_by": None,
@@ -77,13 +92,26 @@ async def start_chat(chat_data: ChatCreate, current_user=Depends(get_current_use
 
 
 @router.get("/", response_model=List[dict])
-async def list_chats(current_user=Depends(get_current_user)):
+def list_chats(include_archived: bool = False, current_user=Depends(rate_limited("scan"))):
     chats = get_all_documents("chats")
-    return [c for c in chats if current_user["uid"] in (c["user1_id"], c["user2_id"])]
+    chats = [c for c in chats if current_user["uid"] in (c["user1_id"], c["user2_id"])]
+    if include_archived:
+        archived = archive_name("chats")
+        chats += query_documents(archived, [("user1_id", "==", current_user["uid"])])
+        chats += query_documents(archived, [("user2_id", "==", current_user["uid"])])
+    return chats
 
 
 @router.post("/send", response_model=MessageResponse)
-async def send_message(message_data: MessageCreate, current_user=Depends(get_current_user)):
+def send_message(
+    message_data: MessageCreate,
+    current_user=Depends(rate_limited("write")),
+    idempotency=Depends(idempotent("chat.send"))
+):
+    replay = idempotency.begin(message_data)
+    if replay is not None:
+        return replay
+
     chat = get_document("chats", message_data.chat_id)
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
@@ -94,15 +122,27 @@ async def send_message(message_data: MessageCreate, current_user=Depends(get_cur
     msg_data = {
         "chat_id": message_data.chat_id,
         "sender_uid": current_user["uid"],
+        "sender_id": current_user["uid"],
         "content": message_data.content,
         "message_type": message_data.message_type,
         "image_url": message_data.image_url,
         "location_data": message_data.location_data
     }
 
-    msg_id = send_message_to_db(message_data.chat_id, current_user["uid"], msg_data)
+    msg_id = str(uuid4())
+    recipient = chat["user2_id"] if current_user["uid"] == chat["user1_id"] else chat["user1_id"]
+    sender_name = current_user.get("display_name") or current_user.get("username", "a user")
+    notify = new_job("notify", {
+        "user_id": recipient,
+        "type": "message",
+        "title": f"New message from {sender_name}",
+        "message": message_data.content[:140] if message_data.content else "Sent an attachment",
+        "data": {"chat_id": message_data.chat_id, "message_id": msg_id},
+    })
+    send_message_to_db(message_data.chat_id, current_user["uid"], msg_data, msg_id=msg_id, extra=[notify])
+    schedule(notify)
 
-    return {
+    return idempotency.complete({
         "id": msg_id,
         "chat_id": message_data.chat_id,
         "sender_id": current_user["uid"],
@@ -111,19 +151,24 @@ async def send_message(message_data: MessageCreate, current_user=Depends(get_cur
         "image_url": message_data.image_url,
         "location_data": message_data.location_data,
         "read_at": None,
-        "created_at": now()
-    }
+        "created_at": msg_data["created_at"]
+    })
 
 
 @router.get("/{chat_id}/messages", response_model=List[MessageResponse])
-async def get_messages(chat_id: str, current_user=Depends(get_current_user)):
+def get_messages(chat_id: str, include_archived: bool = False, current_user=Depends(rate_limited("scan"))):
     chat = get_document("chats", chat_id)
+    archived = False
+    if not chat and include_archived:
+        chat, archived = get_document(archive_name("chats"), chat_id), True
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
 
     if current_user["uid"] not in (chat["user1_id"], chat["user2_id"]):
         raise HTTPException(status_code=403, detail="Not authorized")
 
+    if archived:
+        return query_documents(f"{archive_name('chats')}/{chat_id}/messages", order_by="created_at")
     messages = get_chat_messages(chat_id)
     return messages
 
@@ -132,24 +177,94 @@ async def get_messages(chat_id: str, current_user=Depends(get_current_user)):
 async def share_location(
     chat_id: str,
     action: str,
-    current_user=Depends(get_current_user)
+    current_user=Depends(rate_limited("write"))
 ):
-    chat = get_document("chats", chat_id)
+    chat = await run_in_threadpool(get_document, "chats", chat_id)
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
+    if current_user["uid"] not in (chat["user1_id"], chat["user2_id"]):
+        raise HTTPException(status_code=403, detail="Not authorized")
 
     if action == "share":
-        update_document("chats", chat_id, {
+        update = {
             "location_shared": True,
             "location_shared_by": current_user["uid"],
             "updated_at": now()
-        })
+        }
+        if not (chat.get("location_shared") and chat.get("location_shared_by") == current_user["uid"]):
+            # A new share needs fresh consent from the other participant
+            update["location_accepted_by"] = None
+        await run_in_threadpool(update_document, "chats", chat_id, update)
     elif action == "accept":
-        update_document("chats", chat_id, {
+        await run_in_threadpool(update_document, "chats", chat_id, {
             "location_accepted_by": current_user["uid"],
             "updated_at": now()
         })
     else:
         raise HTTPException(status_code=400, detail="Invalid action")
 
-    return {"message": "Location updated"}
\ No newline at end of file
+    # Viewers whose consent this changed stop receiving positions now
+    await live_location.revalidate(chat_id)
+    return {"message": "Location updated"}
+
+
+async def _live_location_chat(chat_id, uid):
+    if not live_location.ENABLED:
+        raise HTTPException(status_code=404, detail="Live location is disabled")
+    chat = await live_location.load_chat(chat_id)
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    if not live_location.is_participant(chat, uid):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return chat
+
+
+@router.post("/{chat_id}/live-location", status_code=202)
+async def publish_live_location(
+    chat_id: str,
+    update: LiveLocationUpdate,
+    current_user=Depends(get_current_user)
+):
+    """Push a position to the other participant; nothing is written to the database"""
+    chat = await _live_location_chat(chat_id, current_user["uid"])
+    if not live_location.can_publish(chat, current_user["uid"]):
+        raise HTTPException(status_code=403, detail="Location sharing has not been accepted")
+
+    live_location.publish(chat_id, current_user["uid"], update.model_dump())
+    return {"message": "Location received"}
+
+
+@router.get("/{chat_id}/live-location/stream")
+async def stream_live_location(chat_id: str, current_user=Depends(get_current_user)):
+    """Server-Sent Events stream of the sharer's latest position"""
+    chat = await _live_location_chat(chat_id, current_user["uid"])
+    if not live_location.can_view(chat, current_user["uid"]):
+        raise HTTPException(status_code=403, detail="Location sharing has not been accepted")
+
+    async def events():
+        queue = live_location.subscribe(chat_id, current_user["uid"])
+        try:
+            async for position in sse.iterate(queue):
+                if position is None:
+                    current = await live_location.load_chat(chat_id)
+                    if not current or not live_location.can_view(current, current_user["uid"]):
+                        break
+                    yield sse.heartbeat()
+                else:
+                    yield sse.format_event(json.dumps(position), event="location")
+            yield sse.format_event("{}", event="stopped")
+        finally:
+            live_location.unsubscribe(chat_id, queue)
+
+    return sse.event_stream_response(events(), "live_location")
+
+
+@router.delete("/{chat_id}/live-location")
+async def stop_live_location(chat_id: str, current_user=Depends(get_current_user)):
+    """Stop sharing; the last position is stored on the chat as last_location"""
+    chat = await _live_location_chat(chat_id, current_user["uid"])
+    if chat.get("location_shared_by") != current_user["uid"]:
+        raise HTTPException(status_code=403, detail="Only the sharer can stop sharing")
+
+    final = await live_location.stop(chat_id, end_sharing=True)
+    return {"message": "Location sharing stopped", "last_location": final}
\ No newline at end of file
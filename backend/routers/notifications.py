@@ -1,23 +1,32 @@
 # backend/routers/notifications.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from uuid import uuid4
 
+from backend import sse
+from backend.archival import archive_name
 from backend.database import (
     get_all_documents,
     get_document,
     add_document,
     update_document,
     delete_document,
+    query_documents,
+    watch_documents,
     now
 )
+from backend.ratelimit import rate_limited
 from backend.routers.auth import get_current_user
 
 router = APIRouter()
 
+# Notifications replayed to a client reconnecting with Last-Event-ID
+CATCH_UP_LIMIT = 100
+
 
 class NotificationCreate(BaseModel):
     type: str
@@ -38,17 +47,89 @@ class NotificationResponse(BaseModel):
 
 
 @router.get("/", response_model=List[NotificationResponse])
-async def get_notifications(current_user=Depends(get_current_user)):
+def get_notifications(include_archived: bool = False, current_user=Depends(rate_limited("scan"))):
     notifications = get_all_documents("notifications")
     user_notifications = [n for n in notifications if n["user_id"] == current_user["uid"]]
+    if include_archived:
+        user_notifications += query_documents(
+            archive_name("notifications"), [("user_id", "==", current_user["uid"])]
+        )
     user_notifications.sort(key=lambda n: n.get("created_at", datetime.utcnow()), reverse=True)
     return user_notifications
 
 
+def _event_id(notification):
+    # created_at orders notifications, so it doubles as the resume position
+    return notification["created_at"].isoformat()
+
+
+def _start_listener(uid, publish):
+    """Snapshot listener for notifications created for uid from now on"""
+    since = datetime.now(timezone.utc)
+
+    def on_change(kind, notification):
+        if kind == "added":
+            publish(notification)
+
+    return watch_documents(
+        "notifications", [("user_id", "==", uid), ("created_at", ">=", since)], on_change
+    )
+
+
+notification_hub = sse.ListenerHub("notifications", _start_listener)
+
+
+def _as_event(notification):
+    payload = NotificationResponse.model_validate(notification).model_dump_json()
+    return sse.format_event(payload, event="notification", event_id=_event_id(notification))
+
+
+@router.get("/stream")
+async def stream_notifications(
+    current_user=Depends(get_current_user),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-Sent Events stream of the user's new notifications. One snapshot listener per
+    user is shared by all of their streams in this worker; idle streams only get heartbeats.
+    """
+    uid = current_user["uid"]
+    since = None
+    if last_event_id:
+        try:
+            since = datetime.fromisoformat(last_event_id)
+        except ValueError:
+            since = None
+
+    async def events():
+        # Subscribe before the catch-up query so nothing created in between is missed
+        queue = await notification_hub.subscribe(uid)
+        sent = set()
+        try:
+            if since is not None:
+                missed = await run_in_threadpool(
+                    query_documents, "notifications",
+                    [("user_id", "==", uid), ("created_at", ">", since)],
+                    order_by="created_at", limit=CATCH_UP_LIMIT
+                )
+                for notification in missed:
+                    sent.add(notification["id"])
+                    yield _as_event(notification)
+            async for notification in sse.iterate(queue):
+                if notification is None:
+                    yield sse.heartbeat()
+                elif notification["id"] not in sent:
+                    yield _as_event(notification)
+        finally:
+            await notification_hub.unsubscribe(uid, queue)
+
+    return sse.event_stream_response(events(), "notifications")
+
+
 @router.post("/", response_model=NotificationResponse)
-async def create_notification(
+def create_notification(
     notification_data: NotificationCreate,
-    current_user=Depends(get_current_user)
+    current_user=Depends(rate_limited("write"))
 ):
     notification_id = str(uuid4())
     new_notification = {
@@ -66,7 +147,7 @@ async def create_notification(
 
 
 @router.put("/{notification_id}/read")
-async def mark_as_read(notification_id: str, current_user=Depends(get_current_user)):
+def mark_as_read(notification_id: str, current_user=Depends(rate_limited("write"))):
     notification = get_document("notifications", notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
@@ -78,7 +159,7 @@ async def mark_as_read(notification_id: str, current_user=Depends(get_current_us
 
 
 @router.put("/read-all")
-async def mark_all_as_read(current_user=Depends(get_current_user)):
+def mark_all_as_read(current_user=Depends(rate_limited("scan"))):
     notifications = get_all_documents("notifications")
     for notif in notifications:
         if notif["user_id"] == current_user["uid"] and not notif["read"]:
@@ -87,7 +168,7 @@ async def mark_all_as_read(current_user=Depends(get_current_user)):
 
 
 @router.delete("/{notification_id}")
-async def delete_notification(notification_id: str, current_user=Depends(get_current_user)):
+def delete_notification(notification_id: str, current_user=Depends(rate_limited("write"))):
     notification = get_document("notifications", notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
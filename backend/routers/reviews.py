@@ -7,7 +7,9 @@ from datetime import datetime
 from uuid import uuid4
 
 from backend.database import get_all_documents, add_document, get_document, delete_document, now
-from backend.routers.auth import get_current_user
+from backend.idempotency import idempotent
+from backend.jobs import new_job, schedule
+from backend.ratelimit import rate_limited
 
 router = APIRouter()
 
@@ -30,10 +32,15 @@ class ReviewResponse(BaseModel):
 
 
 @router.post("/", response_model=ReviewResponse)
-async def create_review(
+def create_review(
     review_data: ReviewCreate,
-    current_user=Depends(get_current_user)
+    current_user=Depends(rate_limited("write")),
+    idempotency=Depends(idempotent("reviews.create"))
 ):
+    replay = idempotency.begin(review_data)
+    if replay is not None:
+        return replay
+
     existing_reviews = get_all_documents("reviews")
     for r in existing_reviews:
         if r["task_id"] == review_data.task_id and r["reviewer_id"] == current_user["uid"]:
@@ -50,15 +57,27 @@ async def create_review(
         "created_at": now()
     }
 
-    add_document("reviews", review_id, new_review)
-    return new_review
+    reviewer_name = current_user.get("display_name") or current_user.get("username", "Someone")
+    jobs = [
+        new_job("apply_rating", {"user_id": review_data.reviewed_id}),
+        new_job("notify", {
+            "user_id": review_data.reviewed_id,
+            "type": "review",
+            "title": "New review",
+            "message": f"{reviewer_name} rated you {review_data.rating}/5",
+            "data": {"task_id": review_data.task_id, "review_id": review_id},
+        }),
+    ]
+    add_document("reviews", review_id, new_review, extra=jobs)
+    schedule(*jobs)
+    return idempotency.complete(new_review)
 
 
 @router.get("/", response_model=List[ReviewResponse])
-async def get_reviews(
+def get_reviews(
     user_id: Optional[str] = None,
     task_id: Optional[str] = None,
-    current_user=Depends(get_current_user)
+    current_user=Depends(rate_limited("scan"))
 ):
     reviews = get_all_documents("reviews")
 
@@ -71,13 +90,13 @@ async def get_reviews(
 
 
 @router.get("/me", response_model=List[ReviewResponse])
-async def get_my_reviews(current_user=Depends(get_current_user)):
+def get_my_reviews(current_user=Depends(rate_limited("scan"))):
     reviews = get_all_documents("reviews")
     return [r for r in reviews if r["reviewed_id"] == current_user["uid"]]
 
 
 @router.delete("/{review_id}")
-async def delete_review(review_id: str, current_user=Depends(get_current_user)):
+def delete_review(review_id: str, current_user=Depends(rate_limited("write"))):
     review = get_document("reviews", review_id)
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
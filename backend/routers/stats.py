@@ -0,0 +1,107 @@
+# backend/routers/stats.py
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Optional
+
+from backend.database import aggregate_documents
+from backend.ratelimit import rate_limited
+from backend.routers.admin import require_admin
+
+router = APIRouter()
+
+CATEGORIES = os.getenv(
+    "STATS_CATEGORIES", "Haushalt,Garten,Handwerk,Transport,Einkaufen,Sonstiges"
+).split(",")
+TASK_STATUSES = ["open", "matched", "completed", "cancelled"]
+DAILY_USERS_DAYS = int(os.getenv("STATS_DAILY_USERS_DAYS", "14"))
+REFRESH_SECONDS = int(os.getenv("STATS_REFRESH_SECONDS", "300"))
+
+# Last computed snapshot; served to every dashboard refresh until the next scheduled run
+_cache = {"data": None}
+_refresh_lock = asyncio.Lock()
+
+
+class CategoryStats(BaseModel):
+    total_tasks: int
+    open_tasks: int
+    average_budget: Optional[float]
+
+
+class DailyUsers(BaseModel):
+    date: str
+    new_users: int
+
+
+class StatsResponse(BaseModel):
+    computed_at: datetime
+    tasks_by_status: Dict[str, int]
+    categories: Dict[str, CategoryStats]
+    daily_new_users: List[DailyUsers]
+
+
+def compute_stats():
+    """Every figure comes from a count/avg aggregation query; no documents are scanned"""
+    tasks_by_status = {
+        status: aggregate_documents("tasks", [("status", "==", status)])["count"]
+        for status in TASK_STATUSES
+    }
+
+    categories = {}
+    for category in CATEGORIES:
+        totals = aggregate_documents("tasks", [("category", "==", category)], avg_fields=["budget"])
+        open_count = aggregate_documents(
+            "tasks", [("category", "==", category), ("status", "==", "open")]
+        )["count"]
+        categories[category] = {
+            "total_tasks": totals["count"],
+            "open_tasks": open_count,
+            "average_budget": totals.get("avg_budget"),
+        }
+
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    daily_new_users = []
+    for days_ago in range(DAILY_USERS_DAYS - 1, -1, -1):
+        start = today - timedelta(days=days_ago)
+        count = aggregate_documents(
+            "users", [("created_at", ">=", start), ("created_at", "<", start + timedelta(days=1))]
+        )["count"]
+        daily_new_users.append({"date": start.date().isoformat(), "new_users": count})
+
+    return {
+        "computed_at": datetime.now(timezone.utc),
+        "tasks_by_status": tasks_by_status,
+        "categories": categories,
+        "daily_new_users": daily_new_users,
+    }
+
+
+async def refresh_stats():
+    async with _refresh_lock:
+        _cache["data"] = await run_in_threadpool(compute_stats)
+    return _cache["data"]
+
+
+async def refresh_stats_periodically():
+    """Background loop started from the app lifespan"""
+    # A cache filled during startup (WARM_UP_CACHES) is fresh; start with the sleep
+    if _cache["data"] is not None:
+        await asyncio.sleep(REFRESH_SECONDS)
+    while True:
+        try:
+            await refresh_stats()
+        except Exception as exc:
+            print(f"Stats refresh failed: {exc}")
+        await asyncio.sleep(REFRESH_SECONDS)
+
+
+@router.get("/", response_model=StatsResponse)
+async def get_stats(current_user=Depends(rate_limited("read")), _: dict = Depends(require_admin)):
+    if _cache["data"] is None:
+        return await refresh_stats()
+    return _cache["data"]
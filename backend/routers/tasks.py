@@ -1,23 +1,46 @@
 # backend/routers/tasks.py
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, File, HTTPException, status, Query, Response, UploadFile
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 from datetime import datetime
 from uuid import uuid4
 
 from backend.database import (
     get_document,
+    get_documents,
     get_all_documents,
     add_document,
+    add_documents,
+    array_union,
+    get_document_versioned,
+    get_sharded_counts,
+    query_documents,
     update_document,
+    update_document_if_unchanged,
     delete_document,
-    now
+    increment,
+    now,
+    WriteConflict
 )
-from backend.routers.auth import get_current_user
+from backend import images
+from backend import pricing
+from backend.archival import archive_name
+from backend.feed import read_feed
+from backend.idempotency import idempotent
+from backend.jobs import new_job, schedule
+from backend.ranking import nearby_users, rank
+from backend.ratelimit import rate_limited
+from backend.routers.users import UserResponse
 
 router = APIRouter()
 
+MAX_BATCH_GET = 100
+MAX_BULK_CREATE = 500
+SUGGEST_RADIUS_KM = 25
+MAX_TASK_IMAGES = 10
+
 
 class TaskCreate(BaseModel):
     title: str
@@ -34,18 +57,26 @@ class TaskCreate(BaseModel):
 
 
 class TaskUpdate(BaseModel):
-    title: Optional[str]
-    description: Optional[str]
-    location: Optional[str]
-    category: Optional[str]
-    latitude: Optional[float]
-    longitude: Optional[float]
-    budget: Optional[float]
-    deadline: Optional[datetime]
-    preferred_time: Optional[str]
-    time_flexible: Optional[bool]
-    status: Optional[str]
-    images: Optional[List[str]]
+    title: Optional[str] = None
+    description: Optional[str] = None
+    location: Optional[str] = None
+    category: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    budget: Optional[float] = None
+    deadline: Optional[datetime] = None
+    preferred_time: Optional[str] = None
+    time_flexible: Optional[bool] = None
+    status: Optional[str] = None
+    images: Optional[List[str]] = None
+
+
+class TaskBatchGet(BaseModel):
+    ids: List[str] = Field(..., max_length=MAX_BATCH_GET)
+
+
+class TaskBulkCreate(BaseModel):
+    tasks: List[TaskCreate] = Field(..., min_length=1, max_length=MAX_BULK_CREATE)
 
 
 class TaskResponse(BaseModel):
@@ -67,16 +98,13 @@ class TaskResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     completed_at: Optional[datetime]
+    application_count: int = 0
+    image_variants: List[images.ImageAsset] = []
 
 
-@router.post("/", response_model=TaskResponse)
-async def create_task(
-    task_data: TaskCreate,
-    current_user=Depends(get_current_user)
-):
+def build_task(task_data: TaskCreate, creator_uid: str):
     task_id = str(uuid4())
-
-    new_task = {
+    return {
         "id": task_id,
         "title": task_data.title,
         "description": task_data.description,
@@ -86,7 +114,7 @@ async def create_task(
         "longitude": task_data.longitude,
         "budget": task_data.budget,
         "status": "open",
-        "creator_uid": current_user["uid"],
+        "creator_uid": creator_uid,
         "tasker_uid": None,
         "images": task_data.images or [],
         "deadline": task_data.deadline,
@@ -97,17 +125,71 @@ async def create_task(
         "completed_at": None
     }
 
-    add_document("tasks", task_id, new_task)
-    return new_task
+
+class SuggestedTasker(UserResponse):
+    score: float
+
+
+@router.post("/", response_model=TaskResponse)
+def create_task(
+    task_data: TaskCreate,
+    current_user=Depends(rate_limited("write")),
+    idempotency=Depends(idempotent("tasks.create"))
+):
+    replay = idempotency.begin(task_data)
+    if replay is not None:
+        return replay
+    new_task = build_task(task_data, current_user["uid"])
+    publish = new_job("feed_publish", {"tasks": [{"id": new_task["id"]}]})
+    add_document(
+        "tasks", new_task["id"], new_task,
+        increments=[increment("users", current_user["uid"], "posted_tasks")],
+        extra=[publish]
+    )
+    pricing.record_task(new_task)
+    schedule(publish)
+    return idempotency.complete(new_task)
+
+
+@router.post("/bulk", response_model=List[TaskResponse])
+def bulk_create_tasks(
+    bulk_data: TaskBulkCreate,
+    current_user=Depends(rate_limited("write")),
+    idempotency=Depends(idempotent("tasks.bulk_create"))
+):
+    """Create many tasks with batched writes instead of one request per task"""
+    replay = idempotency.begin(bulk_data)
+    if replay is not None:
+        return replay
+    new_tasks = [build_task(task_data, current_user["uid"]) for task_data in bulk_data.tasks]
+    publish = new_job("feed_publish", {"tasks": [{"id": task["id"]} for task in new_tasks]})
+    add_documents(
+        "tasks", {task["id"]: task for task in new_tasks},
+        increments=[increment("users", current_user["uid"], "posted_tasks", len(new_tasks))],
+        extra=[publish]
+    )
+    for task in new_tasks:
+        pricing.record_task(task)
+    schedule(publish)
+    return idempotency.complete(new_tasks)
+
+
+@router.post("/batch-get", response_model=List[TaskResponse])
+def batch_get_tasks(
+    batch: TaskBatchGet,
+    current_user=Depends(rate_limited("read"))
+):
+    """Fetch several tasks by id in one round-trip; unknown ids are skipped"""
+    return get_documents("tasks", batch.ids)
 
 
 @router.get("/", response_model=List[TaskResponse])
-async def list_tasks(
+def list_tasks(
     category: Optional[str] = None,
     status_filter: Optional[str] = None,
     skip: int = 0,
     limit: int = 20,
-    current_user=Depends(get_current_user)
+    current_user=Depends(rate_limited("scan"))
 ):
     tasks = get_all_documents("tasks")
 
@@ -120,33 +202,97 @@ async def list_tasks(
     return filtered[skip:skip + limit]
 
 
+@router.get("/feed", response_model=List[TaskResponse])
+def get_task_feed(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None,
+    current_user=Depends(rate_limited("read"))
+):
+    """
+    Open tasks near the caller (location, radius, preferred categories), newest first. A full
+    page carries the cursor of the next one in X-Next-Before and X-Next-Before-Id, to be sent
+    back as before and before_id.
+    """
+    page = read_feed(current_user, limit, before, before_id)
+    if len(page) == limit:
+        response.headers["X-Next-Before"] = page[-1]["created_at"].isoformat()
+        response.headers["X-Next-Before-Id"] = page[-1]["id"]
+    return page
+
+
 @router.get("/my-posted", response_model=List[TaskResponse])
-async def get_my_posted_tasks(current_user=Depends(get_current_user)):
-    tasks = get_all_documents("tasks")
-    return [t for t in tasks if t["creator_uid"] == current_user["uid"]]
+def get_my_posted_tasks(include_archived: bool = False, current_user=Depends(rate_limited("scan"))):
+    tasks = [t for t in get_all_documents("tasks") if t["creator_uid"] == current_user["uid"]]
+    counts = get_sharded_counts("tasks", [t["id"] for t in tasks], "application_count")
+    tasks = [{**t, "application_count": counts[t["id"]]} for t in tasks]
+    if include_archived:
+        # Archived tasks carry their final application_count
+        tasks += query_documents(archive_name("tasks"), [("creator_uid", "==", current_user["uid"])])
+    return tasks
 
 
 @router.get("/my-assigned", response_model=List[TaskResponse])
-async def get_my_assigned_tasks(current_user=Depends(get_current_user)):
-    tasks = get_all_documents("tasks")
-    return [t for t in tasks if t.get("tasker_uid") == current_user["uid"]]
+def get_my_assigned_tasks(include_archived: bool = False, current_user=Depends(rate_limited("scan"))):
+    tasks = [t for t in get_all_documents("tasks") if t.get("tasker_uid") == current_user["uid"]]
+    if include_archived:
+        tasks += query_documents(archive_name("tasks"), [("tasker_uid", "==", current_user["uid"])])
+    return tasks
+
+
+@router.get("/price-suggestion", response_model=pricing.PriceSuggestion)
+def get_price_suggestion(
+    category: str,
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    current_user=Depends(rate_limited("read"))
+):
+    """Budget and offered-price percentiles for a category, local to the coordinates when there is enough data"""
+    return pricing.suggest(category, latitude, longitude)
 
 
 @router.get("/{task_id}", response_model=TaskResponse)
-async def get_task(task_id: str, current_user=Depends(get_current_user)):
+def get_task(task_id: str, include_archived: bool = False, current_user=Depends(rate_limited("read"))):
     task = get_document("tasks", task_id)
+    if task:
+        task["application_count"] = get_sharded_counts("tasks", [task_id], "application_count")[task_id]
+    elif include_archived:
+        task = get_document(archive_name("tasks"), task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
 
+@router.get("/{task_id}/suggested-taskers", response_model=List[SuggestedTasker])
+def suggest_taskers(
+    task_id: str,
+    limit: int = Query(10, ge=1, le=50),
+    current_user=Depends(rate_limited("scan"))
+):
+    """Rank users near the task who have shared their coordinates"""
+    task = get_document("tasks", task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if task["creator_uid"] != current_user["uid"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if task.get("latitude") is None or task.get("longitude") is None:
+        raise HTTPException(status_code=400, detail="Task has no coordinates")
+
+    candidates = [
+        u for u in nearby_users(task["latitude"], task["longitude"], SUGGEST_RADIUS_KM)
+        if u["uid"] != task["creator_uid"]
+    ]
+    return [{**user, "score": score} for user, score in rank(candidates, task, limit)]
+
+
 @router.put("/{task_id}", response_model=TaskResponse)
-async def update_task(
+def update_task(
     task_id: str,
     update_data: TaskUpdate,
-    current_user=Depends(get_current_user)
+    current_user=Depends(rate_limited("write"))
 ):
-    task = get_document("tasks", task_id)
+    task, update_time = get_document_versioned("tasks", task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     if task["creator_uid"] != current_user["uid"]:
@@ -158,17 +304,71 @@ async def update_task(
     if update_dict.get("status") == "completed":
         update_dict["completed_at"] = now()
 
-    update_document("tasks", task_id, update_dict)
-    return get_document("tasks", task_id)
+    # Keep the tasker's completed_tasks in step with transitions into/out of "completed"
+    increments = []
+    if "status" in update_dict and task.get("tasker_uid"):
+        was_completed = task.get("status") == "completed"
+        is_completed = update_dict["status"] == "completed"
+        if was_completed != is_completed:
+            increments.append(increment("users", task["tasker_uid"], "completed_tasks", 1 if is_completed else -1))
+
+    refresh = new_job("feed_refresh", {"old": task})
+    try:
+        updated = update_document_if_unchanged("tasks", task_id, task, update_time, update_dict, increments, [refresh])
+    except WriteConflict:
+        raise HTTPException(status_code=409, detail="Task was modified concurrently, please retry")
+
+    schedule(refresh)
+    updated["application_count"] = get_sharded_counts("tasks", [task_id], "application_count")[task_id]
+    return updated
+
+
+@router.post("/{task_id}/images", response_model=TaskResponse)
+async def upload_task_image(
+    task_id: str,
+    file: UploadFile = File(...),
+    current_user=Depends(rate_limited("write"))
+):
+    """Attach a photo; stores thumbnail/medium derivatives and a blur placeholder on the task"""
+    # Async to await the image pool, so database calls go through the threadpool
+    task = await run_in_threadpool(get_document, "tasks", task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if task["creator_uid"] != current_user["uid"]:
+        raise HTTPException(status_code=403, detail="Not authorized to update this task")
+    if len(task.get("image_variants", [])) >= MAX_TASK_IMAGES:
+        raise HTTPException(status_code=400, detail=f"A task can have at most {MAX_TASK_IMAGES} images")
+
+    asset = await images.ingest_upload(file, f"tasks/{task_id}")
+    # Array unions let several photos upload in parallel without conflicting; images keeps
+    # plain URLs for older clients
+    refresh = new_job("feed_refresh", {"old": task})
+    await run_in_threadpool(update_document, "tasks", task_id, {
+        "images": array_union([asset["medium"]["url"]]),
+        "image_variants": array_union([asset]),
+        "updated_at": now(),
+    }, extra=[refresh])
+    schedule(refresh)
+    task = await run_in_threadpool(get_document, "tasks", task_id)
+    counts = await run_in_threadpool(get_sharded_counts, "tasks", [task_id], "application_count")
+    return {**task, "application_count": counts[task_id]}
 
 
 @router.delete("/{task_id}")
-async def delete_task(task_id: str, current_user=Depends(get_current_user)):
+def delete_task(task_id: str, current_user=Depends(rate_limited("write"))):
     task = get_document("tasks", task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     if task["creator_uid"] != current_user["uid"]:
         raise HTTPException(status_code=403, detail="Not authorized to delete this task")
 
-    delete_document("tasks", task_id)
+    jobs = [new_job("feed_remove", {"task": task})]
+    if task.get("image_variants"):
+        jobs.append(new_job("delete_blobs", {"keys": [key for asset in task["image_variants"] for key in images.asset_keys(asset)]}))
+    delete_document(
+        "tasks", task_id,
+        increments=[increment("users", task["creator_uid"], "posted_tasks", -1)],
+        extra=jobs
+    )
+    schedule(*jobs)
     return {"message": "Task deleted successfully"}
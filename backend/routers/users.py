@@ -1,21 +1,42 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, File, Query, UploadFile
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 from typing import Optional, List
 from datetime import datetime
 
-from backend.database import get_document, get_all_documents, update_document
+from backend import geo, images
+from backend.database import (
+    get_document,
+    get_documents,
+    get_all_documents,
+    update_document,
+    update_document_if_unchanged,
+    now,
+    WriteConflict
+)
+from backend.jobs import new_job, schedule
+from backend.ratelimit import rate_limited
 from backend.routers.auth import get_current_user
 
 router = APIRouter()
 
+MAX_BATCH_GET = 100
+
 
 class UserUpdate(BaseModel):
-    display_name: Optional[str]
-    avatar_url: Optional[str]
-    location: Optional[str]
-    radius: Optional[int]
-    location_source: Optional[str]
-    bio: Optional[str]
+    display_name: Optional[str] = None
+    avatar_url: Optional[str] = None
+    location: Optional[str] = None
+    radius: Optional[int] = None
+    location_source: Optional[str] = None
+    bio: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    preferred_categories: Optional[List[str]] = None
+
+
+class UserBatchGet(BaseModel):
+    uids: List[str] = Field(..., max_length=MAX_BATCH_GET)
 
 
 class UserResponse(BaseModel):
@@ -24,10 +45,14 @@ class UserResponse(BaseModel):
     email: str
     display_name: Optional[str]
     avatar_url: Optional[str]
+    avatar: Optional[images.ImageAsset] = None
     location: Optional[str]
     radius: Optional[int]
     location_source: Optional[str]
     bio: Optional[str]
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    preferred_categories: Optional[List[str]] = None
     rating: float
     rating_count: int
     completed_tasks: int
@@ -38,11 +63,11 @@ class UserResponse(BaseModel):
 
 
 @router.get("/", response_model=List[UserResponse])
-async def list_users(
+def list_users(
     skip: int = 0,
     limit: int = 50,
     search: Optional[str] = Query(None),
-    current_user=Depends(get_current_user)
+    current_user=Depends(rate_limited("scan"))
 ):
     users = get_all_documents("users")
 
@@ -55,12 +80,18 @@ async def list_users(
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_profile(current_user=Depends(get_current_user)):
+def get_current_user_profile(current_user=Depends(get_current_user)):
     return current_user
 
 
+@router.post("/batch-get", response_model=List[UserResponse])
+def batch_get_users(batch: UserBatchGet, current_user=Depends(rate_limited("read"))):
+    """Fetch several user profiles by uid in one round-trip; unknown uids are skipped"""
+    return get_documents("users", batch.uids)
+
+
 @router.get("/{uid}", response_model=UserResponse)
-async def get_user_by_uid(uid: str, current_user=Depends(get_current_user)):
+def get_user_by_uid(uid: str, current_user=Depends(rate_limited("read"))):
     user = get_document("users", uid)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -68,18 +99,35 @@ async def get_user_by_uid(uid: str, current_user=Depends(get_current_user)):
 
 
 @router.put("/me", response_model=UserResponse)
-async def update_user_profile(
+def update_user_profile(
     update: UserUpdate,
-    current_user=Depends(get_current_user)
+    current=Depends(rate_limited("write", versioned=True))
 ):
-    uid = current_user["uid"]
-    user = get_document("users", uid)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user, update_time = current
 
     updated_data = update.dict(exclude_unset=True)
     updated_data["updated_at"] = str(datetime.utcnow())
 
-    update_document("users", uid, updated_data)
-    updated_user = get_document("users", uid)
-    return updated_user
+    # Geohash lets nearby-user lookups (suggested taskers) use prefix range queries
+    latitude = updated_data.get("latitude", user.get("latitude"))
+    longitude = updated_data.get("longitude", user.get("longitude"))
+    if {"latitude", "longitude"} & updated_data.keys():
+        updated_data["geohash"] = geo.encode(latitude, longitude, 9) if None not in (latitude, longitude) else None
+
+    try:
+        return update_document_if_unchanged("users", user["uid"], user, update_time, updated_data)
+    except WriteConflict:
+        raise HTTPException(status_code=409, detail="Profile was modified concurrently, please retry")
+
+
+@router.post("/me/avatar", response_model=UserResponse)
+async def upload_avatar(file: UploadFile = File(...), current_user=Depends(rate_limited("write"))):
+    """Replace the avatar with an uploaded photo; avatar_url points at the medium derivative"""
+    asset = await images.ingest_upload(file, f"avatars/{current_user['uid']}")
+    changes = {"avatar_url": asset["medium"]["url"], "avatar": asset, "updated_at": now()}
+    jobs = []
+    if current_user.get("avatar"):
+        jobs.append(new_job("delete_blobs", {"keys": images.asset_keys(current_user["avatar"])}))
+    await run_in_threadpool(update_document, "users", current_user["uid"], changes, extra=jobs)
+    schedule(*jobs)
+    return {**current_user, **changes}
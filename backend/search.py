@@ -0,0 +1,11 @@
+# backend/search.py
+
+"""Derived fields that make documents findable with equality queries"""
+
+
+def search_keys(user):
+    """Lowercased copies of the fields users are looked up by"""
+    return {
+        "username_lower": (user.get("username") or "").lower(),
+        "email_lower": (user.get("email") or "").lower(),
+    }
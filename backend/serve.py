@@ -0,0 +1,209 @@
+# backend/serve.py
+
+"""
+Production launcher: one uvicorn worker process per core behind a shared listening socket.
+
+    python -m backend.serve --port 8000 --workers 4
+
+Workers default to WEB_CONCURRENCY or the number of CPUs this process may run on. Each uses
+uvloop and httptools when they are installed (uvicorn[standard] ships both) and runs the app
+lifespan, so the Firestore client, its gRPC channel and the caches are warmed per process
+before that worker accepts connections. The parent restarts workers that die, backing off
+while they keep failing right after start and giving up after MAX_FAST_FAILURES in a row.
+
+Workers share nothing in memory. /metrics merges every worker's numbers through files in a
+temporary METRICS_DIR (see metrics.py); the profiler admin endpoints only sample and report
+the worker that answers them (summary() reports its pid). Live location channels cannot be
+split across processes, so workers run without them; LIVE_LOCATION_ENABLED=1 opts in and
+then means a single worker (the default count, and --workers above 1 is refused).
+Notification streams follow Firestore listeners and work with any number of workers.
+
+On SIGTERM/SIGINT every worker drains: /api/health starts answering 503 so the load balancer
+stops routing to it, open SSE streams are ended (clients reconnect elsewhere with
+Last-Event-ID), the listening socket is closed and in-flight requests get up to
+--graceful-timeout seconds to finish before the lifespan shutdown runs.
+
+For local development use `uvicorn backend.main:app --reload` instead.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import uvicorn
+from uvicorn._subprocess import get_subprocess
+from uvicorn.supervisors import Multiprocess
+
+logger = logging.getLogger("uvicorn.error")
+
+RESTART_CHECK_SECONDS = 1.0
+# A worker that exits sooner than this after starting counts as a failed start
+FAST_FAILURE_SECONDS = 30.0
+MAX_FAST_FAILURES = 5
+RESTART_BACKOFF_MAX_SECONDS = 60.0
+
+
+def live_location_requested():
+    """Live location is opt-in under this launcher, since its channels need a single process"""
+    return os.getenv("LIVE_LOCATION_ENABLED", "0") != "0"
+
+
+def default_workers():
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    if live_location_requested():
+        return 1
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        return os.cpu_count() or 1
+
+
+def fastest_loop():
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def fastest_http():
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn.Server that lets the app end its long-lived streams before waiting for connections"""
+
+    async def shutdown(self, sockets=None):
+        from backend.main import drain
+
+        try:
+            await drain()
+        except Exception as exc:
+            logger.error("Drain failed: %s", exc)
+        await super().shutdown(sockets=sockets)
+
+
+def restart_delay(fast_failures):
+    """Seconds to wait before restarting a worker after fast_failures failed starts in a row"""
+    if fast_failures == 0:
+        return 0.0
+    return min(2.0 ** (fast_failures - 1), RESTART_BACKOFF_MAX_SECONDS)
+
+
+class Supervisor(Multiprocess):
+    """uvicorn's multiprocess supervisor, plus restarting workers that exit unexpectedly"""
+
+    def run(self):
+        self.startup()
+        started = time.monotonic()
+        self.started = [started] * len(self.processes)
+        self.fast_failures = [0] * len(self.processes)
+        self.restart_at = [None] * len(self.processes)
+        self.gave_up = False
+        while not self.should_exit.wait(RESTART_CHECK_SECONDS):
+            self.check_workers(time.monotonic())
+        self.shutdown()
+        if self.gave_up:
+            sys.exit(1)
+
+    def check_workers(self, now):
+        for index, process in enumerate(self.processes):
+            if process.exitcode is None:
+                continue
+            if self.restart_at[index] is None:
+                if now - self.started[index] < FAST_FAILURE_SECONDS:
+                    self.fast_failures[index] += 1
+                else:
+                    self.fast_failures[index] = 0
+                if self.fast_failures[index] >= MAX_FAST_FAILURES:
+                    logger.error("Worker failed %s times in a row within %ss of starting, giving up",
+                                 MAX_FAST_FAILURES, FAST_FAILURE_SECONDS)
+                    self.gave_up = True
+                    self.should_exit.set()
+                    return
+                delay = restart_delay(self.fast_failures[index])
+                logger.warning("Worker %s exited with %s, restarting in %.0fs", process.pid, process.exitcode, delay)
+                self.restart_at[index] = now + delay
+            if now >= self.restart_at[index]:
+                replacement = get_subprocess(config=self.config, target=self.target, sockets=self.sockets)
+                replacement.start()
+                self.processes[index] = replacement
+                self.started[index] = now
+                self.restart_at[index] = None
+
+    def shutdown(self):
+        # Workers drain on SIGTERM; give them the graceful timeout (plus lifespan shutdown) to exit
+        for process in self.processes:
+            process.terminate()
+        grace = (self.config.timeout_graceful_shutdown or 0) + 10
+        for process in self.processes:
+            process.join(grace)
+            if process.exitcode is None:
+                logger.error("Worker %s did not stop in time, killing it", process.pid)
+                process.kill()
+                process.join()
+        logger.info("Stopping parent process [%s]", self.pid)
+
+
+def serve(app="backend.main:app", host="0.0.0.0", port=8000, workers=None, graceful_timeout=30,
+          keep_alive=5, backlog=2048, log_level="info", access_log=False):
+    # Workers fill their caches during startup, before they take traffic
+    os.environ.setdefault("WARM_UP_CACHES", "1")
+    config = uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        workers=workers or default_workers(),
+        loop=fastest_loop(),
+        http=fastest_http(),
+        lifespan="on",
+        timeout_graceful_shutdown=graceful_timeout,
+        timeout_keep_alive=keep_alive,
+        backlog=backlog,
+        log_level=log_level,
+        access_log=access_log,
+        proxy_headers=True,
+    )
+    server = DrainingServer(config=config)
+    if config.workers == 1:
+        logger.info("Starting 1 worker (loop=%s, http=%s)", config.loop, config.http)
+        server.run()
+        return
+
+    if live_location_requested():
+        raise SystemExit("LIVE_LOCATION_ENABLED=1 needs a single process: run with --workers 1")
+    os.environ["LIVE_LOCATION_ENABLED"] = "0"
+    # Workers inherit the environment, so they all share their metrics through this directory
+    metrics_dir = os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="doit-metrics-")
+    logger.info("Starting %s workers (loop=%s, http=%s)", config.workers, config.loop, config.http)
+    try:
+        Supervisor(config, target=server.run, sockets=[config.bind_socket()]).run()
+    finally:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.serve", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--app", default="backend.main:app")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=None, help="default: WEB_CONCURRENCY or the CPU count (1 with LIVE_LOCATION_ENABLED=1)")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+                        help="seconds in-flight requests get to finish on shutdown")
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args(argv)
+    serve(
+        app=args.app, host=args.host, port=args.port, workers=args.workers,
+        graceful_timeout=args.graceful_timeout, keep_alive=args.keep_alive, backlog=args.backlog,
+        log_level=args.log_level, access_log=args.access_log,
+    )
+
+
+if __name__ == "__main__":
+    main()
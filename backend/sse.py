@@ -0,0 +1,156 @@
+# backend/sse.py
+
+"""
+Server-Sent Events helpers.
+
+ListenerHub keeps one upstream listener (e.g. a Firestore snapshot listener) per key and
+fans its events out to every stream subscribed to that key in this worker, so a hundred open
+tabs of one user cost a single listener. Events are handed to the event loop with
+call_soon_threadsafe because listeners call back on their own threads. A subscriber that
+falls QUEUE_SIZE events behind is closed instead of buffering without bound; the client
+reconnects with Last-Event-ID and catches up from the database.
+"""
+import asyncio
+import os
+
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from backend import metrics
+
+HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+QUEUE_SIZE = 100
+# Reconnect delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 3000
+
+CLOSED = object()
+
+
+def format_event(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+def heartbeat():
+    return ": ping\n\n"
+
+
+async def iterate(queue, heartbeat_seconds=HEARTBEAT_SECONDS):
+    """Yield queued items, or None whenever heartbeat_seconds pass without one; stops when closed"""
+    while True:
+        try:
+            item = await asyncio.wait_for(queue.get(), heartbeat_seconds)
+        except asyncio.TimeoutError:
+            yield None
+            continue
+        if item is CLOSED:
+            return
+        yield item
+
+
+def event_stream_response(events, stream):
+    """Wrap an async generator of formatted events; stream labels the open-streams gauge"""
+    async def body():
+        metrics.inc("doit_open_streams", {"stream": stream})
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            async for chunk in events:
+                yield chunk
+        finally:
+            metrics.inc("doit_open_streams", {"stream": stream}, -1)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class _Entry:
+    __slots__ = ("queues", "watch")
+
+    def __init__(self):
+        self.queues = set()
+        self.watch = None
+
+
+class ListenerHub:
+    """
+    start(key, publish) attaches the upstream listener for key and returns an object with
+    unsubscribe(); it runs in the threadpool and publish(item) may be called from any thread.
+    """
+
+    def __init__(self, name, start):
+        self.name = name
+        self._start = start
+        self._entries = {}
+
+    async def subscribe(self, key):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(QUEUE_SIZE)
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.queues.add(queue)
+            return queue
+
+        entry = self._entries[key] = _Entry()
+        entry.queues.add(queue)
+
+        def publish(item):
+            loop.call_soon_threadsafe(self._publish, entry, item)
+
+        try:
+            watch = await run_in_threadpool(self._start, key, publish)
+        except Exception:
+            self._entries.pop(key, None)
+            for other in entry.queues - {queue}:
+                other.put_nowait(CLOSED)
+            raise
+        metrics.inc("doit_active_listeners", {"hub": self.name})
+        entry.watch = watch
+        if not entry.queues:
+            # Every subscriber left while the listener was starting
+            await self._stop(key, entry)
+        return queue
+
+    async def unsubscribe(self, key, queue):
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry.queues.discard(queue)
+        if not entry.queues and entry.watch is not None:
+            await self._stop(key, entry)
+
+    async def _stop(self, key, entry):
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        watch, entry.watch = entry.watch, None
+        if watch is not None:
+            metrics.inc("doit_active_listeners", {"hub": self.name}, -1)
+            await run_in_threadpool(watch.unsubscribe)
+
+    def _publish(self, entry, item):
+        for queue in list(entry.queues):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                # Slow consumer: drop its backlog and end the stream so it resumes from the database
+                entry.queues.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(CLOSED)
+
+    async def close(self):
+        """Detach every listener and end every stream (called on shutdown)"""
+        for key, entry in list(self._entries.items()):
+            for queue in entry.queues:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(CLOSED)
+            entry.queues.clear()
+            await self._stop(key, entry)
@@ -0,0 +1,43 @@
+# backend/tests/conftest.py
+
+"""
+Shared fixtures: the app from backend.benchmarks.app (in-memory storage, bearer token = uid)
+with a fresh MemoryClient per test, driven over httpx's ASGI transport.
+
+    pip install -r backend/requirements-dev.txt
+    python -m pytest backend/tests
+"""
+import os
+
+os.environ.setdefault("DB_BACKEND", "memory")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("BLOB_BACKEND", "local")
+
+import httpx
+import pytest
+
+from backend import database
+from backend.benchmarks.app import app as benchmark_app
+from backend.memory_store import MemoryClient
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def store():
+    """An empty in-memory store for every test"""
+    previous = database.get_db()
+    client = database.use_client(MemoryClient())
+    yield client
+    database.use_client(previous)
+
+
+@pytest.fixture
+async def client():
+    async with benchmark_app.router.lifespan_context(benchmark_app):
+        transport = httpx.ASGITransport(app=benchmark_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            yield http
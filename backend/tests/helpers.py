@@ -0,0 +1,80 @@
+# backend/tests/helpers.py
+
+"""Documents the tests seed directly into the store, shaped like the routers write them"""
+from backend import database
+
+
+def auth(uid):
+    return {"Authorization": f"Bearer {uid}"}
+
+
+def add_user(uid, **fields):
+    user = {
+        "id": uid,
+        "uid": uid,
+        "email": f"{uid}@example.com",
+        "username": uid,
+        "username_lower": uid.lower(),
+        "email_lower": f"{uid}@example.com",
+        "phone_number": "",
+        "display_name": uid.title(),
+        "avatar_url": "",
+        "location": "",
+        "radius": 20,
+        "location_source": "manual",
+        "bio": "",
+        "rating": 0.0,
+        "rating_count": 0,
+        "completed_tasks": 0,
+        "posted_tasks": 0,
+        "is_verified": False,
+        "created_at": database.now(),
+        "updated_at": database.now(),
+        "last_notification_read_at": database.now(),
+        **fields,
+    }
+    database.add_document("users", uid, user)
+    return user
+
+
+def add_task(task_id, creator_uid, **fields):
+    task = {
+        "id": task_id,
+        "title": "Regal aufbauen",
+        "description": "Ein Billy-Regal aufbauen",
+        "category": "Handwerk",
+        "location": "Berlin",
+        "latitude": 52.52,
+        "longitude": 13.405,
+        "budget": 40.0,
+        "status": "open",
+        "creator_uid": creator_uid,
+        "tasker_uid": None,
+        "images": [],
+        "deadline": None,
+        "preferred_time": None,
+        "time_flexible": True,
+        "application_count": 0,
+        "completed_at": None,
+        "created_at": database.now(),
+        "updated_at": database.now(),
+        **fields,
+    }
+    database.add_document("tasks", task_id, task)
+    return task
+
+
+def add_application(application_id, task_id, applicant_id, **fields):
+    application = {
+        "id": application_id,
+        "task_id": task_id,
+        "applicant_id": applicant_id,
+        "message": "Mache ich gern",
+        "offered_price": 35.0,
+        "status": "pending",
+        "created_at": database.now(),
+        "updated_at": database.now(),
+        **fields,
+    }
+    database.add_document("applications", application_id, application)
+    return application
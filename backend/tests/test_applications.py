@@ -0,0 +1,31 @@
+# backend/tests/test_applications.py
+
+from datetime import datetime
+
+import pytest
+
+from backend import database
+from backend.tests.helpers import add_application, add_task, add_user, auth
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_accepting_an_application_returns_resolved_timestamps(client):
+    add_user("creator")
+    add_user("tasker")
+    add_user("other")
+    add_task("task-1", "creator")
+    add_application("app-1", "task-1", "tasker")
+    add_application("app-2", "task-1", "other")
+
+    response = await client.put("/api/applications/app-1", json={"status": "accepted"}, headers=auth("creator"))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "accepted"
+    assert datetime.fromisoformat(body["updated_at"])
+    task = database.get_document("tasks", "task-1")
+    assert task["status"] == "matched"
+    assert task["tasker_uid"] == "tasker"
+    assert isinstance(task["updated_at"], datetime)
+    assert database.get_document("applications", "app-2")["status"] == "rejected"
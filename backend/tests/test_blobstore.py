@@ -0,0 +1,20 @@
+# backend/tests/test_blobstore.py
+
+import pytest
+
+from backend import blobstore
+
+
+def test_firebase_backend_requires_a_bucket(monkeypatch):
+    monkeypatch.setattr(blobstore, "BLOB_BACKEND", "firebase")
+    monkeypatch.delenv("FIREBASE_STORAGE_BUCKET", raising=False)
+
+    with pytest.raises(ValueError, match="FIREBASE_STORAGE_BUCKET"):
+        blobstore.check_config()
+
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setattr(blobstore, "BLOB_BACKEND", "s3")
+
+    with pytest.raises(ValueError, match="Unknown BLOB_BACKEND"):
+        blobstore.check_config()
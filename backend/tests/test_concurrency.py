@@ -0,0 +1,38 @@
+# backend/tests/test_concurrency.py
+
+import time
+
+import anyio
+import pytest
+
+from backend.tests.helpers import add_task, add_user, auth
+
+pytestmark = pytest.mark.anyio
+
+LATENCY_MS = 100
+
+
+async def test_database_calls_do_not_block_the_event_loop(client, store):
+    add_user("reader")
+    add_task("task-1", "creator")
+    store.latency = LATENCY_MS / 1000
+    probe = {}
+
+    async def read_task():
+        response = await client.get("/api/tasks/task-1", headers=auth("reader"))
+        assert response.status_code == 200
+
+    async def scrape_metrics():
+        # Past the auth dependency (threadpool), into the handlers
+        await anyio.sleep(LATENCY_MS * 1.5 / 1000)
+        started = time.perf_counter()
+        await client.get("/metrics")
+        probe["seconds"] = time.perf_counter() - started
+
+    async with anyio.create_task_group() as group:
+        for _ in range(4):
+            group.start_soon(read_task)
+        group.start_soon(scrape_metrics)
+
+    # The event loop answers while the reads wait on storage in the threadpool
+    assert probe["seconds"] < LATENCY_MS / 1000
@@ -0,0 +1,86 @@
+# backend/tests/test_feed.py
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend import feed
+from backend.database import get_all_documents, update_document
+from backend.migrations import run_migration
+from backend.tests.helpers import add_task, add_user, auth
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def test_read_feed_fills_the_page_past_filtered_entries():
+    user = add_user("reader", latitude=52.52, longitude=13.405, radius=20, preferred_categories=["Garten"])
+    # The newest entries are all in a category the user does not want
+    tasks = [
+        add_task(f"task-{i:02}", "creator", category="Garten" if i < 5 else "Umzug", created_at=START + timedelta(minutes=i))
+        for i in range(40)
+    ]
+    feed.publish_tasks(tasks)
+
+    page = feed.read_feed(user, limit=5)
+
+    assert [task["id"] for task in page] == [f"task-{i:02}" for i in (4, 3, 2, 1, 0)]
+
+
+def test_publish_skips_tasks_that_are_no_longer_open():
+    user = add_user("reader", latitude=52.52, longitude=13.405)
+    task = add_task("task-1", "creator", created_at=START)
+    # The task was accepted before its feed_publish job ran
+    update_document("tasks", "task-1", {"status": "matched"})
+    feed.remove_task(task)
+
+    feed.publish_tasks([task])
+
+    assert feed.read_feed(user) == []
+
+
+def test_backfill_migration_publishes_open_tasks():
+    user = add_user("reader", latitude=52.52, longitude=13.405)
+    add_task("task-open", "creator", created_at=START)
+    add_task("task-done", "creator", status="completed", created_at=START)
+
+    run_migration("task_feed_backfill", report=lambda message: None)
+
+    assert [task["id"] for task in feed.read_feed(user)] == ["task-open"]
+    assert len(get_all_documents(feed.FEED_COLLECTION)) == len(feed.FEED_PRECISIONS)
+
+
+def test_tasks_created_together_are_not_skipped_between_pages():
+    user = add_user("reader", latitude=52.52, longitude=13.405, preferred_categories=["Garten"])
+    # One bulk create: a single commit time; the filtered ones straddle the refill boundary
+    tasks = [
+        add_task(f"task-{i:02}", "creator", category="Umzug" if 2 <= i < 9 else "Garten", created_at=START)
+        for i in range(12)
+    ]
+    feed.publish_tasks(tasks)
+
+    seen, before, before_id = [], None, None
+    while True:
+        page = feed.read_feed(user, limit=2, before=before, before_id=before_id)
+        seen += [task["id"] for task in page]
+        if len(page) < 2:
+            break
+        before, before_id = page[-1]["created_at"], page[-1]["id"]
+
+    assert seen == [f"task-{i:02}" for i in (0, 1, 9, 10, 11)]
+
+
+@pytest.mark.anyio
+async def test_full_feed_page_returns_the_next_cursor(client):
+    add_user("reader", latitude=52.52, longitude=13.405)
+    feed.publish_tasks([add_task(f"task-{i}", "creator", created_at=START) for i in range(3)])
+
+    first = await client.get("/api/tasks/feed", params={"limit": 2}, headers=auth("reader"))
+    rest = await client.get("/api/tasks/feed", headers=auth("reader"), params={
+        "limit": 2,
+        "before": first.headers["X-Next-Before"],
+        "before_id": first.headers["X-Next-Before-Id"],
+    })
+
+    assert [task["id"] for task in first.json()] == ["task-0", "task-1"]
+    assert [task["id"] for task in rest.json()] == ["task-2"]
+    assert "X-Next-Before" not in rest.headers
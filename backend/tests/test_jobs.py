@@ -0,0 +1,63 @@
+# backend/tests/test_jobs.py
+
+import pytest
+
+from backend import jobs
+from backend.database import add_document, get_all_documents, get_document, update_document
+from backend.tests.helpers import add_user
+
+
+@pytest.fixture(autouse=True)
+def no_workers(monkeypatch):
+    """Run jobs by hand: without a running loop _submit leaves them in the outbox"""
+    monkeypatch.setitem(jobs._state, "loop", None)
+
+
+def add_review(review_id, reviewed_id, rating):
+    review = {"id": review_id, "task_id": "task-1", "reviewer_id": "author", "reviewed_id": reviewed_id, "rating": rating}
+    job = jobs.new_job("apply_rating", {"user_id": reviewed_id})
+    add_document("reviews", review_id, review, extra=[job])
+    return job[1]
+
+
+def test_job_commits_with_the_write_it_follows():
+    add_user("tasker")
+    job_id = add_review("review-1", "tasker", 4)
+
+    assert get_document(jobs.OUTBOX, job_id)["type"] == "apply_rating"
+
+
+def test_apply_rating_is_idempotent():
+    add_user("tasker")
+    first = add_review("review-1", "tasker", 5)
+    second = add_review("review-2", "tasker", 2)
+
+    for job_id in (first, second):
+        jobs.apply_rating({"user_id": "tasker"}, job_id=job_id)
+    # At-least-once delivery: the first job runs again
+    jobs.apply_rating({"user_id": "tasker"}, job_id=first)
+
+    user = get_document("users", "tasker")
+    assert user["rating_count"] == 2
+    assert user["rating"] == 3.5
+
+
+def test_failed_job_is_retried_then_deleted(monkeypatch):
+    calls = []
+
+    def flaky(payload, job_id):
+        calls.append(job_id)
+        if len(calls) == 1:
+            raise RuntimeError("unavailable")
+
+    monkeypatch.setitem(jobs._handlers, "flaky", flaky)
+    job_id = jobs.enqueue("flaky", {})
+
+    assert jobs._run(job_id) is not None
+    job = get_document(jobs.OUTBOX, job_id)
+    assert (job["status"], job["attempts"], job["last_error"]) == ("pending", 1, "RuntimeError: unavailable")
+
+    update_document(jobs.OUTBOX, job_id, {"run_at": job["created_at"]})
+    assert jobs._run(job_id) is None
+    assert calls == [job_id, job_id]
+    assert get_all_documents(jobs.OUTBOX) == []
@@ -0,0 +1,89 @@
+# backend/tests/test_live_location.py
+
+import time
+
+import pytest
+
+from backend import database, live_location, sse
+from backend.tests.helpers import add_user, auth
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def channels(monkeypatch):
+    monkeypatch.setattr(live_location, "_channels", {})
+    monkeypatch.setattr(live_location, "_chats", {})
+
+
+def add_shared_chat(chat_id, sharer, viewer):
+    database.add_document("chats", chat_id, {
+        "id": chat_id,
+        "user1_id": sharer,
+        "user2_id": viewer,
+        "task_id": "task-1",
+        "location_shared": True,
+        "location_shared_by": sharer,
+        "location_accepted_by": viewer,
+        "created_at": database.now(),
+        "updated_at": database.now(),
+    })
+
+
+async def test_viewer_stream_closes_when_consent_changes(client):
+    add_user("sharer")
+    add_user("viewer")
+    add_shared_chat("chat-1", "sharer", "viewer")
+    queue = live_location.subscribe("chat-1", "viewer")
+
+    # The viewer starts sharing instead, so they no longer view the other's position
+    response = await client.put("/api/chat/chat-1/location", params={"action": "share"}, headers=auth("viewer"))
+
+    assert response.status_code == 200
+    assert queue.get_nowait() is sse.CLOSED
+    assert not live_location._channels["chat-1"].subscribers
+
+
+async def test_viewer_stream_closes_when_acceptance_is_cleared():
+    add_shared_chat("chat-1", "sharer", "viewer")
+    queue = live_location.subscribe("chat-1", "viewer")
+    await live_location.load_chat("chat-1")
+
+    database.update_document("chats", "chat-1", {"location_accepted_by": None})
+    await live_location.revalidate("chat-1")
+
+    assert queue.get_nowait() is sse.CLOSED
+
+
+async def test_expired_chats_are_pruned():
+    add_shared_chat("chat-1", "sharer", "viewer")
+    await live_location.load_chat("chat-1")
+    live_location._chats["gone"] = (time.monotonic() - 1, None)
+
+    live_location._prune_chats()
+
+    assert set(live_location._chats) == {"chat-1"}
+
+
+async def test_only_participants_change_location_consent(client):
+    add_user("outsider")
+    add_shared_chat("chat-1", "sharer", "viewer")
+
+    response = await client.put("/api/chat/chat-1/location", params={"action": "accept"}, headers=auth("outsider"))
+
+    assert response.status_code == 403
+    assert database.get_document("chats", "chat-1")["location_accepted_by"] == "viewer"
+
+
+async def test_sharing_again_needs_fresh_consent(client):
+    add_user("sharer")
+    add_shared_chat("chat-1", "sharer", "viewer")
+
+    stopped = await client.delete("/api/chat/chat-1/live-location", headers=auth("sharer"))
+    assert stopped.status_code == 200
+    assert database.get_document("chats", "chat-1")["location_accepted_by"] is None
+
+    await client.put("/api/chat/chat-1/location", params={"action": "share"}, headers=auth("sharer"))
+    chat = await live_location.load_chat("chat-1")
+
+    assert not live_location.can_view(chat, "viewer")
@@ -0,0 +1,60 @@
+# backend/tests/test_middleware.py
+
+import pytest
+
+from backend import deadlines, ratelimit
+from backend.tests.helpers import add_user, auth
+
+pytestmark = pytest.mark.anyio
+
+ORIGIN = {"Origin": "https://app.example.com"}
+
+
+async def test_shed_requests_carry_cors_headers(client, monkeypatch):
+    add_user("reader")
+    monkeypatch.setattr(ratelimit, "MAX_IN_FLIGHT", 0)
+
+    response = await client.get("/api/users/me", headers={**auth("reader"), **ORIGIN})
+
+    assert response.status_code == 503
+    assert response.headers["access-control-allow-origin"]
+
+
+async def test_timed_out_requests_carry_cors_headers(client, monkeypatch):
+    add_user("reader")
+    # Every request starts with its budget already spent
+    monkeypatch.setattr(deadlines, "start", lambda: deadlines._deadline.set(0.0))
+
+    response = await client.get("/api/users/me", headers={**auth("reader"), **ORIGIN})
+
+    assert response.status_code == 504
+    assert response.headers["access-control-allow-origin"]
+
+
+async def test_profile_update_is_rate_limited(client, monkeypatch):
+    add_user("writer")
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setitem(ratelimit.COST_CLASSES, "write", (1, 0.001))
+    monkeypatch.setattr(ratelimit, "_buckets", {})
+
+    first = await client.put("/api/users/me", json={"bio": "Hallo"}, headers=auth("writer"))
+    second = await client.put("/api/users/me", json={"bio": "Hallo!"}, headers=auth("writer"))
+
+    assert first.status_code == 200
+    assert first.json()["bio"] == "Hallo"
+    assert second.status_code == 429
+
+
+async def test_transient_firestore_errors_answer_503(client, store, monkeypatch):
+    from google.api_core.exceptions import ServiceUnavailable
+
+    def unavailable(*args, **kwargs):
+        raise ServiceUnavailable("backend unavailable")
+
+    monkeypatch.setattr(store, "collection", unavailable)
+
+    response = await client.get("/api/users/me", headers={**auth("reader"), **ORIGIN})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert response.headers["access-control-allow-origin"]
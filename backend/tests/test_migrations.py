@@ -0,0 +1,46 @@
+# backend/tests/test_migrations.py
+
+from backend.archival import archive_name
+from backend.database import add_document, add_to_field, get_document, update_document
+from backend.migrations import run_migration, transforms
+from backend.tests.helpers import add_task, add_user
+
+
+def quiet(message):
+    pass
+
+
+def test_task_counters_include_archived_tasks():
+    add_user("creator", posted_tasks=0)
+    add_user("tasker", completed_tasks=0)
+    add_task("task-open", "creator")
+    add_document(archive_name("tasks"), "task-done", {
+        "id": "task-done", "creator_uid": "creator", "tasker_uid": "tasker", "status": "completed",
+    })
+
+    run_migration("users_task_counters", report=quiet)
+
+    assert get_document("users", "creator")["posted_tasks"] == 2
+    assert get_document("users", "tasker")["completed_tasks"] == 1
+
+
+def test_task_counters_do_not_overwrite_concurrent_increments(monkeypatch):
+    add_user("creator", posted_tasks=0)
+    add_task("task-1", "creator")
+    count = transforms.aggregate_documents
+    raced = []
+
+    def aggregate_during_a_create(name, filters, *args, **kwargs):
+        result = count(name, filters, *args, **kwargs)
+        if not raced:
+            # A task is created (and counted inline) after this count was taken
+            raced.append(True)
+            add_task("task-2", "creator")
+            update_document("users", "creator", {"posted_tasks": add_to_field(1)})
+        return result
+
+    monkeypatch.setattr(transforms, "aggregate_documents", aggregate_during_a_create)
+
+    run_migration("users_task_counters", report=quiet)
+
+    assert get_document("users", "creator")["posted_tasks"] == 2
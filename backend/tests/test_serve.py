@@ -0,0 +1,100 @@
+# backend/tests/test_serve.py
+
+import json
+import os
+
+import pytest
+
+from backend import metrics, serve
+
+
+class FakeProcess:
+    def __init__(self, exitcode=None):
+        self.pid = 4242
+        self.exitcode = exitcode
+        self.started = False
+
+    def start(self):
+        self.started = True
+
+
+@pytest.fixture
+def supervisor(monkeypatch):
+    spawned = []
+
+    def get_subprocess(config, target, sockets):
+        spawned.append(FakeProcess())
+        return spawned[-1]
+
+    monkeypatch.setattr(serve, "get_subprocess", get_subprocess)
+    supervisor = serve.Supervisor(config=None, target=None, sockets=[])
+    supervisor.processes = [FakeProcess()]
+    supervisor.started = [0.0]
+    supervisor.fast_failures = [0]
+    supervisor.restart_at = [None]
+    supervisor.gave_up = False
+    supervisor.spawned = spawned
+    return supervisor
+
+
+def test_worker_that_ran_for_a_while_is_restarted_at_once(supervisor):
+    supervisor.processes[0].exitcode = 1
+    supervisor.check_workers(serve.FAST_FAILURE_SECONDS + 1)
+
+    assert supervisor.spawned and supervisor.processes[0] is supervisor.spawned[0]
+
+
+def test_fast_failures_back_off_then_give_up(supervisor):
+    now = 0.0
+    for failure in range(1, serve.MAX_FAST_FAILURES):
+        supervisor.processes[0].exitcode = 1
+        supervisor.check_workers(now)
+        delay = serve.restart_delay(failure)
+        assert supervisor.restart_at[0] == now + delay
+        assert len(supervisor.spawned) == failure - 1
+
+        now += delay
+        supervisor.check_workers(now)
+        assert len(supervisor.spawned) == failure
+
+    supervisor.processes[0].exitcode = 1
+    supervisor.check_workers(now + 1)
+
+    assert supervisor.gave_up and supervisor.should_exit.is_set()
+    assert len(supervisor.spawned) == serve.MAX_FAST_FAILURES - 1
+
+
+def test_metrics_are_merged_across_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "_counters", {})
+    monkeypatch.setattr(metrics, "_histograms", {})
+    metrics.inc("doit_http_requests_total", {"route": "/api/health", "status": 200})
+    metrics.inc("doit_open_streams", {"stream": "notifications"})
+    metrics.observe("doit_http_request_seconds", {"route": "/api/health"}, 0.02)
+    # A worker that has exited: its counters still count, its gauges no longer do
+    metrics.share()
+    other = json.loads((tmp_path / f"{os.getpid()}.json").read_text())
+    (tmp_path / "999999999.json").write_text(json.dumps(other))
+
+    text = metrics.render()
+
+    assert 'doit_http_requests_total{route="/api/health",status="200"} 2' in text
+    assert 'doit_open_streams{stream="notifications"} 1' in text
+    assert 'doit_http_request_seconds_count{route="/api/health"} 2' in text
+
+
+def test_workers_default_to_the_cpu_count(monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.delenv("LIVE_LOCATION_ENABLED", raising=False)
+
+    assert serve.default_workers() == len(os.sched_getaffinity(0))
+
+
+def test_live_location_opt_in_means_one_worker(monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.setenv("LIVE_LOCATION_ENABLED", "1")
+    monkeypatch.setenv("WARM_UP_CACHES", "0")
+
+    assert serve.default_workers() == 1
+    with pytest.raises(SystemExit):
+        serve.serve(workers=2)
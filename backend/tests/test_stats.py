@@ -0,0 +1,21 @@
+# backend/tests/test_stats.py
+
+import pytest
+
+from backend.routers import admin
+from backend.tests.helpers import add_user, auth
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_stats_require_admin(client, monkeypatch):
+    add_user("member")
+    add_user("operator")
+    monkeypatch.setattr(admin, "ADMIN_UIDS", {"operator"})
+
+    denied = await client.get("/api/stats/", headers=auth("member"))
+    allowed = await client.get("/api/stats/", headers=auth("operator"))
+
+    assert denied.status_code == 403
+    assert allowed.status_code == 200
+    assert "tasks_by_status" in allowed.json()
@@ -0,0 +1,95 @@
+# backend/tests/test_tasks.py
+
+import pytest
+
+from backend import database
+from backend.tests.helpers import add_task, add_user, auth
+
+pytestmark = pytest.mark.anyio
+
+NEW_TASK = {
+    "title": "Rasen mähen",
+    "description": "Etwa 200 m² hinter dem Haus",
+    "category": "Garten",
+    "location": "Berlin",
+    "latitude": 52.52,
+    "longitude": 13.405,
+    "budget": 30.0,
+    "deadline": None,
+    "preferred_time": None,
+}
+
+
+async def test_retried_create_returns_the_first_response(client):
+    add_user("creator")
+    headers = {**auth("creator"), "Idempotency-Key": "create-1"}
+
+    first = await client.post("/api/tasks/", json=NEW_TASK, headers=headers)
+    retry = await client.post("/api/tasks/", json=NEW_TASK, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert [task["id"] for task in database.get_all_documents("tasks")] == [first.json()["id"]]
+    assert database.get_document("users", "creator")["posted_tasks"] == 1
+
+
+async def test_reused_key_with_another_body_is_rejected(client):
+    add_user("creator")
+    headers = {**auth("creator"), "Idempotency-Key": "create-1"}
+
+    await client.post("/api/tasks/", json=NEW_TASK, headers=headers)
+    response = await client.post("/api/tasks/", json={**NEW_TASK, "budget": 50.0}, headers=headers)
+
+    assert response.status_code == 422
+    assert len(database.get_all_documents("tasks")) == 1
+
+
+async def test_posted_tasks_follows_create_and_delete(client):
+    add_user("creator")
+
+    created = await client.post("/api/tasks/", json=NEW_TASK, headers=auth("creator"))
+    assert database.get_document("users", "creator")["posted_tasks"] == 1
+
+    response = await client.delete(f"/api/tasks/{created.json()['id']}", headers=auth("creator"))
+
+    assert response.status_code == 200
+    assert database.get_document("users", "creator")["posted_tasks"] == 0
+
+
+async def test_completed_tasks_follows_status_transitions(client):
+    add_user("creator")
+    add_user("tasker")
+    add_task("task-1", "creator", status="matched", tasker_uid="tasker")
+
+    completed = await client.put("/api/tasks/task-1", json={"status": "completed"}, headers=auth("creator"))
+    assert completed.status_code == 200
+    assert completed.json()["completed_at"]
+    assert database.get_document("users", "tasker")["completed_tasks"] == 1
+
+    # Repeating the same status is not a transition
+    await client.put("/api/tasks/task-1", json={"status": "completed"}, headers=auth("creator"))
+    assert database.get_document("users", "tasker")["completed_tasks"] == 1
+
+    await client.put("/api/tasks/task-1", json={"status": "matched"}, headers=auth("creator"))
+    assert database.get_document("users", "tasker")["completed_tasks"] == 0
+
+
+async def test_application_count_follows_apply_and_withdraw(client):
+    add_user("creator")
+    add_user("tasker")
+    add_task("task-1", "creator")
+
+    applied = await client.post(
+        "/api/applications/", json={"task_id": "task-1", "message": "Gern"}, headers=auth("tasker")
+    )
+    assert applied.status_code == 200
+    task = await client.get("/api/tasks/task-1", headers=auth("creator"))
+    assert task.json()["application_count"] == 1
+
+    updated = await client.put("/api/tasks/task-1", json={"title": "Regal und Schrank"}, headers=auth("creator"))
+    assert updated.json()["application_count"] == 1
+
+    await client.delete(f"/api/applications/{applied.json()['id']}", headers=auth("tasker"))
+
+    task = await client.get("/api/tasks/task-1", headers=auth("creator"))
+    assert task.json()["application_count"] == 0